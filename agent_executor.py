@@ -0,0 +1,988 @@
+"""
+agent_executor.py
+─────────────────
+Shared ReAct execution engine for the agente_react_* front-ends.
+
+Every front-end used to copy the same `while not isinstance(agent_step,
+AgentFinish)` loop, look tools up with a linear scan and pick the way to
+parse the tool arguments with an if/elif chain on the tool name. This
+module owns that loop:
+
+  • ToolRegistry   – dict-backed name → tool lookup. The argument adapter
+                     of each tool is resolved once, when it is registered,
+                     so per-step dispatch cost does not grow with the
+                     number of tools. Results of pure tools (PURE_TOOLS,
+                     or register(tool, pure=True)) are memoized in a
+                     process-wide LRU shared by every session.
+  • ReActExecutor  – runs the Thought/Action/Observation loop on top of an
+                     LCEL agent chain and returns an AgentRunResult. arun()
+                     is the asyncio version built on `agent.ainvoke`, so
+                     one process can keep many sessions in flight.
+  • FallbackStage  – when a tool fails, searches the web for the user
+                     question and adds the result to the scratchpad;
+                     optionally overlapped with the next LLM call.
+  • RunBudget      – optional per-run limits on tokens, tool calls and
+                     time (see budget.py); a run about to go over stops
+                     with a best-effort answer instead of looping on.
+
+Usage:
+    from agent_executor import ToolRegistry, ReActExecutor
+
+    registry = ToolRegistry([get_text_length, multiplica2, math_operation, web_search_tool])
+    executor = ReActExecutor(
+        agent, registry, fallback_tool=web_search_tool, speculative_fallback=True
+    )
+    result = executor.run("Cuanto es 3.14 multiplicado por 4?")
+    print(result.output)
+
+    # or, inside a coroutine:
+    result = await executor.arun("Cuanto es 3.14 multiplicado por 4?")
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tools import BaseTool
+
+from budget import BudgetTracker, BudgetUsage, RunBudget, best_effort_finish
+from caching import MISSING, CacheStats, LRUCache
+from callbacks import InstrumentationHandler, find_instrumentation, trace_span
+from guardrails import safe_parse_tool_input
+from react_prompt import IncrementalScratchpad, find_react_prompt, render_scratchpad
+from safe_math import MathExpressionError, compile_expression
+from search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Observations containing any of these markers trigger the web-search fallback.
+FALLBACK_MARKERS: Tuple[str, ...] = ("I don't know", "Tool execution failed")
+
+
+# ─────────────────────────────────────────────
+# Argument adapters
+# ─────────────────────────────────────────────
+
+def parse_single_argument(tool_input: Any) -> tuple:
+    """Pass the raw LLM input through as the only positional argument."""
+    return (tool_input,)
+
+
+def parse_tuple_arguments(tool_input: Any) -> tuple:
+    """
+    Parse a tuple literal such as "(3.14, 4)" into positional arguments.
+
+    Uses safe_parse_tool_input() (ast.literal_eval) instead of eval().
+    """
+    parsed = safe_parse_tool_input("multiplica2", tool_input)
+    if not isinstance(parsed, (tuple, list)):
+        parsed = (parsed,)
+    return tuple(parsed)
+
+
+def parse_expression_argument(tool_input: Any) -> tuple:
+    """Strip the quotes and newlines the LLM tends to wrap expressions in."""
+    return (str(tool_input).strip().strip('"').strip("'").strip("\n"),)
+
+
+# Tools whose input needs something other than parse_single_argument().
+ARGUMENT_PARSERS: Dict[str, Callable[[Any], tuple]] = {
+    "multiplica2": parse_tuple_arguments,
+    "math_operation": parse_expression_argument,
+}
+
+
+# ─────────────────────────────────────────────
+# Pure-tool memoization
+# ─────────────────────────────────────────────
+
+# Tools whose result depends only on their arguments: registered as pure
+# unless register(..., pure=False) says otherwise.
+PURE_TOOLS: frozenset = frozenset({"get_text_length", "multiplica2", "math_operation"})
+
+# Never memoized here: web results change over time and already have their
+# own TTL cache (search_cache.py).
+IMPURE_TOOLS: frozenset = frozenset({"tavily_search_results_json"})
+
+def expression_key_args(args: tuple) -> tuple:
+    """Key arguments of math_operation: the postfix form of the expression."""
+    try:
+        return (compile_expression(args[0]).canonical,)
+    except MathExpressionError:
+        return (" ".join(args[0].split()),)  # the call fails; errors are not cached
+
+
+# Pure tools whose parsed arguments still have several spellings of one call.
+KEY_NORMALIZERS: Dict[str, Callable[[tuple], tuple]] = {
+    "math_operation": expression_key_args,
+}
+
+# Entries of the process-wide pure-tool cache (0 disables memoization).
+PURE_TOOL_CACHE_SIZE: int = int(os.getenv("AGENT_PURE_TOOL_CACHE_SIZE", "1024"))
+
+
+def pure_call_key(namespace: str, args: tuple) -> str:
+    """
+    Cache key of a pure tool call: tool + normalized parsed arguments.
+
+    Arguments are serialized as canonical JSON, so the same call written
+    differently by the LLM ("(3, 4)" / "(3,4)" / "[3, 4]") shares a key,
+    while 3 and 3.0 (whose results differ in type) do not.
+    """
+    try:
+        normalized = json.dumps(list(args), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    except (TypeError, ValueError):
+        normalized = repr(args)
+    return f"{namespace}|{normalized}"
+
+
+class PureToolCache:
+    """
+    Bounded memo of pure tool results, keyed by pure_call_key().
+
+    A second LRU maps the raw LLM input to the result, so a byte-identical
+    repeat skips parsing and key building too.
+
+    Args:
+        maxsize: Entries of each LRU.
+    """
+
+    def __init__(self, maxsize: int):
+        self.results = LRUCache(maxsize)
+        self.raw_inputs = LRUCache(maxsize)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def lookup(
+        self,
+        namespace: str,
+        tool_input: Any,
+        parse: Callable[[Any], tuple],
+        key_args: Optional[Callable[[tuple], tuple]] = None,
+    ) -> Tuple[Any, tuple, str]:
+        """
+        (cached result or MISSING, parsed arguments, key) for one call.
+
+        `key_args` maps the parsed arguments to the ones used in the key
+        (see KEY_NORMALIZERS); the parsed arguments by default.
+        """
+        raw_key = _raw_key(namespace, tool_input)
+        if raw_key is not None:
+            value = self.raw_inputs.get(raw_key)
+            if value is not MISSING:
+                self._count(hit=True)
+                return value, (), ""
+        args = parse(tool_input)
+        key = pure_call_key(namespace, key_args(args) if key_args is not None else args)
+        value = self.results.get(key)
+        if value is not MISSING and raw_key is not None:
+            self.raw_inputs.set(raw_key, value)
+        self._count(hit=value is not MISSING)
+        return value, args, key
+
+    def store(self, namespace: str, tool_input: Any, key: str, value: Any) -> None:
+        self.results.set(key, value)
+        raw_key = _raw_key(namespace, tool_input)
+        if raw_key is not None:
+            self.raw_inputs.set(raw_key, value)
+
+    def clear(self) -> None:
+        self.results.clear()
+        self.raw_inputs.clear()
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.stats.hits += 1
+                self.stats.memory_hits += 1
+            else:
+                self.stats.misses += 1
+            self.stats.evictions = self.results.evictions
+
+
+def _raw_key(namespace: str, tool_input: Any) -> Optional[str]:
+    return f"{namespace}|raw|{tool_input}" if isinstance(tool_input, str) else None
+
+
+_PURE_TOOL_CACHE = PureToolCache(max(PURE_TOOL_CACHE_SIZE, 1))
+
+
+def pure_tool_cache() -> PureToolCache:
+    """The cache shared by all registries; `.stats` has hits, misses and hit_rate."""
+    return _PURE_TOOL_CACHE
+
+
+@dataclass(frozen=True)
+class ToolAdapter:
+    """
+    Precompiled dispatch information for one registered tool.
+
+    Attributes:
+        tool:  The LangChain tool.
+        parse: Turns the raw `AgentAction.tool_input` into positional args.
+        call:  Executes the tool with those positional args.
+        acall: Native coroutine for the tool, or None when the tool is
+               blocking and must run in a thread pool.
+        cache: Memoizes the results when the tool is pure, else None.
+        cache_namespace: Tool name + implementation, prefix of the cache keys.
+        cache_key_args: Normalizes the parsed arguments for the cache key.
+    """
+
+    tool: BaseTool
+    parse: Callable[[Any], tuple]
+    call: Callable[..., Any]
+    acall: Optional[Callable[..., Awaitable[Any]]] = None
+    cache: Optional[PureToolCache] = None
+    cache_namespace: str = ""
+    cache_key_args: Optional[Callable[[tuple], tuple]] = None
+
+    def __call__(self, tool_input: Any) -> Any:
+        if self.cache is None:
+            return self.call(*self.parse(tool_input))
+        value, args, key = self.cache.lookup(self.cache_namespace, tool_input, self.parse, self.cache_key_args)
+        if value is MISSING:
+            value = self.call(*args)  # exceptions are not cached
+            self.cache.store(self.cache_namespace, tool_input, key, value)
+        return value
+
+    async def ainvoke(self, tool_input: Any, executor: Optional[Executor] = None) -> Any:
+        """Run the tool without blocking the event loop."""
+        if self.cache is None:
+            args, key = self.parse(tool_input), None
+        else:
+            value, args, key = self.cache.lookup(self.cache_namespace, tool_input, self.parse, self.cache_key_args)
+            if value is not MISSING:
+                return value  # no thread-pool round trip on a hit
+        if self.acall is not None:
+            value = await self.acall(*args)
+        else:
+            loop = asyncio.get_running_loop()
+            value = await loop.run_in_executor(executor, lambda: self.call(*args))
+        if key is not None:
+            self.cache.store(self.cache_namespace, tool_input, key, value)
+        return value
+
+
+def _resolve_call(tool: BaseTool) -> Callable[..., Any]:
+    # @tool functions expose the wrapped callable as `.func`; tools such as
+    # TavilySearchResults have no `.func` and must go through `.run()`.
+    func = getattr(tool, "func", None)
+    return func if func is not None else tool.run
+
+
+def _resolve_acall(tool: BaseTool) -> Optional[Callable[..., Awaitable[Any]]]:
+    # Sync @tool functions have no coroutine: they go to the thread pool.
+    coroutine = getattr(tool, "coroutine", None)
+    if coroutine is not None:
+        return coroutine
+    if getattr(tool, "func", None) is None:
+        return tool.arun
+    return None
+
+
+# ─────────────────────────────────────────────
+# Tool registry
+# ─────────────────────────────────────────────
+
+class ToolRegistry:
+    """
+    Dict-backed registry of the tools available to the agent.
+
+    Args:
+        tools: Tools to register, in the order they are shown to the LLM.
+    """
+
+    def __init__(self, tools: Iterable[BaseTool] = ()):
+        self._adapters: Dict[str, ToolAdapter] = {}
+        for tool in tools:
+            self.register(tool)
+
+    def register(
+        self,
+        tool: BaseTool,
+        parse: Optional[Callable[[Any], tuple]] = None,
+        pure: Optional[bool] = None,
+    ) -> ToolAdapter:
+        """
+        Register a tool and build its argument adapter.
+
+        Args:
+            tool:  The LangChain tool to register.
+            parse: Optional argument parser. Defaults to the entry in
+                   ARGUMENT_PARSERS for the tool name, or to
+                   parse_single_argument().
+            pure:  Memoize the results in pure_tool_cache() (same parsed
+                   arguments, same result, across sessions). Defaults to
+                   whether the tool name is in PURE_TOOLS.
+
+        Returns:
+            The ToolAdapter used to dispatch calls to the tool.
+
+        Raises:
+            ValueError: If `pure` is set for a tool in IMPURE_TOOLS.
+        """
+        if parse is None:
+            parse = ARGUMENT_PARSERS.get(tool.name, parse_single_argument)
+        if pure is None:
+            pure = tool.name in PURE_TOOLS
+        elif pure and tool.name in IMPURE_TOOLS:
+            raise ValueError(
+                f"Tool {tool.name} cannot be registered as pure: its results "
+                "change over time (it has its own TTL cache in search_cache.py)"
+            )
+        call = _resolve_call(tool)
+        memoize = pure and PURE_TOOL_CACHE_SIZE > 0
+        adapter = ToolAdapter(
+            tool=tool,
+            parse=parse,
+            call=call,
+            acall=_resolve_acall(tool),
+            cache=_PURE_TOOL_CACHE if memoize else None,
+            # Two tools with the same name (e.g. a front-end's own
+            # math_operation) must not share entries.
+            cache_namespace=f"{tool.name}|{getattr(call, '__module__', '')}.{getattr(call, '__qualname__', '')}",
+            cache_key_args=KEY_NORMALIZERS.get(tool.name),
+        )
+        self._adapters[tool.name] = adapter
+        return adapter
+
+    def get(self, tool_name: str) -> ToolAdapter:
+        """Return the adapter for `tool_name` or raise ValueError."""
+        try:
+            return self._adapters[tool_name]
+        except KeyError:
+            raise ValueError(f"Tool with name {tool_name} not found") from None
+
+    def execute(self, tool_name: str, tool_input: Any) -> Any:
+        """Parse `tool_input` and run the tool registered as `tool_name`."""
+        return self.get(tool_name)(tool_input)
+
+    async def aexecute(
+        self,
+        tool_name: str,
+        tool_input: Any,
+        executor: Optional[Executor] = None,
+    ) -> Any:
+        """Async execute(); blocking tools run on `executor` (default pool if None)."""
+        return await self.get(tool_name).ainvoke(tool_input, executor)
+
+    @property
+    def pure_names(self) -> List[str]:
+        """Tools whose results are memoized."""
+        return [name for name, adapter in self._adapters.items() if adapter.cache is not None]
+
+    @property
+    def tools(self) -> List[BaseTool]:
+        """Registered tools, e.g. for render_text_description()."""
+        return [adapter.tool for adapter in self._adapters.values()]
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._adapters)
+
+    def __contains__(self, tool_name: str) -> bool:
+        return tool_name in self._adapters
+
+    def __len__(self) -> int:
+        return len(self._adapters)
+
+
+# ─────────────────────────────────────────────
+# ReAct loop
+# ─────────────────────────────────────────────
+
+class AgentIterationLimitError(RuntimeError):
+    """Raised when the agent does not finish within `max_iterations` steps."""
+
+    def __init__(self, max_iterations: int):
+        super().__init__(
+            f"Agent loop reached the maximum of {max_iterations} iterations."
+        )
+        self.max_iterations = max_iterations
+
+
+@dataclass
+class AgentRunResult:
+    """Outcome of one ReActExecutor.run() call."""
+
+    output: str
+    return_values: Dict[str, Any]
+    intermediate_steps: List[Tuple[AgentAction, str]] = field(default_factory=list)
+    iterations: int = 0
+    usage: Optional[BudgetUsage] = None  # set when the executor has a budget
+
+
+# What the agent chain returns: ReActMultiActionOutputParser may return a
+# list of actions to run in parallel.
+AgentStep = Union[AgentAction, List[AgentAction], AgentFinish]
+
+StepCallback = Callable[[int, Union[AgentAction, AgentFinish], Optional[str]], None]
+
+_TOOL_POOL: Optional[ThreadPoolExecutor] = None
+_TOOL_POOL_LOCK = threading.Lock()
+
+# Worker threads of the pool shared by run() for multi-action steps.
+TOOL_POOL_MAX_WORKERS: int = 8
+
+
+def _shared_tool_pool() -> ThreadPoolExecutor:
+    global _TOOL_POOL
+    with _TOOL_POOL_LOCK:
+        if _TOOL_POOL is None:
+            _TOOL_POOL = ThreadPoolExecutor(
+                max_workers=TOOL_POOL_MAX_WORKERS, thread_name_prefix="react-tool"
+            )
+        return _TOOL_POOL
+
+
+def _as_action_list(agent_step: Union[AgentAction, List[AgentAction]]) -> List[AgentAction]:
+    return agent_step if isinstance(agent_step, list) else [agent_step]
+
+
+def _merge_observations(
+    count: int, duplicates: List[int], handed_over: Optional[str], done: List[str]
+) -> List[str]:
+    """Put the fallback result back at the `duplicates` positions among `done`."""
+    rest = iter(done)
+    return [handed_over if i in duplicates else next(rest) for i in range(count)]
+
+
+# ─────────────────────────────────────────────
+# Web-search fallback stage
+# ─────────────────────────────────────────────
+
+def _record_error(span: Optional[Any], error: Exception) -> None:
+    # Tool errors become observations, so the span would not see them.
+    if span is not None:
+        span.error = f"{type(error).__name__}: {error}"
+
+
+def needs_fallback(observations: List[str]) -> bool:
+    """True if any observation contains one of FALLBACK_MARKERS."""
+    return any(
+        marker in observation
+        for observation in observations
+        for marker in FALLBACK_MARKERS
+    )
+
+
+class FallbackStage:
+    """
+    Web-search fallback of one run.
+
+    When a tool fails, the fallback tool is run with the original user
+    question and its result is added to the scratchpad as one more
+    (AgentAction, observation) step, so the LLM can use it. It runs at
+    most once per run.
+
+    In speculative mode the search starts in the background as soon as
+    the tool fails and the next LLM call goes ahead without waiting for
+    it. The result is added after that call's actions, or handed over
+    directly if the LLM itself asks for the same search.
+    """
+
+    def __init__(
+        self,
+        tool: BaseTool,
+        user_input: str,
+        speculative: bool = False,
+        tracer: Optional[InstrumentationHandler] = None,
+    ):
+        self.tool = tool
+        self.user_input = user_input
+        self.speculative = speculative
+        self.tracer = tracer
+        self.action = AgentAction(
+            tool=tool.name,
+            tool_input=user_input,
+            log=(
+                "The previous action did not answer the question, so I will "
+                f"search the web for it.\nAction: {tool.name}\n"
+                f"Action Input: {user_input}"
+            ),
+        )
+        self.used = False
+        self._pending = None  # concurrent.futures.Future or asyncio.Task
+        self._observation: Optional[str] = None
+
+    def should_start(self, observations: List[str]) -> bool:
+        return not self.used and needs_fallback(observations)
+
+    def _span(self):
+        return trace_span(
+            self.tracer, "tool", self.tool.name, fallback=True, speculative=self.speculative
+        )
+
+    def _search(self) -> str:
+        with self._span() as span:
+            try:
+                return str(self.tool.run(self.user_input))
+            except Exception as e:
+                logger.error("Fallback search failed: %s", e)
+                _record_error(span, e)
+                return f"Tool execution failed: {str(e)}"
+
+    async def _asearch(self) -> str:
+        with self._span() as span:
+            try:
+                return str(await self.tool.arun(self.user_input))
+            except Exception as e:
+                logger.error("Fallback search failed: %s", e)
+                _record_error(span, e)
+                return f"Tool execution failed: {str(e)}"
+
+    def start(self, pool: Executor) -> None:
+        """Run the search now, or submit it to `pool` when speculative."""
+        logger.info("Agent could not answer. Using web_search as fallback.")
+        self.used = True
+        if self.speculative:
+            self._pending = pool.submit(self._search)
+        else:
+            self._observation = self._search()
+
+    async def astart(self) -> None:
+        """Async start(): speculative searches become an asyncio task."""
+        logger.info("Agent could not answer. Using web_search as fallback.")
+        self.used = True
+        if self.speculative:
+            self._pending = asyncio.ensure_future(self._asearch())
+        else:
+            self._observation = await self._asearch()
+
+    def is_duplicate(self, action: AgentAction) -> bool:
+        """True if `action` repeats the pending speculative search."""
+        return (
+            self._pending is not None
+            and action.tool == self.tool.name
+            and normalize_query(action.tool_input) == normalize_query(self.user_input)
+        )
+
+    def duplicates(self, actions: List[AgentAction]) -> List[int]:
+        """Indices of the actions in one step that repeat the pending search."""
+        return [i for i, action in enumerate(actions) if self.is_duplicate(action)]
+
+    def take(self) -> Optional[str]:
+        """Return the finished observation (waiting for it) and clear it."""
+        if self._pending is not None:
+            self._observation = self._pending.result()
+            self._pending = None
+        observation, self._observation = self._observation, None
+        return observation
+
+    async def atake(self) -> Optional[str]:
+        """Async take()."""
+        if self._pending is not None:
+            self._observation = await self._pending
+            self._pending = None
+        observation, self._observation = self._observation, None
+        return observation
+
+    def cancel(self) -> None:
+        """Drop a speculative search the run no longer needs."""
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+
+class ReActExecutor:
+    """
+    Drive an LCEL ReAct agent chain until it produces an AgentFinish.
+
+    Args:
+        agent:          Runnable taking {"input", "agent_scratchpad", ...}
+                        and returning an AgentAction, a list of
+                        AgentAction (run in parallel) or an AgentFinish.
+        registry:       ToolRegistry with the tools the agent may call.
+        max_iterations: Optional cap on LLM round trips. When reached,
+                        AgentIterationLimitError is raised.
+        budget:         Optional RunBudget. Usage is tracked from the LLM
+                        responses and reported in AgentRunResult.usage;
+                        when the next LLM call or tool batch would go
+                        over, the run ends with best_effort_finish().
+        fallback_tool:  Optional tool run with the user question when an
+                        observation contains one of FALLBACK_MARKERS; its
+                        result is added to the scratchpad (see
+                        FallbackStage).
+        speculative_fallback: Start the fallback search in the background
+                        and overlap it with the next LLM call.
+        on_step:        Optional callback `(iteration, agent_step,
+                        observation)` called after every action; the
+                        observation is None for the final AgentFinish.
+        tool_executor:  Thread pool for parallel actions in run() and for
+                        blocking tools such as math_operation in arun().
+                        Defaults to a shared pool (run) or the event
+                        loop's default executor (arun).
+    """
+
+    def __init__(
+        self,
+        agent,
+        registry: ToolRegistry,
+        *,
+        max_iterations: Optional[int] = None,
+        budget: Optional[RunBudget] = None,
+        fallback_tool: Optional[BaseTool] = None,
+        speculative_fallback: bool = False,
+        on_step: Optional[StepCallback] = None,
+        tool_executor: Optional[Executor] = None,
+    ):
+        self.agent = agent
+        self.registry = registry
+        self.max_iterations = max_iterations
+        self.budget = budget
+        self.fallback_tool = fallback_tool
+        self.speculative_fallback = speculative_fallback
+        self.on_step = on_step
+        self.tool_executor = tool_executor
+
+    def run_tool(
+        self,
+        action: AgentAction,
+        fallback: Optional[FallbackStage] = None,
+        tracer: Optional[InstrumentationHandler] = None,
+    ) -> str:
+        """
+        Execute the tool requested by `action` and return the observation.
+
+        With a `tracer`, the call is recorded as a "tool" span.
+        """
+        if fallback is not None and fallback.is_duplicate(action):
+            observation = fallback.take()
+            if observation is not None:
+                return observation
+        with trace_span(tracer, "tool", action.tool, input_chars=len(str(action.tool_input))) as span:
+            try:
+                observation = self.registry.execute(action.tool, action.tool_input)
+            except Exception as e:
+                logger.error("Tool %s failed: %s", action.tool, e)
+                _record_error(span, e)
+                observation = f"Tool execution failed: {str(e)}"
+        return str(observation)
+
+    async def arun_tool(
+        self,
+        action: AgentAction,
+        fallback: Optional[FallbackStage] = None,
+        tracer: Optional[InstrumentationHandler] = None,
+    ) -> str:
+        """Async run_tool()."""
+        if fallback is not None and fallback.is_duplicate(action):
+            observation = await fallback.atake()
+            if observation is not None:
+                return observation
+        with trace_span(tracer, "tool", action.tool, input_chars=len(str(action.tool_input))) as span:
+            try:
+                observation = await self.registry.aexecute(
+                    action.tool, action.tool_input, self.tool_executor
+                )
+            except Exception as e:
+                logger.error("Tool %s failed: %s", action.tool, e)
+                _record_error(span, e)
+                observation = f"Tool execution failed: {str(e)}"
+        return str(observation)
+
+    def run_tools(
+        self,
+        actions: List[AgentAction],
+        fallback: Optional[FallbackStage] = None,
+        tracer: Optional[InstrumentationHandler] = None,
+    ) -> List[str]:
+        """
+        Execute one step's actions; several actions run in parallel.
+
+        Actions repeating the pending speculative search all get its
+        result, taken once. Observations are returned in the same order
+        as `actions`.
+        """
+        if len(actions) == 1:
+            return [self.run_tool(actions[0], fallback, tracer)]
+        duplicates = fallback.duplicates(actions) if fallback is not None else []
+        rest = [a for i, a in enumerate(actions) if i not in duplicates]
+        done = self._pool.map(lambda a: self.run_tool(a, None, tracer), rest)
+        handed_over = fallback.take() if duplicates else None
+        return _merge_observations(len(actions), duplicates, handed_over, list(done))
+
+    async def arun_tools(
+        self,
+        actions: List[AgentAction],
+        fallback: Optional[FallbackStage] = None,
+        tracer: Optional[InstrumentationHandler] = None,
+    ) -> List[str]:
+        """Async run_tools(): the actions are awaited concurrently."""
+        duplicates = fallback.duplicates(actions) if fallback is not None else []
+        rest = [a for i, a in enumerate(actions) if i not in duplicates]
+        pending = [self.arun_tool(a, None, tracer) for a in rest]
+        if not duplicates:
+            return list(await asyncio.gather(*pending))
+        handed_over, *done = await asyncio.gather(fallback.atake(), *pending)
+        return _merge_observations(len(actions), duplicates, handed_over, done)
+
+    @property
+    def _pool(self) -> Executor:
+        return self.tool_executor or _shared_tool_pool()
+
+    def _fallback_stage(
+        self, user_input: str, tracer: Optional[InstrumentationHandler]
+    ) -> Optional[FallbackStage]:
+        if self.fallback_tool is None:
+            return None
+        return FallbackStage(self.fallback_tool, user_input, self.speculative_fallback, tracer)
+
+    def _check_iteration_limit(self, iterations: int) -> None:
+        if self.max_iterations is not None and iterations >= self.max_iterations:
+            logger.warning(
+                "Agent loop reached max_iterations (%d). Stopping.",
+                self.max_iterations,
+            )
+            raise AgentIterationLimitError(self.max_iterations)
+
+    def _budget_tracker(
+        self, callbacks: Optional[List[BaseCallbackHandler]]
+    ) -> Tuple[Optional[BudgetTracker], Optional[List[BaseCallbackHandler]]]:
+        """A fresh tracker for this run, appended to its callbacks."""
+        if self.budget is None:
+            return None, callbacks
+        tracker = BudgetTracker(self.budget)
+        return tracker, [*(callbacks or []), tracker]
+
+    def _first_prompt_chars(
+        self, tracker: Optional[BudgetTracker], chain_inputs: Dict[str, Any]
+    ) -> Optional[int]:
+        """
+        Size of the first prompt, for a budget with max_prompt_tokens.
+
+        Rendered exactly when the agent was built by build_react_agent();
+        otherwise the inputs alone, a lower bound.
+        """
+        if tracker is None or tracker.budget.max_prompt_tokens is None:
+            return None
+        prompt = find_react_prompt(self.agent)
+        if prompt is not None:
+            return len(prompt.render(chain_inputs))
+        return sum(len(str(v)) for k, v in chain_inputs.items() if k != "agent_scratchpad")
+
+    @staticmethod
+    def _over_budget(
+        tracker: Optional[BudgetTracker],
+        intermediate_steps: IncrementalScratchpad,
+        actions: Optional[List[AgentAction]] = None,
+        first_prompt_chars: Optional[int] = None,
+    ) -> Optional[AgentFinish]:
+        """
+        best_effort_finish() if the next LLM call (or, with `actions`,
+        those tool calls) would exceed the budget; None otherwise.
+        """
+        if tracker is None:
+            return None
+        if actions is None:
+            reason = tracker.check_llm_call(
+                len(render_scratchpad(intermediate_steps)), first_prompt_chars
+            )
+        else:
+            reason = tracker.check_tool_calls(len(actions))
+        if reason is None:
+            return None
+        logger.warning("Run budget exceeded (%s). Stopping with a best-effort answer.", reason)
+        return best_effort_finish(intermediate_steps, reason)
+
+    @staticmethod
+    def _fallback_allowed(tracker: Optional[BudgetTracker]) -> bool:
+        """The fallback search is one more tool call; skip it when over budget."""
+        if tracker is None:
+            return True
+        if tracker.would_exceed_tool_calls(1):
+            return False  # the run goes on: not a budget stop
+        tracker.check_tool_calls(1)  # counts it
+        return True
+
+    def run(
+        self,
+        user_input: str,
+        callbacks: Optional[List[BaseCallbackHandler]] = None,
+        **inputs: Any,
+    ) -> AgentRunResult:
+        """
+        Run the ReAct loop for one user question.
+
+        Args:
+            user_input: The question, passed to the chain as "input".
+            callbacks:  Callback handlers for this run only (e.g. a
+                        ReActStreamHandler bound to the current page).
+                        An InstrumentationHandler among them also gets
+                        a "tool" span per tool call.
+            **inputs:   Extra chain inputs that stay constant during the
+                        run (e.g. chat_history).
+
+        Returns:
+            AgentRunResult with the final answer and the intermediate steps.
+
+        Raises:
+            AgentIterationLimitError: if max_iterations is exceeded.
+        """
+        # Append-only: the prompt only renders the newest step each iteration.
+        intermediate_steps = IncrementalScratchpad()
+        tracer = find_instrumentation(callbacks)
+        tracker, callbacks = self._budget_tracker(callbacks)
+        fallback = self._fallback_stage(user_input, tracer)
+        chain_inputs = {"input": user_input, "agent_scratchpad": intermediate_steps, **inputs}
+        first_prompt = self._first_prompt_chars(tracker, chain_inputs)
+        iterations = 0
+        agent_step: Optional[AgentStep] = None
+
+        try:
+            while not isinstance(agent_step, AgentFinish):
+                self._check_iteration_limit(iterations)
+                agent_step = self._over_budget(
+                    tracker, intermediate_steps, first_prompt_chars=first_prompt
+                )
+                if agent_step is not None:
+                    self._notify_step(iterations, agent_step, [])
+                    break
+                iterations += 1
+
+                agent_step = self.agent.invoke(chain_inputs, config={"callbacks": callbacks})
+
+                if isinstance(agent_step, AgentFinish):
+                    self._notify_step(iterations, agent_step, [])
+                    break
+
+                actions = _as_action_list(agent_step)
+                agent_step = self._over_budget(tracker, intermediate_steps, actions) or agent_step
+                if isinstance(agent_step, AgentFinish):
+                    self._notify_step(iterations, agent_step, [])
+                    break
+                observations = self.run_tools(actions, fallback, tracer)
+                intermediate_steps.extend(zip(actions, observations))
+                self._notify_step(iterations, actions, observations)
+
+                if fallback is None:
+                    continue
+                # A speculative search started last iteration lands after this
+                # iteration's actions; a new one starts if a tool just failed.
+                self._add_fallback_step(
+                    intermediate_steps, iterations, fallback, fallback.take()
+                )
+                if fallback.should_start(observations) and self._fallback_allowed(tracker):
+                    fallback.start(self._pool)
+                    if not fallback.speculative:
+                        self._add_fallback_step(
+                            intermediate_steps, iterations, fallback, fallback.take()
+                        )
+        finally:
+            if fallback is not None:
+                fallback.cancel()
+
+        return self._result(agent_step, intermediate_steps, iterations, tracker)
+
+    async def arun(
+        self,
+        user_input: str,
+        callbacks: Optional[List[BaseCallbackHandler]] = None,
+        **inputs: Any,
+    ) -> AgentRunResult:
+        """
+        Async run(): awaits `agent.ainvoke` and runs the tools without
+        blocking the event loop, so many sessions can share one process.
+        """
+        intermediate_steps = IncrementalScratchpad()
+        tracer = find_instrumentation(callbacks)
+        tracker, callbacks = self._budget_tracker(callbacks)
+        fallback = self._fallback_stage(user_input, tracer)
+        chain_inputs = {"input": user_input, "agent_scratchpad": intermediate_steps, **inputs}
+        first_prompt = self._first_prompt_chars(tracker, chain_inputs)
+        iterations = 0
+        agent_step: Optional[AgentStep] = None
+
+        try:
+            while not isinstance(agent_step, AgentFinish):
+                self._check_iteration_limit(iterations)
+                agent_step = self._over_budget(
+                    tracker, intermediate_steps, first_prompt_chars=first_prompt
+                )
+                if agent_step is not None:
+                    self._notify_step(iterations, agent_step, [])
+                    break
+                iterations += 1
+
+                agent_step = await self.agent.ainvoke(
+                    chain_inputs, config={"callbacks": callbacks}
+                )
+
+                if isinstance(agent_step, AgentFinish):
+                    self._notify_step(iterations, agent_step, [])
+                    break
+
+                actions = _as_action_list(agent_step)
+                agent_step = self._over_budget(tracker, intermediate_steps, actions) or agent_step
+                if isinstance(agent_step, AgentFinish):
+                    self._notify_step(iterations, agent_step, [])
+                    break
+                observations = await self.arun_tools(actions, fallback, tracer)
+                intermediate_steps.extend(zip(actions, observations))
+                self._notify_step(iterations, actions, observations)
+
+                if fallback is None:
+                    continue
+                # See run(): the speculative search lands after this step's actions.
+                self._add_fallback_step(
+                    intermediate_steps, iterations, fallback, await fallback.atake()
+                )
+                if fallback.should_start(observations) and self._fallback_allowed(tracker):
+                    await fallback.astart()
+                    if not fallback.speculative:
+                        self._add_fallback_step(
+                            intermediate_steps, iterations, fallback, await fallback.atake()
+                        )
+        finally:
+            if fallback is not None:
+                fallback.cancel()
+
+        return self._result(agent_step, intermediate_steps, iterations, tracker)
+
+    def _add_fallback_step(
+        self,
+        intermediate_steps: IncrementalScratchpad,
+        iteration: int,
+        fallback: FallbackStage,
+        observation: Optional[str],
+    ) -> None:
+        if observation is None:
+            return
+        intermediate_steps.append((fallback.action, observation))
+        self._notify_step(iteration, fallback.action, [observation])
+
+    def _notify_step(
+        self,
+        iteration: int,
+        agent_step: AgentStep,
+        observations: List[str],
+    ) -> None:
+        if self.on_step is None:
+            return
+        if isinstance(agent_step, AgentFinish):
+            self.on_step(iteration, agent_step, None)
+            return
+        for action, observation in zip(_as_action_list(agent_step), observations):
+            self.on_step(iteration, action, observation)
+
+    @staticmethod
+    def _result(
+        agent_step: AgentFinish,
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        iterations: int,
+        tracker: Optional[BudgetTracker] = None,
+    ) -> AgentRunResult:
+        return AgentRunResult(
+            output=agent_step.return_values.get("output", ""),
+            return_values=agent_step.return_values,
+            intermediate_steps=intermediate_steps,
+            iterations=iterations,
+            usage=tracker.finish() if tracker is not None else None,
+        )
@@ -3,7 +3,6 @@
 # en esta version agrego la TOOL evaluate, generalizando un poco lo anterior
 
 from typing import Union, List
-import re
 
 from langchain.agents import tool
 from langchain.agents.format_scratchpad import format_log_to_str
@@ -16,12 +15,12 @@ from langchain.tools import Tool
 from langchain.tools.render import render_text_description
 
 from callbacks import AgentCallbackHandler
+from safe_math import safe_eval
 
 from dotenv import load_dotenv
 load_dotenv()
 
 
-import ast   # para el tema del parsing de la tupla de numeros --> # Safe way to evaluate literals
 
 @tool
 def get_text_length(text: str) -> int:
@@ -53,15 +52,6 @@ def multiplica2(a:Union[float, int], b:Union[float, int]) -> float:
     return a*b
 
 
-def math_operation_old(expression: str) -> float:
-    """
-    Evaluates a mathematical expression given as a string.
-    Supports operations like addition, subtraction, multiplication, and division.
-    Example: "3.14 * 4", "10 / 2", "2 ** 3"
-    """
-    return eval(expression)  # Use eval to evaluate math expressions
-
-
 @tool
 def math_operation(expression: str) -> float:
     """
@@ -76,11 +66,7 @@ def math_operation(expression: str) -> float:
     # Remove unwanted characters like extra quotes or newlines
     expression = expression.strip().strip('"').strip("'").strip("\n")
 
-    # Validate input: only allow numbers, operators, and spaces
-    if not re.match(r'^[\d\s+\-*/().]+$', expression):
-        raise ValueError(f"Invalid characters in expression: {expression}")
-
-    return eval(expression)  # Safe evaluation of the cleaned expression
+    return safe_eval(expression)
 
 def find_tool_by_name(tools: List[Tool], tool_name: str) -> Tool:
     for tool in tools:
@@ -1,27 +1,23 @@
 
-from typing import Union, List
-import re
+from typing import Union
 
 from langchain.agents import tool
-from langchain.agents.format_scratchpad import format_log_to_str
-from langchain.agents.output_parsers import ReActSingleInputOutputParser
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.schema import AgentAction, AgentFinish
+from clients import get_chat_model, get_search_tool, warm_up_from_env
 
-from langchain.tools import Tool
-from langchain.tools.render import render_text_description
-
-from callbacks import AgentCallbackHandler
+from callbacks import AgentCallbackHandler, export_trace, instrumentation_from_env
+from safe_math import safe_eval
+from react_prompt import ReActPrompt, build_react_agent
+from llm_cache import llm_cache_from_env
+from react_parser import MULTI_ACTION_INSTRUCTIONS, ReActMultiActionOutputParser
+from agent_executor import ReActExecutor, ToolRegistry
 
 # Incluimos la busqueda con TAVILY
-from langchain_community.tools.tavily_search import TavilySearchResults
+from search_cache import cached_search_tool
 
 from dotenv import load_dotenv
 load_dotenv()
 
 
-import ast   # para el tema del parsing de la tupla de numeros --> # Safe way to evaluate literals
 
 @tool
 def get_text_length(text: str) -> int:
@@ -53,15 +49,6 @@ def multiplica2(a:Union[float, int], b:Union[float, int]) -> float:
     return a*b
 
 
-def math_operation_old(expression: str) -> float:
-    """
-    Evaluates a mathematical expression given as a string.
-    Supports operations like addition, subtraction, multiplication, and division.
-    Example: "3.14 * 4", "10 / 2", "2 ** 3"
-    """
-    return eval(expression)  # Use eval to evaluate math expressions
-
-
 @tool
 def math_operation(expression: str) -> float:
     """
@@ -76,22 +63,12 @@ def math_operation(expression: str) -> float:
     # Remove unwanted characters like extra quotes or newlines
     expression = expression.strip().strip('"').strip("'").strip("\n")
 
-    # Validate input: only allow numbers, operators, and spaces
-    if not re.match(r'^[\d\s+\-*/().]+$', expression):
-        raise ValueError(f"Invalid characters in expression: {expression}")
-
-    return eval(expression)  # Safe evaluation of the cleaned expression
+    return safe_eval(expression)
 
 
 # Initialize Tavily search tool with k=3 (fetch top 3 results)
 # Since TavilySearchResults is already a LangChain tool, we don't need to wrap it in a @tool decorator.
-web_search_tool = TavilySearchResults(k=3)
-
-def find_tool_by_name(tools: List[Tool], tool_name: str) -> Tool:
-    for tool in tools:
-        if tool.name == tool_name:
-            return tool
-    raise ValueError(f"Tool with name {tool_name} not found")
+web_search_tool = cached_search_tool(get_search_tool(k=3))  # conexiones HTTP compartidas
 
 
 ##############################################################################################
@@ -100,6 +77,7 @@ def find_tool_by_name(tools: List[Tool], tool_name: str) -> Tool:
 
 if __name__ == "__main__":
     print("Hello ReAct LangChain!")
+    warm_up_from_env()  # AGENT_HTTP_WARMUP=1
 
     tools = [get_text_length, multiplica2, math_operation, web_search_tool]
 
@@ -118,6 +96,7 @@ if __name__ == "__main__":
 
     Observation: the result of the action
     ... (this Thought/Action/Action Input/Observation can repeat N times)
+    {multi_action_instructions}
     Thought: I now know the final answer
     Final Answer: the final answer to the original input question
     
@@ -127,72 +106,38 @@ if __name__ == "__main__":
     Thought: {agent_scratchpad}
     """
 
-    prompt = PromptTemplate.from_template(template=template).partial(
-        tools=render_text_description(tools),
-        tool_names=", ".join([t.name for t in tools]),
+    prompt = ReActPrompt(
+        template, tools, prefix_cache=True,
+        multi_action_instructions=MULTI_ACTION_INSTRUCTIONS,
     )
 
-    llm = ChatOpenAI(model="gpt-4o-mini",
-                     temperature=0, stop=["\nObservation", "Observation"], 
-                     callbacks=[AgentCallbackHandler()]
-                     )
-
-    intermediate_steps = []
-
-    agent = (
-        {
-            "input": lambda x: x["input"],
-            "agent_scratchpad": lambda x: format_log_to_str(x["agent_scratchpad"]),
-        }
-        | prompt
-        | llm
-        | ReActSingleInputOutputParser()
-    )
+    llm = get_chat_model(model="gpt-4o-mini",
+                         temperature=0, stop=["\nObservation", "Observation"], 
+                         callbacks=[AgentCallbackHandler()],
+                         cache=llm_cache_from_env(),  # AGENT_LLM_CACHE=1 para activarla
+                         )
 
-    input = "Cual ha sido el ultimo resultado del Atletico de Madrid y FC Barcelona en la temporada 2025?"
+    # Varias Action/Action Input por turno: las búsquedas independientes
+    # (p.ej. Atlético y Barcelona) se ejecutan en paralelo
+    agent = build_react_agent(prompt, llm, ReActMultiActionOutputParser())
 
+    input = "Cual ha sido el ultimo resultado del Atletico de Madrid y FC Barcelona en la temporada 2025?"
 
-    agent_step = ""
 
-    while not isinstance(agent_step, AgentFinish):
-        agent_step: Union[AgentAction, AgentFinish] = agent.invoke(
-            {
-                "input": input,                
-                "agent_scratchpad": intermediate_steps,
-            }
-        )
+    def print_step(iteration, agent_step, observation):
         print(agent_step)
-
-        if isinstance(agent_step, AgentAction):
-            tool_name = agent_step.tool
-            tool_to_use = find_tool_by_name(tools, tool_name)
-            tool_input = agent_step.tool_input
-
-            try:
-                # Different parsing for each tool
-                if tool_name == "multiplica2":
-                    tool_input_parsed = eval(tool_input) if isinstance(tool_input, str) else tool_input
-                    observation = tool_to_use.func(*tool_input_parsed)  # Unpack tuple
-                elif tool_name == "math_operation":
-                    tool_input_cleaned = str(tool_input).strip().strip('"').strip("'").strip("\n")
-                    observation = tool_to_use.func(tool_input_cleaned)  # Pass cleaned expression
-                elif tool_name == "tavily_search_results_json":  # Web search tool
-                    print("Using Tavily web search tool...")
-                    observation = tool_to_use.run(tool_input)  # Use `.run()` for TavilySearchResults
-                else:  # Default case (e.g., get_text_length)
-                    observation = tool_to_use.func(tool_input)
-
-            except Exception as e:
-                observation = f"Tool execution failed: {str(e)}"
-
+        if observation is not None:
             print(f"{observation=}")
-            intermediate_steps.append((agent_step, str(observation)))
-
-            # Fallback: If no answer was found, use web search
-            if "I don't know" in observation or "Tool execution failed" in observation:
-                print("Agent could not answer. Using web_search as fallback.")
-                observation = web_search_tool.run(input)  # Call TavilySearchResults tool
-                print(f"Web Search Result: {observation}")        
 
-    if isinstance(agent_step, AgentFinish):
-        print(agent_step.return_values)
\ No newline at end of file
+    executor = ReActExecutor(
+        agent,
+        ToolRegistry(tools),
+        fallback_tool=web_search_tool,
+        speculative_fallback=True,
+        on_step=print_step,
+    )
+    # AGENT_TRACE_PATH=trace.jsonl para guardar los tiempos de cada paso
+    tracer = instrumentation_from_env()
+    result = executor.run(input, callbacks=[tracer] if tracer else None)
+    export_trace(tracer)
+    print(result.return_values)
@@ -1,26 +1,38 @@
 
-from typing import Union, List
-import re
+import argparse
+import asyncio
+import contextlib
+import sys
+from typing import Optional, Union
 
 from langchain.agents import tool
-from langchain.agents.format_scratchpad import format_log_to_str
-from langchain.agents.output_parsers import ReActSingleInputOutputParser
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.schema import AgentAction, AgentFinish
-
-from langchain.tools import Tool
-from langchain.tools.render import render_text_description
-
-from callbacks import AgentCallbackHandler
+from clients import get_chat_model, get_search_tool, warm_up_from_env
+
+from callbacks import AgentCallbackHandler, PrefixCacheMeter, export_trace, instrumentation_from_env
+from safe_math import safe_eval
+from react_prompt import ReActPrompt, build_react_agent
+from llm_cache import llm_cache_from_env
+from agent_executor import ReActExecutor, ToolRegistry, pure_tool_cache
+from budget import budget_from_env
+from hedging import hedged_from_env
+from batch_runner import (
+    BATCH_MAX_ITERATIONS,
+    BATCH_MAX_WORKERS,
+    BatchSummary,
+    BatchWriter,
+    arun_batch,
+    completed_ids,
+    open_output,
+    read_items,
+    run_batch,
+)
 
 # Incluimos la busqueda con TAVILY
-from langchain_community.tools.tavily_search import TavilySearchResults
+from search_cache import cached_search_tool
 
 from dotenv import load_dotenv
 load_dotenv()
 
-import ast   # para el parsing de la tupla de numeros
 
 @tool
 def get_text_length(text: str) -> int:
@@ -52,15 +64,6 @@ def multiplica2(a:Union[float, int], b:Union[float, int]) -> float:
     return a*b
 
 
-def math_operation_old(expression: str) -> float:
-    """
-    Evaluates a mathematical expression given as a string.
-    Supports operations like addition, subtraction, multiplication, and division.
-    Example: "3.14 * 4", "10 / 2", "2 ** 3"
-    """
-    return eval(expression)  # Use eval to evaluate math expressions
-
-
 @tool
 def math_operation(expression: str) -> float:
     """
@@ -75,34 +78,31 @@ def math_operation(expression: str) -> float:
     # Remove unwanted characters like extra quotes or newlines
     expression = expression.strip().strip('"').strip("'").strip("\n")
 
-    # Validate input: only allow numbers, operators, and spaces
-    if not re.match(r'^[\d\s+\-*/().]+$', expression):
-        raise ValueError(f"Invalid characters in expression: {expression}")
-
-    return eval(expression)  # Safe evaluation of the cleaned expression
+    return safe_eval(expression)
 
 
 # Initialize Tavily search tool with k=3 (fetch top 3 results)
 # Since TavilySearchResults is already a LangChain tool, we don't need to wrap it in a @tool decorator.
-web_search_tool = TavilySearchResults(k=3)
-
-def find_tool_by_name(tools: List[Tool], tool_name: str) -> Tool:
-    for tool in tools:
-        if tool.name == tool_name:
-            return tool
-    raise ValueError(f"Tool with name {tool_name} not found")
-
-
-
+web_search_tool = cached_search_tool(get_search_tool(k=3))  # conexiones HTTP compartidas
 
-##############################################################################################
-##                                          MAIN                                            ##
-##############################################################################################
-
-if __name__ == "__main__":
-    print("--------------------- LangChain con REACT  -------------------------------\n\n")
-    print('En que puedo ayudarte? Envia tu pregunta. Para terminar envia "END".')
 
+def build_executor(
+    verbose: bool = True, max_iterations: Optional[int] = None, concurrency: Optional[int] = None
+) -> ReActExecutor:
+    """
+    Build the ReAct agent and its executor.
+
+    Args:
+        verbose:        Print prompts, LLM responses and every step (interactive
+                        mode). The batch mode turns it off.
+        max_iterations: Optional cap on LLM round trips per question.
+        concurrency:    Questions run at once (batch workers), to size the
+                        hedging thread pool.
+
+    Per-question token, tool-call and time limits come from the
+    AGENT_MAX_* variables (budget.budget_from_env()); AGENT_HEDGE=1 hedges
+    slow LLM calls (hedging.hedged_from_env()).
+    """
     tools = [get_text_length, multiplica2, math_operation, web_search_tool]
 
     template = """
@@ -127,28 +127,83 @@ if __name__ == "__main__":
     Thought: {agent_scratchpad}
     """
 
-    prompt = PromptTemplate.from_template(template=template).partial(
-        tools=render_text_description(tools),
-        tool_names=", ".join([t.name for t in tools]),
-    )
+    prompt = ReActPrompt(template, tools, prefix_cache=True)
 
-    llm = ChatOpenAI(
+    llm = get_chat_model(
         model="gpt-4o-mini",
         temperature=0, 
         stop=["\nObservation", "Observation"], 
-        callbacks=[AgentCallbackHandler()]
+        callbacks=[AgentCallbackHandler()] if verbose else None,
+        cache=llm_cache_from_env(),  # AGENT_LLM_CACHE=1 para activarla
     )
 
-    agent = (
-        {
-            "input": lambda x: x["input"],
-            "agent_scratchpad": lambda x: format_log_to_str(x["agent_scratchpad"]),
-        }
-        | prompt
-        | llm
-        | ReActSingleInputOutputParser()
+    # AGENT_HEDGE=1: repite las llamadas lentas al LLM (latencia de cola)
+    agent = build_react_agent(prompt, hedged_from_env(llm, concurrency))
+
+    return ReActExecutor(
+        agent,
+        ToolRegistry(tools),
+        max_iterations=max_iterations,
+        budget=budget_from_env(),
+        fallback_tool=web_search_tool,
+        speculative_fallback=True,
+        on_step=print_step if verbose else None,
     )
 
+
+def print_step(iteration, agent_step, observation):
+    print("---------------------------------------------------------------------")
+    print(f"---- iteration: {iteration}")
+    print(f"---- agent step: {agent_step}")
+    if observation is not None:
+        print(f"{observation=}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Agente ReAct por consola. Sin --batch, modo interactivo."
+    )
+    parser.add_argument(
+        "--batch", metavar="JSONL",
+        help='Fichero JSONL con preguntas ({"id": ..., "input": ...} por línea), o "-" para stdin',
+    )
+    parser.add_argument(
+        "--output", metavar="JSONL",
+        help="Fichero JSONL de respuestas (por defecto, stdout)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=BATCH_MAX_WORKERS,
+        help=f"Preguntas en paralelo (por defecto {BATCH_MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--async", dest="use_async", action="store_true",
+        help="Usar tareas asyncio (executor.arun) en lugar de threads",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continuar una ejecución a medias: salta los ids ya respondidos sin error en --output",
+    )
+    parser.add_argument(
+        "--max-iterations", type=int, default=BATCH_MAX_ITERATIONS,
+        help=f"Máximo de llamadas al LLM por pregunta en modo batch (por defecto {BATCH_MAX_ITERATIONS})",
+    )
+    args = parser.parse_args(argv)
+    if args.resume and not args.output:
+        parser.error("--resume necesita --output")
+    if args.workers < 1:
+        parser.error("--workers debe ser al menos 1")
+    return args
+
+
+def run_interactive(executor: ReActExecutor) -> None:
+    print("--------------------- LangChain con REACT  -------------------------------\n\n")
+    print('En que puedo ayudarte? Envia tu pregunta. Para terminar envia "END".')
+
+    # AGENT_TRACE_PATH=trace.jsonl para guardar los tiempos de cada paso
+    tracer = instrumentation_from_env()
+    # Tokens de prompt servidos desde la caché de prefijo de OpenAI en la sesión
+    prefix_cache = PrefixCacheMeter()
+
     while True:
         # Get user input
         user_input = input("\nUsuario (o sea tu): ")
@@ -158,55 +213,50 @@ if __name__ == "__main__":
             print("Saliendo del agente de LangChain...")
             break
 
-        intermediate_steps = []
-        agent_step = ""
+        callbacks = [prefix_cache] + ([tracer] if tracer else [])
+        result = executor.run(user_input, callbacks=callbacks)
+        export_trace(tracer)
+        print("\nAgent Final Answer:", result.return_values)
+        if result.usage is not None:
+            print("Consumo:", result.usage.as_dict())
+        print("Caché de prefijo:", prefix_cache.summary())
+        print("Caché de tools puras:", pure_tool_cache().stats.as_dict())
+
+
+def run_batch_mode(executor: ReActExecutor, args: argparse.Namespace) -> BatchSummary:
+    # Las respuestas se escriben (y se vuelcan a disco) a medida que terminan
+    skip_ids = completed_ids(args.output) if args.resume else set()
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    output = open_output(args.output, args.resume) if args.output else sys.stdout
+    try:
+        items = read_items(source)
+        writer = BatchWriter(output)
+        # Solo los registros van a stdout: los print() de las tools y callbacks
+        # van a stderr para no romper el JSONL de `> respuestas.jsonl`
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.use_async:
+                return asyncio.run(
+                    arun_batch(executor, items, writer, workers=args.workers, skip_ids=skip_ids)
+                )
+            return run_batch(executor, items, writer, workers=args.workers, skip_ids=skip_ids)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
 
-        
 
-        while not isinstance(agent_step, AgentFinish):
-            agent_step: Union[AgentAction, AgentFinish] = agent.invoke(
-                {
-                    "input": user_input,                
-                    "agent_scratchpad": intermediate_steps,
-                }
-            )
-            print("---------------------------------------------------------------------")
-            print(f"---- len(intermediate_steps): {len(intermediate_steps)}")
-            print(f"---- agent step: {agent_step}")
-
-            if isinstance(agent_step, AgentAction):
-                tool_name = agent_step.tool
-                tool_to_use = find_tool_by_name(tools, tool_name)
-                tool_input = agent_step.tool_input
-
-                try:
-                    # Different parsing for each tool
-                    if tool_name == "multiplica2":
-                        tool_input_parsed = eval(tool_input) if isinstance(tool_input, str) else tool_input
-                        observation = tool_to_use.func(*tool_input_parsed)  # Unpack tuple
-
-                    elif tool_name == "math_operation":
-                        tool_input_cleaned = str(tool_input).strip().strip('"').strip("'").strip("\n")
-                        observation = tool_to_use.func(tool_input_cleaned)  # Pass cleaned expression
-
-                    elif tool_name == "tavily_search_results_json":  # Web search tool
-                        print("Using Tavily web search tool...")
-                        observation = tool_to_use.run(tool_input)  # Use `.run()` for TavilySearchResults
-
-                    else:  # Default case (e.g., get_text_length)
-                        observation = tool_to_use.func(tool_input)
-
-                except Exception as e:
-                    observation = f"Tool execution failed: {str(e)}"
-
-                print(f"{observation=}")
-                intermediate_steps.append((agent_step, str(observation)))
-
-                # Fallback: If no answer was found, use web search
-                if "I don't know" in str(observation) or "Tool execution failed" in str(observation):
-                    print("Agent could not answer. Using web_search as fallback.")
-                    observation = web_search_tool.run(user_input)  # Call TavilySearchResults tool
-                    print(f"Web Search Result: {observation}")        
-
-        if isinstance(agent_step, AgentFinish):
-            print("\nAgent Final Answer:", agent_step.return_values)
+##############################################################################################
+##                                          MAIN                                            ##
+##############################################################################################
+
+if __name__ == "__main__":
+    args = parse_args()
+    warm_up_from_env()  # AGENT_HTTP_WARMUP=1
+
+    if args.batch:
+        # Sin trazas por consola: stdout puede ser el fichero de respuestas
+        summary = run_batch_mode(build_executor(verbose=False, max_iterations=args.max_iterations, concurrency=args.workers), args)
+        print(f"Batch terminado: {summary}", file=sys.stderr)
+    else:
+        run_interactive(build_executor())
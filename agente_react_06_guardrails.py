@@ -14,41 +14,57 @@ Basado en agente_react_06_streamlit.py, con las siguientes mejoras de seguridad:
         por ast.literal_eval() a través de safe_parse_tool_input().
       - Límite de iteraciones del bucle ReAct (MAX_AGENT_ITERATIONS)
         para evitar bucles infinitos.
+      - Presupuesto por ejecución (tokens de prompt, llamadas a tools y
+        segundos, MAX_RUN_*): si se va a superar, el agente se detiene con
+        la mejor respuesta que tenga.
 
   • Layer 3 – Output Guardrails:
       - Detección de contenido bloqueado en la respuesta del agente.
       - Redacción de PII (emails, teléfonos) en la respuesta final.
       - Truncado de respuestas excesivamente largas.
+      - La respuesta se muestra en streaming a través de
+        StreamingOutputGuard: PII redactada aunque llegue partida entre
+        chunks, y corte inmediato del stream si aparece contenido bloqueado.
 
 Ejecución:
     streamlit run agente_react_06_guardrails.py
 """
 
 import streamlit as st
-from typing import Union, List
-import re
+from typing import Union
 import ast
 import logging
 
 from langchain.agents import tool
-from langchain.agents.format_scratchpad import format_log_to_str
-from langchain.agents.output_parsers import ReActSingleInputOutputParser
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.schema import AgentAction, AgentFinish
-from langchain.tools import Tool
-from langchain.tools.render import render_text_description
-from langchain_community.tools.tavily_search import TavilySearchResults
-
-from callbacks import AgentCallbackHandler
+from clients import get_chat_model, get_search_tool, warm_up_from_env
+from search_cache import cached_search_tool
+
+from callbacks import (
+    AgentCallbackHandler,
+    ReActStreamHandler,
+    export_trace,
+    instrumentation_from_env,
+    trace_span,
+)
+from safe_math import safe_eval
+from react_prompt import ReActPrompt, build_react_agent
+from llm_cache import llm_cache_from_env
+from agent_executor import AgentIterationLimitError, ReActExecutor, ToolRegistry
+from budget import RunBudget, budget_from_env
+from session_store import SessionHistory, session_id_from_query_params, session_store_from_env
 from dotenv import load_dotenv
 
 # ── Guardrails (Layer 1, 2 & 3) ────────────────────────────────────────────
 from guardrails import (
     validate_input,
-    safe_parse_tool_input,
     validate_output,
+    StreamingOutputGuard,
+    OutputBlockedError,
+    BLOCKED_OUTPUT_MESSAGE,
     MAX_AGENT_ITERATIONS,
+    MAX_RUN_PROMPT_TOKENS,
+    MAX_RUN_SECONDS,
+    MAX_RUN_TOOL_CALLS,
 )
 
 load_dotenv()
@@ -104,22 +120,13 @@ def math_operation(expression: str) -> float:
     # Remove unwanted characters like extra quotes or newlines
     expression = expression.strip().strip('"').strip("'").strip("\n")
 
-    # Validate input: only allow numbers, operators, and spaces
-    if not re.match(r'^[\d\s+\-*/().]+$', expression):
-        raise ValueError(f"Invalid characters in expression: {expression}")
-
-    return eval(expression)  # Safe: already validated by regex above
+    return safe_eval(expression)
 
 
 # Initialize Tavily search tool with k=3 (fetch top 3 results)
-web_search_tool = TavilySearchResults(k=3)
-
-
-def find_tool_by_name(tools: List[Tool], tool_name: str) -> Tool:
-    for tool in tools:
-        if tool.name == tool_name:
-            return tool
-    raise ValueError(f"Tool with name {tool_name} not found")
+@st.cache_resource
+def load_search_tool():
+    return cached_search_tool(get_search_tool(k=3))  # conexiones HTTP compartidas
 
 
 # ── Setup Streamlit UI ───────────────────────────────────────────────────────
@@ -141,11 +148,15 @@ st.markdown(
 with st.sidebar:
     st.markdown("## 🛡️ Guardrails Activos")
     st.success("✅ **Layer 1 – Input**\n\nValidación de longitud y detección de prompt injection.")
-    st.success("✅ **Layer 2 – Tools**\n\nParsing seguro de argumentos (`ast.literal_eval`).\nLímite de iteraciones del agente.")
+    st.success("✅ **Layer 2 – Tools**\n\nParsing seguro de argumentos (`ast.literal_eval`).\nLímite de iteraciones y presupuesto por consulta.")
     st.success("✅ **Layer 3 – Output**\n\nFiltro de contenido bloqueado, redacción de PII y truncado.")
     st.markdown("---")
     st.caption(f"Máx. entrada: 1 000 caracteres")
     st.caption(f"Máx. iteraciones: {MAX_AGENT_ITERATIONS}")
+    st.caption(
+        f"Presupuesto por consulta: {MAX_RUN_PROMPT_TOKENS} tokens de prompt, "
+        f"{MAX_RUN_TOOL_CALLS} llamadas a tools, {MAX_RUN_SECONDS:.0f} s"
+    )
     st.caption("Máx. respuesta: 4 000 caracteres")
 
     st.markdown("---")
@@ -175,12 +186,25 @@ with st.sidebar:
 
 # ── Store Chat History ───────────────────────────────────────────────────────
 
+@st.cache_resource
+def load_session_store():
+    return session_store_from_env()  # AGENT_SESSION_STORE=sqlite
+
+
+# ?sid=... en la URL: ver session_store.py
+session_store = load_session_store()
+session_id = st.session_state.setdefault("session_id", session_id_from_query_params(st.query_params))
+
 if "messages" not in st.session_state:
-    st.session_state["messages"] = []
+    # Solo los últimos mensajes; los anteriores bajo demanda
+    st.session_state["messages"] = SessionHistory(session_store, session_id)
+else:
+    st.session_state["messages"].refresh()  # solo lo añadido desde el último rerun
 
 
 # ── Define Agent ─────────────────────────────────────────────────────────────
 
+web_search_tool = load_search_tool()
 tools = [get_text_length, multiplica2, math_operation, web_search_tool]
 
 template = """
@@ -205,122 +229,116 @@ Question: {input}
 Thought: {agent_scratchpad}
 """
 
-prompt = PromptTemplate.from_template(template=template).partial(
-    tools=render_text_description(tools),
-    tool_names=", ".join([t.name for t in tools]),
-)
+# Compartido por todas las sesiones: el executor no guarda estado entre ejecuciones
+@st.cache_resource
+def load_executor() -> ReActExecutor:
+    warm_up_from_env()  # AGENT_HTTP_WARMUP=1
+    prompt = ReActPrompt(template, tools, prefix_cache=True)
+
+    llm = get_chat_model(
+        model="gpt-4o-mini",
+        temperature=0,
+        stop=["\nObservation", "Observation"],
+        streaming=True,  # la respuesta final pasa por StreamingOutputGuard mientras llega
+        stream_usage=True,  # tokens consumidos para el presupuesto de cada ejecución
+        callbacks=[AgentCallbackHandler(background=True)],  # sin bloquear en stdout
+        cache=llm_cache_from_env(),  # AGENT_LLM_CACHE=1 para activarla
+    )
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0,
-    stop=["\nObservation", "Observation"],
-    callbacks=[AgentCallbackHandler()],
-)
+    agent = build_react_agent(prompt, llm)
+
+    # multiplica2 arguments go through safe_parse_tool_input() inside the registry.
+    return ReActExecutor(
+        agent,
+        ToolRegistry(tools),
+        max_iterations=MAX_AGENT_ITERATIONS,
+        budget=budget_from_env(
+            RunBudget(
+                max_prompt_tokens=MAX_RUN_PROMPT_TOKENS,
+                max_tool_calls=MAX_RUN_TOOL_CALLS,
+                max_seconds=MAX_RUN_SECONDS,
+            )
+        ),
+        fallback_tool=web_search_tool,
+        speculative_fallback=True,
+    )
 
-agent = (
-    {
-        "input": lambda x: x["input"],
-        "agent_scratchpad": lambda x: format_log_to_str(x["agent_scratchpad"]),
-    }
-    | prompt
-    | llm
-    | ReActSingleInputOutputParser()
-)
+
+executor = load_executor()
 
 
 # ── User Input Box ───────────────────────────────────────────────────────────
 
-user_input_raw = st.text_input("Tu pregunta:", key="input")
+def submit_question():
+    # Una sola vez por pregunta, no en cada rerun
+    st.session_state["pending_input"] = st.session_state["input"]
+    st.session_state["input"] = ""
+
+
+st.text_input("Tu pregunta:", key="input", on_change=submit_question)
+user_input_raw = st.session_state.pop("pending_input", "")
 
 if user_input_raw:
+    # Con AGENT_TRACE_PATH, los tiempos de cada paso se guardan en JSONL
+    tracer = st.session_state.setdefault("tracer", instrumentation_from_env())
+
     # ── LAYER 1: Validate input before touching the agent ────────────────────
     try:
-        user_input = validate_input(user_input_raw)
+        with trace_span(tracer, "guardrail", "validate_input"):
+            user_input = validate_input(user_input_raw)
     except ValueError as validation_error:
         st.error(str(validation_error))
         logger.warning("Input blocked by guardrail: %s", validation_error)
+        export_trace(tracer)
         st.stop()
 
+    # La respuesta se escribe token a token, ya filtrada por la Layer 3
+    answer_placeholder = st.empty()
+    stream_handler = ReActStreamHandler(
+        answer_placeholder, output_guard=StreamingOutputGuard()
+    )
+    callbacks = [stream_handler]
+    if tracer is not None:
+        callbacks.append(tracer)
+
     with st.spinner("Pensando..."):
-        intermediate_steps = []
-        agent_step = ""
-        iteration_count = 0  # ← Layer 2: iteration counter
-
-        while not isinstance(agent_step, AgentFinish):
-
-            # ── LAYER 2: Enforce max iteration limit ─────────────────────────
-            if iteration_count >= MAX_AGENT_ITERATIONS:
-                logger.warning(
-                    "Agent loop reached MAX_AGENT_ITERATIONS (%d). Stopping.",
-                    MAX_AGENT_ITERATIONS,
-                )
-                st.warning(
-                    f"⚠️ El agente alcanzó el límite de {MAX_AGENT_ITERATIONS} "
-                    "iteraciones sin encontrar una respuesta. Por favor, reformula "
-                    "tu pregunta."
-                )
-                st.stop()
-
-            iteration_count += 1
-
-            agent_step: Union[AgentAction, AgentFinish] = agent.invoke(
-                {
-                    "input": user_input,
-                    "agent_scratchpad": intermediate_steps,
-                }
+        try:
+            # ── LAYER 2: Safe parsing, iteration limit and budget: executor ──
+            result = executor.run(user_input, callbacks=callbacks)
+        except AgentIterationLimitError:
+            export_trace(tracer)
+            answer_placeholder.empty()
+            st.warning(
+                f"⚠️ El agente alcanzó el límite de {MAX_AGENT_ITERATIONS} "
+                "iteraciones sin encontrar una respuesta. Por favor, reformula "
+                "tu pregunta."
             )
+            st.stop()
+        except OutputBlockedError:
+            # ── LAYER 3 (streaming): the stream was stopped on blocked content
+            result = None
+
+        if result is not None and result.usage.stopped_by is not None:
+            logger.warning("Run stopped by its budget: %s", result.usage.as_dict())
+
+        # ── LAYER 3: Validate and sanitize output ────────────────────────────
+        with trace_span(tracer, "guardrail", "validate_output"):
+            agent_response = (
+                validate_output(result.output) if result is not None else BLOCKED_OUTPUT_MESSAGE
+            )
+        export_trace(tracer)
+        answer_placeholder.empty()  # la respuesta queda en el historial
 
-            if isinstance(agent_step, AgentAction):
-                tool_name = agent_step.tool
-                tool_to_use = find_tool_by_name(tools, tool_name)
-                tool_input = agent_step.tool_input
-
-                try:
-                    if tool_name == "multiplica2":
-                        # ── LAYER 2: Safe parse – replaces eval(tool_input) ──
-                        tool_input_parsed = safe_parse_tool_input(
-                            tool_name, tool_input
-                        )
-                        if not isinstance(tool_input_parsed, tuple):
-                            tool_input_parsed = (tool_input_parsed,)
-                        observation = tool_to_use.func(*tool_input_parsed)
-
-                    elif tool_name == "math_operation":
-                        tool_input_cleaned = (
-                            str(tool_input).strip().strip('"').strip("'").strip("\n")
-                        )
-                        observation = tool_to_use.func(tool_input_cleaned)
-
-                    elif tool_name == "tavily_search_results_json":
-                        observation = tool_to_use.run(tool_input)
-
-                    else:
-                        observation = tool_to_use.func(tool_input)
-
-                except Exception as e:
-                    observation = f"Tool execution failed: {str(e)}"
-                    logger.error("Tool %s failed: %s", tool_name, e)
-
-                intermediate_steps.append((agent_step, str(observation)))
-
-                # Fallback: If no answer was found, use web search
-                if "I don't know" in str(observation) or "Tool execution failed" in str(observation):
-                    observation = web_search_tool.run(user_input)
-
-        if isinstance(agent_step, AgentFinish):
-            raw_response = agent_step.return_values["output"]
-
-            # ── LAYER 3: Validate and sanitize output ────────────────────────
-            agent_response = validate_output(raw_response)
-
-            # Store conversation history
-            st.session_state["messages"].append({"role": "user", "content": user_input})
-            st.session_state["messages"].append({"role": "assistant", "content": agent_response})
+        # Store conversation history
+        st.session_state["messages"].append({"role": "user", "content": user_input})
+        st.session_state["messages"].append({"role": "assistant", "content": agent_response})
 
 
 # ── Display Chat History ─────────────────────────────────────────────────────
 
 st.markdown("## 💬 Historial del Chat")
+if st.session_state["messages"].has_more and st.button("Cargar mensajes anteriores"):
+    st.session_state["messages"].load_more()
 for message in st.session_state["messages"]:
     if message["role"] == "user":
         st.markdown(f"👤 **Tú:** {message['content']}")
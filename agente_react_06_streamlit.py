@@ -1,19 +1,22 @@
 import streamlit as st
-from typing import Union, List
-import re
-import ast
+from typing import Union
 
 from langchain.agents import tool
-from langchain.agents.format_scratchpad import format_log_to_str
-from langchain.agents.output_parsers import ReActSingleInputOutputParser
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.schema import AgentAction, AgentFinish
-from langchain.tools import Tool
-from langchain.tools.render import render_text_description
-from langchain_community.tools.tavily_search import TavilySearchResults
-
-from callbacks import AgentCallbackHandler
+from clients import get_chat_model, get_search_tool, warm_up_from_env
+from search_cache import cached_search_tool
+
+from callbacks import (
+    AgentCallbackHandler,
+    ReActStreamHandler,
+    export_trace,
+    instrumentation_from_env,
+)
+from safe_math import safe_eval
+from react_prompt import ReActPrompt, build_react_agent
+from llm_cache import llm_cache_from_env
+from agent_executor import ReActExecutor, ToolRegistry
+from budget import budget_from_env
+from session_store import SessionHistory, session_id_from_query_params, session_store_from_env
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -50,15 +53,6 @@ def multiplica2(a:Union[float, int], b:Union[float, int]) -> float:
     return a*b
 
 
-def math_operation_old(expression: str) -> float:
-    """
-    Evaluates a mathematical expression given as a string.
-    Supports operations like addition, subtraction, multiplication, and division.
-    Example: "3.14 * 4", "10 / 2", "2 ** 3"
-    """
-    return eval(expression)  # Use eval to evaluate math expressions
-
-
 @tool
 def math_operation(expression: str) -> float:
     """
@@ -73,24 +67,14 @@ def math_operation(expression: str) -> float:
     # Remove unwanted characters like extra quotes or newlines
     expression = expression.strip().strip('"').strip("'").strip("\n")
 
-    # Validate input: only allow numbers, operators, and spaces
-    if not re.match(r'^[\d\s+\-*/().]+$', expression):
-        raise ValueError(f"Invalid characters in expression: {expression}")
-
-    return eval(expression)  # Safe evaluation of the cleaned expression
+    return safe_eval(expression)
 
 
 # Initialize Tavily search tool with k=3 (fetch top 3 results)
 # Since TavilySearchResults is already a LangChain tool, we don't need to wrap it in a @tool decorator.
-web_search_tool = TavilySearchResults(k=3)
-
-def find_tool_by_name(tools: List[Tool], tool_name: str) -> Tool:
-    for tool in tools:
-        if tool.name == tool_name:
-            return tool
-    raise ValueError(f"Tool with name {tool_name} not found")
-
-
+@st.cache_resource
+def load_search_tool():
+    return cached_search_tool(get_search_tool(k=3))  # conexiones HTTP compartidas
 
 
 # ---- Setup Streamlit UI ----
@@ -102,11 +86,24 @@ st.markdown("### Chat con un Agente de IA!")
 st.markdown("Escribe la pregunta y pulsa Enter.")
 
 # ---- Store Chat History ----
+@st.cache_resource
+def load_session_store():
+    return session_store_from_env()  # AGENT_SESSION_STORE=sqlite
+
+
+# ?sid=... en la URL: ver session_store.py
+session_store = load_session_store()
+session_id = st.session_state.setdefault("session_id", session_id_from_query_params(st.query_params))
+
 if "messages" not in st.session_state:
-    st.session_state["messages"] = []
+    # Solo los últimos mensajes; los anteriores bajo demanda
+    st.session_state["messages"] = SessionHistory(session_store, session_id)
+else:
+    st.session_state["messages"].refresh()  # solo lo añadido desde el último rerun
 
 # ---- Define Agent ----
 
+web_search_tool = load_search_tool()
 tools = [get_text_length, multiplica2, math_operation, web_search_tool] # se incluye web_search_tool para que el agente pueda usarlo    
 
 template = """
@@ -131,83 +128,74 @@ Question: {input}
 Thought: {agent_scratchpad}
 """
 
-prompt = PromptTemplate.from_template(template=template).partial(
-    tools=render_text_description(tools),
-    tool_names=", ".join([t.name for t in tools]),
-)
+# ---- Recursos compartidos por todas las sesiones ----
+@st.cache_resource
+def load_agent():
+    warm_up_from_env()  # AGENT_HTTP_WARMUP=1
+    prompt = ReActPrompt(template, tools, prefix_cache=True)
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",  # "gpt-4o-mini" or "deepseek-R1
-    temperature=0, 
-    stop=["\nObservation", "Observation"], 
-    callbacks=[AgentCallbackHandler()]
-)
+    llm = get_chat_model(
+        model="gpt-4o-mini",  # "gpt-4o-mini" or "deepseek-R1
+        temperature=0, 
+        stop=["\nObservation", "Observation"], 
+        streaming=True,  # tokens llegan a ReActStreamHandler mientras se generan
+        stream_usage=True,  # tokens consumidos para el presupuesto de cada ejecución
+        callbacks=[AgentCallbackHandler(background=True)],  # sin bloquear en stdout
+        cache=llm_cache_from_env(),  # AGENT_LLM_CACHE=1 para activarla
+    )
 
-agent = (
-    {
-        "input": lambda x: x["input"],
-        "agent_scratchpad": lambda x: format_log_to_str(x["agent_scratchpad"]),
-    }
-    | prompt
-    | llm
-    | ReActSingleInputOutputParser()
-)
+    return build_react_agent(prompt, llm), ToolRegistry(tools)
+
+
+agent, registry = load_agent()
 
 # ---- User Input Box ----
-user_input = st.text_input("Su pregunta:", key="input")
+def submit_question():
+    # Una sola vez por pregunta, no en cada rerun
+    st.session_state["pending_input"] = st.session_state["input"]
+    st.session_state["input"] = ""
+
+
+st.text_input("Su pregunta:", key="input", on_change=submit_question)
+user_input = st.session_state.pop("pending_input", "")
 
 if user_input:
-    with st.spinner("Pensando..."):
-        intermediate_steps = []
-        agent_step = ""
-
-        while not isinstance(agent_step, AgentFinish):
-            agent_step: Union[AgentAction, AgentFinish] = agent.invoke(
-                {
-                    "input": user_input,                
-                    "agent_scratchpad": intermediate_steps,
-                }
-            )
-            
-            if isinstance(agent_step, AgentAction):
-                tool_name = agent_step.tool
-                tool_to_use = find_tool_by_name(tools, tool_name)
-                tool_input = agent_step.tool_input
-
-                try:
-                    # Different parsing for each tool
-                    if tool_name == "multiplica2":
-                        tool_input_parsed = eval(tool_input) if isinstance(tool_input, str) else tool_input
-                        observation = tool_to_use.func(*tool_input_parsed)  # Unpack tuple
-
-                    elif tool_name == "math_operation":
-                        tool_input_cleaned = str(tool_input).strip().strip('"').strip("'").strip("\n")
-                        observation = tool_to_use.func(tool_input_cleaned)  # Pass cleaned expression
-
-                    elif tool_name == "tavily_search_results_json":  # Web search tool
-                        observation = tool_to_use.run(tool_input)  # Use `.run()` for TavilySearchResults
-
-                    else:  # Default case (e.g., get_text_length)
-                        observation = tool_to_use.func(tool_input)
-
-                except Exception as e:
-                    observation = f"Tool execution failed: {str(e)}"
-
-                intermediate_steps.append((agent_step, str(observation)))
-
-                # Fallback: If no answer was found, use web search
-                if "I don't know" in str(observation) or "Tool execution failed" in str(observation):
-                    observation = web_search_tool.run(user_input)  # Call TavilySearchResults tool
-
-        if isinstance(agent_step, AgentFinish):
-            agent_response = agent_step.return_values["output"]
-            
-            # Store conversation history
-            st.session_state["messages"].append({"role": "user", "content": user_input})
-            st.session_state["messages"].append({"role": "assistant", "content": agent_response})
+    # Thought/Action/Observation en vivo en un panel plegable; la respuesta
+    # final se escribe token a token debajo
+    status = st.status("Pensando...", expanded=False)
+    answer_placeholder = st.empty()
+
+    def show_observation(iteration, agent_step, observation):
+        if observation is not None:
+            status.markdown(f"**Observation:** {observation}")
+
+    executor = ReActExecutor(
+        agent,
+        registry,
+        fallback_tool=registry.get(web_search_tool.name).tool,
+        speculative_fallback=True,
+        on_step=show_observation,
+        budget=budget_from_env(),  # AGENT_MAX_PROMPT_TOKENS, AGENT_MAX_SECONDS, ...
+    )
+    # Con AGENT_TRACE_PATH, los tiempos de cada paso se guardan en JSONL
+    tracer = st.session_state.setdefault("tracer", instrumentation_from_env())
+    callbacks = [ReActStreamHandler(answer_placeholder, status)]
+    if tracer is not None:
+        callbacks.append(tracer)
+    result = executor.run(user_input, callbacks=callbacks)
+    export_trace(tracer)
+    agent_response = result.output
+    status.update(label="Razonamiento completado", state="complete")
+    answer_placeholder.empty()  # la respuesta queda en el historial
+
+    # Store conversation history
+    st.session_state["messages"].append({"role": "user", "content": user_input})
+    st.session_state["messages"].append({"role": "assistant", "content": agent_response})
 
 # ---- Display Chat History ----
 st.markdown("## Chat History")
+if st.session_state["messages"].has_more and st.button("Cargar mensajes anteriores"):
+    st.session_state["messages"].load_more()
 for message in st.session_state["messages"]:
     if message["role"] == "user":
         st.markdown(f"👤 **Tu:** {message['content']}")
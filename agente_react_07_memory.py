@@ -1,26 +1,34 @@
 import streamlit as st
-from typing import Union, List
-import re
-import ast
-
-from langchain.agents import tool
-from langchain.agents.format_scratchpad import format_log_to_str
-from langchain.agents.output_parsers import ReActSingleInputOutputParser
-from langchain.memory import ConversationBufferMemory
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.schema import AgentAction, AgentFinish
-from langchain.tools import Tool
-from langchain.tools.render import render_text_description
-from langchain_community.tools.tavily_search import TavilySearchResults
-
-from callbacks import AgentCallbackHandler
+
+from clients import get_chat_model, warm_up_from_env
+
+from callbacks import (
+    AgentCallbackHandler,
+    PrefixCacheMeter,
+    ReActStreamHandler,
+    export_trace,
+    instrumentation_from_env,
+    trace_span,
+)
+from react_prompt import ReActPrompt, build_react_agent
+from llm_cache import llm_cache_from_env
+from agent_executor import ReActExecutor, ToolRegistry, pure_tool_cache
+from budget import budget_from_env
+from memory import MEMORY_MAX_TOKENS, MEMORY_MAX_TURNS, TokenBudgetMemory, llm_summarizer
+from session_store import (
+    SessionHistory,
+    persist_memory,
+    persist_summaries,
+    restore_memory,
+    session_id_from_query_params,
+    session_store_from_env,
+)
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-from mis_tools import get_text_length, multiplica2, math_operation, web_search_tool, find_tool_by_name
+from mis_tools import get_text_length, multiplica2, math_operation, web_search_tool
 
 
 # ---- Define the tools ----
@@ -36,15 +44,43 @@ st.markdown("### Chat con un Agente de IA con Memoria Conversacional! 🚀")
 st.markdown("Este agente recuerda las conversaciones anteriores. Escribe tu pregunta y pulsa Enter.")
 
 # ---- Initialize Memory ----
+@st.cache_resource
+def load_summarizer():
+    # LLM sin stop words ni streaming, compartido por todas las sesiones
+    return llm_summarizer(
+        get_chat_model(model="gpt-4o-mini", temperature=0, cache=llm_cache_from_env())
+    )
+
+
+@st.cache_resource
+def load_session_store():
+    return session_store_from_env()  # AGENT_SESSION_STORE=sqlite
+
+
+# ?sid=... en la URL: ver session_store.py
+session_store = load_session_store()
+session_id = st.session_state.setdefault("session_id", session_id_from_query_params(st.query_params))
+
 if "memory" not in st.session_state:
-    # Inicializar la memoria conversacional
-    st.session_state["memory"] = ConversationBufferMemory(
+    # Memoria acotada: los últimos MEMORY_MAX_TURNS turnos literales y un
+    # resumen de los anteriores, calculado en segundo plano. El historial
+    # nunca pasa de MEMORY_MAX_TOKENS, así que el prompt no crece con la sesión.
+    st.session_state["memory"] = TokenBudgetMemory(
+        load_summarizer(),
+        max_turns=MEMORY_MAX_TURNS,
+        max_tokens=MEMORY_MAX_TOKENS,
         memory_key="chat_history",
-        return_messages=False  # Retornar como string, no como lista de mensajes
     )
+    # El resumen se calcula en segundo plano: se guarda también cuando llega
+    persist_summaries(session_store, session_id, st.session_state["memory"])
+# Solo se carga si otra réplica (o una ejecución anterior) guardó una más nueva
+restore_memory(session_store, session_id, st.session_state["memory"])
 
 if "messages" not in st.session_state:
-    st.session_state["messages"] = []
+    # Solo los últimos mensajes; los anteriores bajo demanda
+    st.session_state["messages"] = SessionHistory(session_store, session_id)
+else:
+    st.session_state["messages"].refresh()  # solo lo añadido desde el último rerun
 
 # ---- Define Agent ----
 
@@ -75,98 +111,93 @@ Current Question: {input}
 Thought: {agent_scratchpad}
 """
 
-prompt = PromptTemplate.from_template(template=template).partial(
-    tools=render_text_description(tools),
-    tool_names=", ".join([t.name for t in tools]),
-)
+# ---- Recursos compartidos por todas las sesiones ----
+@st.cache_resource
+def load_agent():
+    warm_up_from_env()  # AGENT_HTTP_WARMUP=1
+    prompt = ReActPrompt(template, tools, prefix_cache=True)
+
+    llm = get_chat_model(
+        model="gpt-4o-mini",
+        temperature=0, 
+        stop=["\nObservation", "Observation"], 
+        streaming=True,  # tokens llegan a ReActStreamHandler mientras se generan
+        stream_usage=True,  # tokens consumidos para el presupuesto de cada ejecución
+        callbacks=[AgentCallbackHandler(background=True)],  # sin bloquear en stdout
+        cache=llm_cache_from_env(),  # AGENT_LLM_CACHE=1 para activarla
+    )
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0, 
-    stop=["\nObservation", "Observation"], 
-    callbacks=[AgentCallbackHandler()]
-)
+    # Pipeline del agente - NO acceder a st.session_state dentro de lambdas
+    # El chat_history se pasa directamente cuando se invoca el agente
+    return build_react_agent(prompt, llm), ToolRegistry(tools)
 
-# Pipeline del agente - NO acceder a st.session_state dentro de lambdas
-# El chat_history se pasa directamente cuando se invoca el agente
-agent = (
-    {
-        "input": lambda x: x["input"],
-        "agent_scratchpad": lambda x: format_log_to_str(x["agent_scratchpad"]),
-        "chat_history": lambda x: x.get("chat_history", ""),  # Obtener del input, no de session_state
-    }
-    | prompt
-    | llm
-    | ReActSingleInputOutputParser()
-)
+
+agent, registry = load_agent()
 
 # ---- User Input Box ----
-user_input = st.text_input("Tu pregunta:", key="input")
+def submit_question():
+    # Una sola vez por pregunta, no en cada rerun
+    st.session_state["pending_input"] = st.session_state["input"]
+    st.session_state["input"] = ""
+
+
+st.text_input("Tu pregunta:", key="input", on_change=submit_question)
+user_input = st.session_state.pop("pending_input", "")
 st.markdown("### Chat con un Agente de IA con Memoria! 🚀")
 if user_input:
-    with st.spinner("Pensando..."):
-        intermediate_steps = []
-        agent_step = ""
-
-        while not isinstance(agent_step, AgentFinish):
-            # Obtener el historial actual de la memoria
-            memory_vars = st.session_state["memory"].load_memory_variables({})
-            chat_history = memory_vars.get("chat_history", "")
-            
-            agent_step: Union[AgentAction, AgentFinish] = agent.invoke(
-                {
-                    "input": user_input,                
-                    "agent_scratchpad": intermediate_steps,
-                    "chat_history": chat_history,
-                }
-            )
-            
-            if isinstance(agent_step, AgentAction):
-                tool_name = agent_step.tool
-                tool_to_use = find_tool_by_name(tools, tool_name)
-                tool_input = agent_step.tool_input
-
-                try:
-                    # Different parsing for each tool
-                    if tool_name == "multiplica2":
-                        tool_input_parsed = eval(tool_input) if isinstance(tool_input, str) else tool_input
-                        observation = tool_to_use.func(*tool_input_parsed)  # Unpack tuple
-
-                    elif tool_name == "math_operation":
-                        tool_input_cleaned = str(tool_input).strip().strip('"').strip("'").strip("\n")
-                        observation = tool_to_use.func(tool_input_cleaned)  # Pass cleaned expression
-
-                    elif tool_name == "tavily_search_results_json":  # Web search tool
-                        observation = tool_to_use.run(tool_input)  # Use `.run()` for TavilySearchResults
-
-                    else:  # Default case (e.g., get_text_length)
-                        observation = tool_to_use.func(tool_input)
-
-                except Exception as e:
-                    observation = f"Tool execution failed: {str(e)}"
-
-                intermediate_steps.append((agent_step, str(observation)))
-
-                # Fallback: If no answer was found, use web search
-                if "I don't know" in str(observation) or "Tool execution failed" in str(observation):
-                    observation = web_search_tool.run(user_input)  # Call TavilySearchResults tool
-
-        if isinstance(agent_step, AgentFinish):
-            agent_response = agent_step.return_values["output"]
-            
-            # Almacenar historial de conversación para visualización
-            st.session_state["messages"].append({"role": "user", "content": user_input})
-            st.session_state["messages"].append({"role": "assistant", "content": agent_response})
-
-            # Actualizar memoria con la nueva interacción
-            # Esto permite que el agente recuerde conversaciones previas
-            st.session_state["memory"].save_context(
-                {"input": user_input},
-                {"output": agent_response}
-            )
+    # Thought/Action/Observation en vivo en un panel plegable; la respuesta
+    # final se escribe token a token debajo
+    status = st.status("Pensando...", expanded=False)
+    answer_placeholder = st.empty()
+
+    def show_observation(iteration, agent_step, observation):
+        if observation is not None:
+            status.markdown(f"**Observation:** {observation}")
+
+    # Con AGENT_TRACE_PATH, los tiempos de cada paso se guardan en JSONL
+    tracer = st.session_state.setdefault("tracer", instrumentation_from_env())
+
+    # Obtener el historial actual de la memoria (una vez por turno; el bucle
+    # ReAct reutiliza el mismo texto en cada iteración)
+    with trace_span(tracer, "memory", "load_memory_variables"):
+        memory_vars = st.session_state["memory"].load_memory_variables({})
+    chat_history = memory_vars.get("chat_history", "")
+
+    executor = ReActExecutor(
+        agent,
+        registry,
+        fallback_tool=web_search_tool,
+        speculative_fallback=True,
+        on_step=show_observation,
+        budget=budget_from_env(),  # AGENT_MAX_PROMPT_TOKENS, AGENT_MAX_SECONDS, ...
+    )
+    prefix_cache = st.session_state.setdefault("prefix_cache", PrefixCacheMeter())
+    callbacks = [ReActStreamHandler(answer_placeholder, status), prefix_cache]
+    if tracer is not None:
+        callbacks.append(tracer)
+    result = executor.run(user_input, callbacks=callbacks, chat_history=chat_history)
+    agent_response = result.output
+    status.update(label="Razonamiento completado", state="complete")
+    answer_placeholder.empty()  # la respuesta queda en el historial
+
+    # Almacenar historial de conversación para visualización
+    st.session_state["messages"].append({"role": "user", "content": user_input})
+    st.session_state["messages"].append({"role": "assistant", "content": agent_response})
+
+    # Actualizar memoria con la nueva interacción
+    # Esto permite que el agente recuerde conversaciones previas
+    with trace_span(tracer, "memory", "save_context"):
+        st.session_state["memory"].save_context(
+            {"input": user_input},
+            {"output": agent_response}
+        )
+        persist_memory(session_store, session_id, st.session_state["memory"])
+    export_trace(tracer)
 
 # ---- Display Chat History ----
 st.markdown("## Historial de Conversación")
+if st.session_state["messages"].has_more and st.button("Cargar mensajes anteriores"):
+    st.session_state["messages"].load_more()
 for message in st.session_state["messages"]:
     if message["role"] == "user":
         st.markdown(f"👤 **Tú:** {message['content']}")
@@ -179,4 +210,9 @@ with st.expander("🔍 Información de Memoria (Debug)"):
     st.text(f"Memoria activa: {len(memory_vars.get('chat_history', '')) > 0}")
     if memory_vars.get("chat_history"):
         st.text_area("Contenido de la memoria:", memory_vars["chat_history"], height=200)
+    if "prefix_cache" in st.session_state:
+        st.json(st.session_state["prefix_cache"].summary())  # caché de prefijo del proveedor
+    # get_text_length, multiplica2 y math_operation: resultados compartidos por todas las sesiones
+    st.text("Caché de tools puras:")
+    st.json(pure_tool_cache().stats.as_dict())
 
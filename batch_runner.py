@@ -0,0 +1,333 @@
+"""
+batch_runner.py
+───────────────
+Run many questions through a ReActExecutor (nightly evaluations,
+backfills) instead of one question at a time from input().
+
+  • Questions are streamed from a JSONL file or stdin; only the runs in
+    flight are held in memory.
+  • A pool of workers runs them: threads calling executor.run(), or
+    asyncio tasks awaiting executor.arun().
+  • Each result is written to the output JSONL as soon as it finishes
+    (completion order, not input order) and flushed, so a killed run
+    loses at most the questions in flight.
+  • completed_ids() reads a partial output file, so a second run can skip
+    what already succeeded (failed questions are run again).
+
+Input lines are JSON objects with "input" (or "question") and an optional
+"id"; a bare JSON string is also accepted. Without an id the line number
+is used. An invalid line gets an error record and the batch goes on. Output lines:
+
+    {"id": "q-1", "input": "...", "output": "...", "iterations": 2,
+     "steps": 1, "tools": ["math_operation"], "seconds": 1.84, "error": null,
+     "usage": {"prompt_tokens": 812, "completion_tokens": 41, ...}}
+
+"usage" is the BudgetUsage of the run (null when the executor has no
+budget); "usage.stopped_by" tells which limit cut a question short.
+
+Usage:
+    from batch_runner import BatchWriter, completed_ids, open_output, read_items, run_batch
+
+    with open("questions.jsonl") as src, open_output("answers.jsonl", resume=True) as out:
+        summary = run_batch(
+            executor, read_items(src), BatchWriter(out),
+            workers=8, skip_ids=completed_ids("answers.jsonl"),
+        )
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, Iterable, Iterator, Optional, Set, TextIO
+
+from callbacks import export_trace, instrumentation_from_env
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_WORKERS: int = 4
+
+# Default cap on LLM round trips per question: with nobody watching, one
+# looping question should fail instead of burning tokens all night.
+BATCH_MAX_ITERATIONS: int = 10
+
+
+class BatchInputError(ValueError):
+    """A line of the batch input is not a valid question."""
+
+
+@dataclass
+class BatchItem:
+    """One question of the batch; `error` is set for an invalid input line."""
+
+    id: str
+    input: str
+    error: Optional[BatchInputError] = None
+
+
+@dataclass
+class BatchSummary:
+    """Counters of one run_batch() / arun_batch() call."""
+
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.succeeded} ok, {self.failed} failed, {self.skipped} skipped "
+            f"in {self.seconds:.1f}s"
+        )
+
+
+# ─────────────────────────────────────────────
+# Input / output
+# ─────────────────────────────────────────────
+
+
+def read_items(lines: Iterable[str]) -> Iterator[BatchItem]:
+    """
+    Parse batch input lazily; blank lines are ignored.
+
+    A line that is not JSON or has no question is yielded with `error`
+    set (a BatchInputError), so the runners write an error record for it
+    and go on with the rest of the batch.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield BatchItem(
+                id=str(line_number),
+                input=line.strip(),
+                error=BatchInputError(f"Line {line_number}: invalid JSON ({e})"),
+            )
+            continue
+        if isinstance(data, str):
+            data = {"input": data}
+        question = data.get("input", data.get("question")) if isinstance(data, dict) else None
+        item_id = str(data.get("id", line_number)) if isinstance(data, dict) else str(line_number)
+        if not isinstance(question, str) or not question.strip():
+            yield BatchItem(
+                id=item_id,
+                input=line.strip(),
+                error=BatchInputError(f"Line {line_number}: expected an 'input' or 'question' string"),
+            )
+            continue
+        yield BatchItem(id=item_id, input=question)
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids already answered without error in an output file (for resuming).
+
+    A missing file means nothing is done yet. A truncated last line (the
+    previous run was killed mid-write) is ignored.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("error") is None:
+                done.add(str(record.get("id")))
+            else:
+                done.discard(str(record.get("id")))
+    return done
+
+
+def open_output(path: str, resume: bool = False) -> TextIO:
+    """
+    Open the output JSONL: appending when resuming, truncating otherwise.
+
+    When resuming a file that ends in a partial line (killed run), a
+    newline is added first so the next record starts on its own line.
+    """
+    ends_mid_line = False
+    if resume and os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            ends_mid_line = f.read(1) != b"\n"
+    stream = open(path, "a" if resume else "w", encoding="utf-8")
+    if ends_mid_line:
+        stream.write("\n")
+    return stream
+
+
+class BatchWriter:
+    """Thread-safe JSONL writer; each record is flushed as it is written."""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+# ─────────────────────────────────────────────
+# Runners
+# ─────────────────────────────────────────────
+
+
+def _record(
+    item: BatchItem,
+    started: float,
+    result: Any = None,
+    error: Optional[Exception] = None,
+) -> Dict[str, Any]:
+    steps = result.intermediate_steps if result is not None else []
+    usage = result.usage if result is not None else None
+    return {
+        "id": item.id,
+        "input": item.input,
+        "output": result.output if result is not None else None,
+        "iterations": result.iterations if result is not None else 0,
+        "steps": len(steps),
+        "tools": [action.tool for action, _ in steps],
+        "seconds": round(time.perf_counter() - started, 3),
+        "error": f"{type(error).__name__}: {error}" if error is not None else None,
+        "usage": usage.as_dict() if usage is not None else None,
+    }
+
+
+def run_item(executor, item: BatchItem) -> Dict[str, Any]:
+    """
+    Run one question; failures become a record with "error" set.
+
+    With AGENT_TRACE_PATH set, its spans are exported with the item id as
+    session id.
+    """
+    started = time.perf_counter()
+    tracer = instrumentation_from_env(item.id)
+    try:
+        return _record(
+            item, started, executor.run(item.input, callbacks=[tracer] if tracer else None)
+        )
+    except Exception as e:
+        logger.error("Batch item %s failed: %s", item.id, e)
+        return _record(item, started, error=e)
+    finally:
+        export_trace(tracer)
+
+
+async def arun_item(executor, item: BatchItem) -> Dict[str, Any]:
+    """Async run_item()."""
+    started = time.perf_counter()
+    tracer = instrumentation_from_env(item.id)
+    try:
+        return _record(
+            item, started, await executor.arun(item.input, callbacks=[tracer] if tracer else None)
+        )
+    except Exception as e:
+        logger.error("Batch item %s failed: %s", item.id, e)
+        return _record(item, started, error=e)
+    finally:
+        export_trace(tracer)
+
+
+def _skip_or_reject(
+    item: BatchItem, summary: BatchSummary, writer: BatchWriter, skip_ids: Collection[str]
+) -> bool:
+    """True if `item` is not run: already done, or an invalid line (error record)."""
+    if item.id in skip_ids:
+        summary.skipped += 1
+        return True
+    if item.error is not None:
+        logger.error("Batch item %s rejected: %s", item.id, item.error)
+        _count(summary, _record(item, time.perf_counter(), error=item.error), writer)
+        return True
+    return False
+
+
+def _count(summary: BatchSummary, record: Dict[str, Any], writer: BatchWriter) -> None:
+    writer.write(record)
+    if record["error"] is None:
+        summary.succeeded += 1
+    else:
+        summary.failed += 1
+
+
+def run_batch(
+    executor,
+    items: Iterable[BatchItem],
+    writer: BatchWriter,
+    *,
+    workers: int = BATCH_MAX_WORKERS,
+    skip_ids: Collection[str] = (),
+) -> BatchSummary:
+    """
+    Run `items` on a thread pool and write each record as it finishes.
+
+    Args:
+        executor: ReActExecutor (run() must be safe to call from several
+                  threads, which it is: the loop state is per call).
+        items:    Questions, e.g. read_items(file); consumed lazily.
+        writer:   Destination of the records.
+        workers:  Questions in flight at the same time.
+        skip_ids: Ids to skip (see completed_ids()).
+
+    Returns:
+        BatchSummary with the counters and the wall time.
+    """
+    summary = BatchSummary()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="react-batch") as pool:
+        in_flight: set = set()
+        for item in items:
+            if _skip_or_reject(item, summary, writer, skip_ids):
+                continue
+            if len(in_flight) >= workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _count(summary, future.result(), writer)
+            in_flight.add(pool.submit(run_item, executor, item))
+        for future in as_completed(in_flight):
+            _count(summary, future.result(), writer)
+    summary.seconds = time.perf_counter() - started
+    return summary
+
+
+async def arun_batch(
+    executor,
+    items: Iterable[BatchItem],
+    writer: BatchWriter,
+    *,
+    workers: int = BATCH_MAX_WORKERS,
+    skip_ids: Collection[str] = (),
+) -> BatchSummary:
+    """
+    run_batch() on asyncio: up to `workers` executor.arun() tasks in flight.
+
+    `items` is read on the event loop thread; a file or a pipe that keeps
+    up is fine, a slow producer delays the writes of finished tasks.
+    """
+    summary = BatchSummary()
+    started = time.perf_counter()
+    in_flight: set = set()
+    for item in items:
+        if _skip_or_reject(item, summary, writer, skip_ids):
+            continue
+        if len(in_flight) >= workers:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                _count(summary, task.result(), writer)
+        in_flight.add(asyncio.ensure_future(arun_item(executor, item)))
+    for next_done in asyncio.as_completed(in_flight):
+        _count(summary, await next_done, writer)
+    summary.seconds = time.perf_counter() - started
+    return summary
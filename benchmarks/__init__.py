@@ -0,0 +1,12 @@
+"""
+benchmarks
+──────────
+Offline micro-benchmarks for the agent's own overhead (no OpenAI/Tavily).
+
+Run each one from the repository root, e.g.:
+    python -m benchmarks.bench_scratchpad
+
+suite.py runs every overhead scenario at once and compares against a
+saved baseline:
+    python -m benchmarks.suite --compare .cache/bench_baseline.json
+"""
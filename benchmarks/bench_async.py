@@ -0,0 +1,58 @@
+"""
+Throughput of ReActExecutor.arun() as the number of concurrent sessions grows.
+
+Every session runs the three-step DEFAULT_SCRIPT against a fake LLM with a
+fixed latency. Blocking tools run in the thread pool, so throughput should
+scale with concurrency until the event loop itself becomes the bottleneck.
+
+    python -m benchmarks.bench_async
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agent_executor import ReActExecutor, ToolRegistry
+from benchmarks.fakes import FakeReActChatModel
+from mis_tools import get_text_length, math_operation, multiplica2
+from react_prompt import ReActPrompt, build_react_agent
+
+TEMPLATE = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format: Thought / Action [{tool_names}] / Action Input / Observation / Final Answer
+
+Question: {input}
+Thought: {agent_scratchpad}
+"""
+
+LLM_LATENCY = 0.05
+CONCURRENCY = (1, 10, 100, 500)
+
+
+async def _run_sessions(executor: ReActExecutor, sessions: int) -> float:
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(executor.arun(f"Pregunta {i}") for i in range(sessions))
+    )
+    elapsed = time.perf_counter() - start
+    assert all(r.output == "21.98" for r in results)
+    return elapsed
+
+
+def main() -> None:
+    tools = [get_text_length, multiplica2, math_operation]
+    llm = FakeReActChatModel(latency=LLM_LATENCY)
+    agent = build_react_agent(ReActPrompt(TEMPLATE, tools), llm)
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        executor = ReActExecutor(agent, ToolRegistry(tools), tool_executor=pool)
+        print(f"{'sessions':>9} {'wall (s)':>9} {'sessions/s':>11}")
+        for sessions in CONCURRENCY:
+            elapsed = asyncio.run(_run_sessions(executor, sessions))
+            print(f"{sessions:>9} {elapsed:>9.2f} {sessions / elapsed:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
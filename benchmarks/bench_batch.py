@@ -0,0 +1,79 @@
+"""
+Throughput of the batch mode (batch_runner) by number of workers.
+
+QUESTIONS questions, each running the three-step DEFAULT_SCRIPT against a
+fake LLM with a fixed latency, are streamed through run_batch() (threads)
+and arun_batch() (asyncio). One worker is the old one-question-at-a-time
+CLI. The last row resumes a run that was stopped halfway.
+
+    python -m benchmarks.bench_batch
+"""
+
+import asyncio
+import io
+import json
+import time
+
+from agent_executor import ReActExecutor, ToolRegistry
+from batch_runner import BatchWriter, arun_batch, read_items, run_batch
+from benchmarks.fakes import FakeReActChatModel
+from mis_tools import get_text_length, math_operation, multiplica2
+from react_prompt import ReActPrompt, build_react_agent
+
+TEMPLATE = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format: Thought / Action [{tool_names}] / Action Input / Observation / Final Answer
+
+Question: {input}
+Thought: {agent_scratchpad}
+"""
+
+LLM_LATENCY = 0.05
+QUESTIONS = 200
+WORKERS = (1, 8, 32)
+
+
+def _input_lines():
+    return [json.dumps({"id": f"q-{i}", "input": f"Pregunta {i}"}) for i in range(QUESTIONS)]
+
+
+def _check(output: io.StringIO, expected: int) -> None:
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert len(records) == expected
+    assert all(r["error"] is None and r["output"] == "21.98" for r in records)
+
+
+def main() -> None:
+    tools = [get_text_length, multiplica2, math_operation]
+    agent = build_react_agent(ReActPrompt(TEMPLATE, tools), FakeReActChatModel(latency=LLM_LATENCY))
+    executor = ReActExecutor(agent, ToolRegistry(tools))
+
+    print(f"{'mode':<24} {'workers':>8} {'wall (s)':>9} {'questions/s':>12}")
+    for workers in WORKERS:
+        for mode in ("threads", "asyncio"):
+            output = io.StringIO()
+            items = read_items(_input_lines())
+            if mode == "threads":
+                summary = run_batch(executor, items, BatchWriter(output), workers=workers)
+            else:
+                summary = asyncio.run(arun_batch(executor, items, BatchWriter(output), workers=workers))
+            _check(output, QUESTIONS)
+            print(f"{mode:<24} {workers:>8} {summary.seconds:>9.2f} {QUESTIONS / summary.seconds:>12.1f}")
+
+    done = {f"q-{i}" for i in range(QUESTIONS // 2)}
+    output = io.StringIO()
+    start = time.perf_counter()
+    summary = run_batch(
+        executor, read_items(_input_lines()), BatchWriter(output), workers=WORKERS[-1], skip_ids=done
+    )
+    _check(output, QUESTIONS - len(done))
+    assert summary.skipped == len(done)
+    elapsed = time.perf_counter() - start
+    ran = QUESTIONS - len(done)
+    print(f"{'threads (resume 50%)':<24} {WORKERS[-1]:>8} {elapsed:>9.2f} {ran / elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cost and latency of a runaway ReAct loop, with and without a RunBudget.
+
+RUNS questions go through a fake LLM with a fixed latency. Most of them
+finish in three tool calls; one in RUNAWAY_EVERY keeps calling tools
+until MAX_ITERATIONS stops it (AgentIterationLimitError). With a budget
+the runaway questions stop early with a best-effort answer, which cuts
+the tokens spent and the tail latency.
+
+    python -m benchmarks.bench_budget
+"""
+
+import statistics
+import time
+
+from agent_executor import AgentIterationLimitError, ReActExecutor, ToolRegistry
+from benchmarks.fakes import FakeReActChatModel, react_script
+from budget import RunBudget
+from callbacks import InstrumentationHandler
+from mis_tools import get_text_length, math_operation, multiplica2
+from react_prompt import ReActPrompt, build_react_agent
+
+TEMPLATE = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format: Thought / Action [{tool_names}] / Action Input / Observation / Final Answer
+
+Question: {input}
+Thought: {agent_scratchpad}
+"""
+
+LLM_LATENCY = 0.01
+RUNS = 100
+RUNAWAY_EVERY = 10
+MAX_ITERATIONS = 30
+BUDGET = RunBudget(max_prompt_tokens=4_000, max_tool_calls=8, max_seconds=5)
+
+
+def _executors(budget):
+    tools = [get_text_length, multiplica2, math_operation]
+    normal, runaway = (
+        ReActExecutor(
+            build_react_agent(
+                ReActPrompt(TEMPLATE, tools),
+                FakeReActChatModel(script=react_script(steps), latency=LLM_LATENCY),
+            ),
+            ToolRegistry(tools),
+            max_iterations=MAX_ITERATIONS,
+            budget=budget,
+        )
+        for steps in (3, MAX_ITERATIONS)
+    )
+    return normal, runaway
+
+
+def _run(budget):
+    normal, runaway = _executors(budget)
+    latencies, tokens, stopped, failed = [], 0, 0, 0
+    for i in range(RUNS):
+        executor = runaway if i % RUNAWAY_EVERY == 0 else normal
+        tracer = InstrumentationHandler()  # reported tokens, also without a budget
+        start = time.perf_counter()
+        try:
+            result = executor.run(f"Pregunta {i}", callbacks=[tracer])
+            stopped += result.usage is not None and result.usage.stopped_by is not None
+        except AgentIterationLimitError:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+        tokens += sum(
+            (span.prompt_tokens or 0) + (span.completion_tokens or 0)
+            for span in tracer.spans
+            if span.kind == "llm"
+        )
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "tokens": tokens,
+        "stopped": stopped,
+        "failed": failed,
+    }
+
+
+def main() -> None:
+    print(f"{'budget':<10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'tokens':>9} {'stopped':>8} {'failed':>7}")
+    for label, budget in (("none", None), ("RunBudget", BUDGET)):
+        r = _run(budget)
+        print(
+            f"{label:<10} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['tokens']:>9} "
+            f"{r['stopped']:>8} {r['failed']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Time an LLM call spends in AgentCallbackHandler, synchronous vs background.
+
+Each "call" is one on_llm_start (the full prompt) + one on_llm_end. The
+prompt grows like a ReAct scratchpad with chat history. stdout is a
+stream that takes WRITE_LATENCY per write, like a container log driver
+under pressure; print() pays that on the LLM call's thread, the
+background writer does not (records beyond the queue are dropped).
+
+    python -m benchmarks.bench_callback_logging
+"""
+
+import contextlib
+import io
+import time
+import uuid
+
+from langchain_core.outputs import Generation, LLMResult
+
+from callbacks import AgentCallbackHandler, BackgroundLogWriter
+
+PROMPT_SIZES = (2_000, 20_000, 100_000)
+CALLS = 200
+WRITE_LATENCY = 0.0005
+
+
+class SlowStream(io.TextIOBase):
+    """Discards the text after WRITE_LATENCY seconds per write."""
+
+    def write(self, text: str) -> int:
+        time.sleep(WRITE_LATENCY)
+        return len(text)
+
+
+def _us_per_call(handler: AgentCallbackHandler, prompt: str) -> float:
+    response = LLMResult(generations=[[Generation(text="Thought: ...\nAction: math_operation")]])
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        run_id = uuid.uuid4()
+        handler.on_llm_start({}, [prompt], run_id=run_id)
+        handler.on_llm_end(response, run_id=run_id)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+def main() -> None:
+    print(f"{'prompt chars':>12} {'print() (µs/call)':>18} {'background (µs/call)':>21} {'dropped':>8}")
+    for size in PROMPT_SIZES:
+        prompt = "Observation: " + "x" * (size - 13)
+        with contextlib.redirect_stdout(SlowStream()):
+            sync = _us_per_call(AgentCallbackHandler(), prompt)
+        writer = BackgroundLogWriter(SlowStream())
+        background = _us_per_call(AgentCallbackHandler(background=True, writer=writer), prompt)
+        writer.flush()
+        print(f"{size:>12} {sync:>18.1f} {background:>21.1f} {writer.dropped:>8}")
+
+
+if __name__ == "__main__":
+    main()
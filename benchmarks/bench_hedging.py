@@ -0,0 +1,114 @@
+"""
+Tail latency of multi-step ReAct runs, with and without hedged LLM calls.
+
+Every run makes STEPS + 1 LLM calls. The fake LLM answers in FAST_LATENCY
+(± 20%), except one call in SLOW_EVERY that takes SLOW_LATENCY, like a
+request stuck behind a busy replica. With HedgedRunnable a call still
+running after the p95 of recent latencies is sent again and the first
+answer wins; hedges are capped at 10% of the calls. Both modes use the
+same seeded latency sequence, over run() (threads) and arun() (tasks).
+
+    python -m benchmarks.bench_hedging
+"""
+
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from agent_executor import ReActExecutor, ToolRegistry
+from benchmarks.fakes import FakeReActChatModel, react_script
+from hedging import HedgedRunnable
+from mis_tools import get_text_length, math_operation, multiplica2
+from react_prompt import ReActPrompt, build_react_agent
+
+TEMPLATE = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format: Thought / Action [{tool_names}] / Action Input / Observation / Final Answer
+
+Question: {input}
+Thought: {agent_scratchpad}
+"""
+
+STEPS = 5
+RUNS = 200
+WARM_UP_RUNS = 5  # fill the latency window before measuring
+FAST_LATENCY = 0.01
+SLOW_LATENCY = 0.3
+SLOW_EVERY = 30
+
+
+def _latency_fn(seed: int):
+    rng = random.Random(seed)
+
+    def latency() -> float:
+        if rng.randrange(SLOW_EVERY) == 0:
+            return SLOW_LATENCY
+        return FAST_LATENCY * rng.uniform(0.8, 1.2)
+
+    return latency
+
+
+def _executor(hedge: bool):
+    tools = [get_text_length, multiplica2, math_operation]
+    llm = FakeReActChatModel(script=react_script(STEPS), latency_fn=_latency_fn(seed=7))
+    if hedge:
+        llm = HedgedRunnable(llm, percentile=95, max_hedge_ratio=0.1)
+    agent = build_react_agent(ReActPrompt(TEMPLATE, tools), llm)
+    return ReActExecutor(agent, ToolRegistry(tools)), llm
+
+
+def _summary(latencies: List[float], llm) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    stats = llm.stats if isinstance(llm, HedgedRunnable) else None
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "hedged": stats.hedged if stats else 0,
+        "wins": stats.hedge_wins if stats else 0,
+    }
+
+
+def _run_sync(hedge: bool) -> Dict[str, float]:
+    executor, llm = _executor(hedge)
+    for i in range(WARM_UP_RUNS):
+        executor.run(f"Calentamiento {i}")
+    latencies = []
+    for i in range(RUNS):
+        start = time.perf_counter()
+        executor.run(f"Pregunta {i}")
+        latencies.append(time.perf_counter() - start)
+    return _summary(latencies, llm)
+
+
+async def _run_async(hedge: bool) -> Dict[str, float]:
+    executor, llm = _executor(hedge)
+    for i in range(WARM_UP_RUNS):
+        await executor.arun(f"Calentamiento {i}")
+    latencies = []
+    for i in range(RUNS):
+        start = time.perf_counter()
+        await executor.arun(f"Pregunta {i}")
+        latencies.append(time.perf_counter() - start)
+    return _summary(latencies, llm)
+
+
+def main() -> None:
+    print(f"{'mode':<14} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9} {'hedged':>7} {'wins':>5}")
+    for api in ("run", "arun"):
+        for hedge in (False, True):
+            r = _run_sync(hedge) if api == "run" else asyncio.run(_run_async(hedge))
+            label = f"{api}{', hedged' if hedge else ''}"
+            print(
+                f"{label:<14} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f} "
+                f"{r['hedged']:>7} {r['wins']:>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Per-call latency of OpenAI and Tavily requests, with and without the shared
+pooled clients of clients.py, against benchmarks.mock_api on localhost.
+
+  Tavily, stock        TavilySearchResults: requests.post(), one new
+                       connection per search.
+  Tavily, pooled       get_search_tool(): shared httpx.Client.
+  OpenAI, new client   A ChatOpenAI built per question (CLI restart,
+                       script without st.cache_resource).
+  OpenAI, pooled       get_chat_model() built per question: the
+                       connections outlive the ChatOpenAI instances.
+
+The mock answers immediately over plain HTTP, so this is the client-side
+overhead only; against the real APIs every new connection also pays the
+TCP and TLS handshakes (one to three round trips).
+
+    python -m benchmarks.bench_http_pool
+"""
+
+import statistics
+import time
+from typing import Callable
+
+import langchain_community.utilities.tavily_search as tavily_search
+from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_openai import ChatOpenAI
+
+from benchmarks.mock_api import MockAPIServer
+from clients import get_chat_model, get_search_tool, warm_up
+
+CALLS = 200
+
+
+def _time(call: Callable[[int], None]) -> float:
+    call(-1)  # first call: imports, first connection
+    samples = []
+    for i in range(CALLS):
+        start = time.perf_counter()
+        call(i)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e3
+
+
+def main() -> None:
+    with MockAPIServer() as server:
+        tavily_search.TAVILY_API_URL = server.tavily_base  # stock wrapper -> mock
+        stock_tool = TavilySearchResults(k=3, tavily_api_key="tvly-mock")
+        pooled_tool = get_search_tool(k=3, api_base=server.tavily_base)
+        llm_options = dict(model="gpt-4o-mini", base_url=server.openai_base, api_key="sk-mock")
+
+        cases = {
+            "Tavily, stock": lambda i: stock_tool.invoke(f"query {i}"),
+            "Tavily, pooled": lambda i: pooled_tool.invoke(f"query {i}"),
+            "OpenAI, new client": lambda i: ChatOpenAI(**llm_options).invoke(f"hola {i}"),
+            "OpenAI, pooled": lambda i: get_chat_model(**llm_options).invoke(f"hola {i}"),
+        }
+        print(f"{'case':<20} {'median (ms/call)':>17} {'connections':>12}")
+        for name, call in cases.items():
+            before = server.connections
+            ms = _time(call)
+            print(f"{name:<20} {ms:>17.2f} {server.connections - before:>12}")
+
+        before = server.connections
+        start = time.perf_counter()
+        warm_up([f"{server.openai_base}/models", server.tavily_base], connections=4)
+        print(
+            f"\nwarm_up(): {(time.perf_counter() - start) * 1e3:.1f} ms, "
+            f"{server.connections - before} new connection(s) "
+            "(only what the pool did not already hold)"
+        )
+
+
+if __name__ == "__main__":
+    main()
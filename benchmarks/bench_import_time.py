@@ -0,0 +1,81 @@
+"""
+Cold import time of each entry point, measured with `python -X importtime`.
+
+Every module is imported in a fresh interpreter (REPEAT times, best run
+kept), so the numbers are what a CLI start or a new Streamlit process
+pays before the first question. Dummy API keys are set when missing;
+nothing is sent over the network. Also shows the slowest direct imports
+of each entry point.
+
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time mis_tools agent_executor
+"""
+
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ENTRY_POINTS = (
+    "mis_tools",
+    "agent_executor",
+    "agente_react_05_CLI",
+    "agente_react_06_streamlit",
+    "agente_react_06_guardrails",
+    "agente_react_07_memory",
+)
+REPEAT = 3
+TOP_IMPORTS = 3
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_times(module: str) -> Dict[str, Tuple[int, int]]:
+    """Return {imported name: (depth, cumulative µs)} for one cold import."""
+    env = {
+        "OPENAI_API_KEY": "sk-bench",
+        "TAVILY_API_KEY": "tvly-bench",
+        **os.environ,
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.setdefault(name.strip(), (depth, int(cumulative)))
+    return times
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Best cold import time of `module` (ms) and its slowest direct imports."""
+    runs = [_import_times(module) for _ in range(REPEAT)]
+    best = min(runs, key=lambda times: times[module][1])
+    direct = [
+        (name, cumulative / 1000)
+        for name, (depth, cumulative) in best.items()
+        if depth == 1
+    ]
+    direct.sort(key=lambda item: item[1], reverse=True)
+    return best[module][1] / 1000, direct[:TOP_IMPORTS]
+
+
+def main() -> None:
+    modules = sys.argv[1:] or ENTRY_POINTS
+    print(f"{'entry point':<28} {'import (ms)':>11}   slowest direct imports")
+    for module in modules:
+        total, slowest = measure(module)
+        details = ", ".join(f"{name} {ms:.0f}" for name, ms in slowest)
+        print(f"{module:<28} {total:>11.0f}   {details}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Prompt size over a 200-turn conversation: ConversationBufferMemory vs
+TokenBudgetMemory.
+
+Each turn renders the agente_react_07_memory prompt with the current
+history (as the front-end does once per turn), then saves the turn. The
+summarizer is a fake with a fixed latency that keeps the last
+SUMMARY_CHARS characters, so the numbers only show the memory's own
+behaviour. Turns arrive back to back, faster than the summarizer, so the
+token budget does the bounding; the "idle" row waits for the summary
+between turns, as a user typing would.
+
+    python -m benchmarks.bench_memory
+"""
+
+import time
+import warnings
+
+from langchain.memory import ConversationBufferMemory
+
+from memory import TokenBudgetMemory, approx_token_count
+from react_prompt import ReActPrompt
+
+TEMPLATE = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Previous conversation history (use this context to understand references to previous messages):
+{chat_history}
+
+Current Question: {input}
+Thought: {agent_scratchpad}
+"""
+
+TURNS = 200
+CHECKPOINTS = (1, 10, 50, 100, 150, 200)
+SUMMARIZER_LATENCY = 0.05
+SUMMARY_CHARS = 800
+
+
+def _fake_summarizer(summary: str, new_lines: str) -> str:
+    time.sleep(SUMMARIZER_LATENCY)
+    return f"{summary} {new_lines}"[-SUMMARY_CHARS:]
+
+
+def _turn(i: int):
+    question = f"Pregunta {i}: cuanto es {i} multiplicado por 3.14 y que paso ese dia?"
+    answer = f"Respuesta {i}: el resultado es {i * 3.14:.2f}. " + "Detalle. " * 10
+    return {"input": question}, {"output": answer}
+
+
+def _session(memory, wait_for_summary: bool = False) -> dict:
+    prompt = ReActPrompt(TEMPLATE, [])
+    sizes = {}
+    save_seconds = 0.0
+    for i in range(1, TURNS + 1):
+        inputs, outputs = _turn(i)
+        if wait_for_summary:
+            memory.wait()
+        history = memory.load_memory_variables({})["chat_history"]
+        rendered = prompt.render({**inputs, "chat_history": history, "agent_scratchpad": ""})
+        if i in CHECKPOINTS:
+            sizes[i] = approx_token_count(rendered)
+        start = time.perf_counter()
+        memory.save_context(inputs, outputs)
+        save_seconds += time.perf_counter() - start
+    sizes["save_ms"] = save_seconds / TURNS * 1000
+    return sizes
+
+
+def main() -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        buffer = ConversationBufferMemory(memory_key="chat_history")
+    runs = (
+        ("ConversationBufferMemory", buffer, False),
+        ("TokenBudgetMemory", TokenBudgetMemory(_fake_summarizer), False),
+        ("TokenBudgetMemory (idle)", TokenBudgetMemory(_fake_summarizer), True),
+    )
+
+    print(f"{'memory':<26}" + "".join(f"{f'turn {t}':>10}" for t in CHECKPOINTS) + f"{'save (ms)':>11}")
+    for label, memory, wait_for_summary in runs:
+        sizes = _session(memory, wait_for_summary)
+        row = "".join(f"{sizes[t]:>10}" for t in CHECKPOINTS)
+        print(f"{label:<26}{row}{sizes['save_ms']:>11.3f}")
+        if isinstance(memory, TokenBudgetMemory):
+            memory.wait()
+    print("(prompt size in approximate tokens)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+How much of each prompt an OpenAI-style prefix cache can serve, by layout.
+
+SESSIONS chat sessions of TURNS questions each; every question searches
+STEPS times (FakeSearchTool, ~4 KB observations) before answering, and
+the chat history grows by one turn per question. FakePromptCache plays
+the provider (prefix shared with a recent prompt, 128-token blocks from
+1024 tokens). PrefixCacheMeter reports, per layout:
+
+  history_first   {chat_history} before the instructions.
+  template        The agente_react_07_memory.py template as it was
+                  (static first, newline after {agent_scratchpad}).
+  prefix_cache    Same template with ReActPrompt(..., prefix_cache=True).
+
+    python -m benchmarks.bench_prefix_cache
+"""
+
+from agent_executor import ReActExecutor, ToolRegistry
+from benchmarks.fakes import FakePromptCache, FakeReActChatModel, FakeSearchTool, react_script
+from callbacks import PrefixCacheMeter
+from mis_tools import get_text_length, math_operation, multiplica2
+from react_prompt import ReActPrompt, build_react_agent
+
+INSTRUCTIONS = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of the following [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this sequence of Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Begin!
+"""
+
+HISTORY = """
+Previous conversation history (use this context to understand references to previous messages):
+{chat_history}
+"""
+
+LAYOUTS = {
+    "history_first": (HISTORY + "\n" + INSTRUCTIONS + "\nCurrent Question: {input}\nThought: {agent_scratchpad}\n", False),
+    "template": (INSTRUCTIONS + HISTORY + "\nCurrent Question: {input}\nThought: {agent_scratchpad}\n", False),
+    "prefix_cache": (INSTRUCTIONS + HISTORY + "\nCurrent Question: {input}\nThought: {agent_scratchpad}\n", True),
+}
+
+SESSIONS = 3
+TURNS = 5
+STEPS = 4
+
+
+def _measure(template: str, prefix_cache: bool) -> PrefixCacheMeter:
+    search = FakeSearchTool(result_chars=1300)
+    tools = [get_text_length, multiplica2, math_operation, search]
+    llm = FakeReActChatModel(
+        script=react_script(STEPS, tool=search.name, tool_input="precio del oro dia {i}"),
+        prompt_cache=FakePromptCache(),
+    )
+    prompt = ReActPrompt(template, tools, prefix_cache=prefix_cache)
+    executor = ReActExecutor(build_react_agent(prompt, llm), ToolRegistry(tools))
+    meter = PrefixCacheMeter()
+    for session in range(SESSIONS):
+        history = ""
+        for turn in range(TURNS):
+            question = f"Pregunta {turn} de la sesion {session}"
+            result = executor.run(question, callbacks=[meter], chat_history=history)
+            history += f"Human: {question}\nAI: {result.output}\n"
+    return meter
+
+
+def main() -> None:
+    print(f"{'layout':<16} {'LLM calls':>10} {'strict appends':>15} {'shared prefix':>14} {'cached tokens':>14}")
+    for name, (template, prefix_cache) in LAYOUTS.items():
+        meter = _measure(template, prefix_cache)
+        print(
+            f"{name:<16} {meter.llm_calls:>10} {meter.strict_appends:>15} "
+            f"{meter.shared_prefix_ratio:>14.1%} {meter.cached_ratio:>14.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
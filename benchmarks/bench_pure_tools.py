@@ -0,0 +1,79 @@
+"""
+Tool dispatch cost with and without memoization of pure tools.
+
+CALLS tool calls drawn from DISTINCT different inputs with a skewed
+(Zipf-like) popularity, like users asking the same calculations again
+across sessions. Each call goes through ToolRegistry.execute() (run) and
+aexecute() (arun; blocking tools hop to the thread pool on a miss).
+stdout is discarded while timing (get_text_length prints its input).
+
+    python -m benchmarks.bench_pure_tools
+"""
+
+import asyncio
+import contextlib
+import io
+import random
+import time
+from typing import List, Tuple
+
+from agent_executor import ToolRegistry, pure_tool_cache
+from mis_tools import get_text_length, math_operation, multiplica2
+
+CALLS = 5000
+DISTINCT = 200
+
+
+def _workload(seed: int = 3) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    inputs = []
+    for i in range(DISTINCT):
+        kind = i % 3
+        if kind == 0:
+            inputs.append(("multiplica2", f"({i}.5, {i % 7 + 1})"))
+        elif kind == 1:
+            inputs.append(("math_operation", f"(({i} + 3.14) * 2 - {i % 5}) / 4 + 2 ** 3"))
+        else:
+            inputs.append(("get_text_length", f"'pregunta numero {i} del usuario'"))
+    weights = [1 / (rank + 1) for rank in range(DISTINCT)]
+    return rng.choices(inputs, weights=weights, k=CALLS)
+
+
+def _registry(pure: bool) -> ToolRegistry:
+    registry = ToolRegistry()
+    for tool in (get_text_length, multiplica2, math_operation):
+        registry.register(tool, pure=pure)
+    return registry
+
+
+def main() -> None:
+    calls = _workload()
+    print(f"{CALLS} calls, {DISTINCT} distinct inputs")
+    print(f"{'mode':<18} {'run (µs/call)':>14} {'arun (µs/call)':>15} {'hit rate':>9}")
+    for pure in (False, True):
+        registry = _registry(pure)
+        pure_tool_cache().clear()
+        stats = pure_tool_cache().stats
+        hits_before = stats.hits
+
+        async def run_async() -> None:
+            for name, tool_input in calls:
+                await registry.aexecute(name, tool_input)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for name, tool_input in calls:
+                registry.execute(name, tool_input)
+            sync_us = (time.perf_counter() - start) / CALLS * 1e6
+            hit_rate = (stats.hits - hits_before) / CALLS
+
+            pure_tool_cache().clear()
+            start = time.perf_counter()
+            asyncio.run(run_async())
+            async_us = (time.perf_counter() - start) / CALLS * 1e6
+        label = "pure (memoized)" if pure else "not memoized"
+        print(f"{label:<18} {sync_us:>14.1f} {async_us:>15.1f} {hit_rate:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
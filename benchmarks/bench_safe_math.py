@@ -0,0 +1,87 @@
+"""
+Latency of math_operation's evaluator: regex + eval() vs safe_math.
+
+Typical expressions the agent sends are timed with the old regex check
+plus eval(), with safe_eval() on a cold cache and with safe_eval() once
+the compiled programs are cached, plus safe_eval_many() on a batch.
+Then the worst case: exponent towers that pass the old regex. eval() is
+only timed on the smallest one (the others would freeze the benchmark);
+safe_eval() rejects all of them.
+
+    python -m benchmarks.bench_safe_math
+"""
+
+import re
+import time
+
+import safe_math
+from safe_math import MathExpressionError, safe_eval, safe_eval_many
+
+REPEAT = 2000
+EXPRESSIONS = (
+    "3.14 * 4",
+    "10 / 2",
+    "2 ** 3",
+    "(25 + 17) * 1.5 - 3",
+    "100 / 7 * 3 + 2 ** 10",
+    "((1.5 + 2.25) * (3 - 0.5)) / 4",
+)
+RUNAWAY = ("7**7**7", "9**9**9", "9**9**9**9")
+
+
+def _regex_eval(expression: str):
+    if not re.match(r'^[\d\s+\-*/().]+$', expression):
+        raise ValueError(expression)
+    return eval(expression)
+
+
+def _per_call_us(function, expressions, before_each=None) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for expression in expressions:
+            if before_each:
+                before_each()
+            function(expression)
+    return (time.perf_counter() - start) / (REPEAT * len(expressions)) * 1e6
+
+
+def _batch_us(expressions) -> float:
+    batch = list(expressions) * 10
+    start = time.perf_counter()
+    for _ in range(REPEAT // 10):
+        safe_eval_many(batch)
+    return (time.perf_counter() - start) / (REPEAT // 10 * len(batch)) * 1e6
+
+
+def main() -> None:
+    for expression in EXPRESSIONS:
+        assert safe_eval(expression) == _regex_eval(expression), expression
+
+    print(f"{'evaluator':<28} {'µs/expression':>14}")
+    rows = (
+        ("regex + eval()", _per_call_us(_regex_eval, EXPRESSIONS)),
+        ("safe_eval() cold", _per_call_us(safe_eval, EXPRESSIONS, safe_math.compile_expression.cache_clear)),
+        ("safe_eval() cached", _per_call_us(safe_eval, EXPRESSIONS)),
+        ("safe_eval_many() batch", _batch_us(EXPRESSIONS)),
+    )
+    for label, us in rows:
+        print(f"{label:<28} {us:>14.1f}")
+
+    print(f"\n{'runaway expression':<20} {'regex + eval() (ms)':>20} {'safe_eval() (ms)':>17}")
+    for expression in RUNAWAY:
+        if expression == RUNAWAY[0]:
+            start = time.perf_counter()
+            _regex_eval(expression)
+            baseline = f"{(time.perf_counter() - start) * 1000:.1f}"
+        else:
+            baseline = "(not run)"
+        start = time.perf_counter()
+        try:
+            safe_eval(expression)
+        except MathExpressionError:
+            pass
+        print(f"{expression:<20} {baseline:>20} {(time.perf_counter() - start) * 1000:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Per-iteration prompt-build cost as the number of ReAct steps grows.
+
+Compares the original chain (format_log_to_str + PromptTemplate) against
+IncrementalScratchpad + ReActPrompt. Each incremental iteration only
+renders the newest (AgentAction, observation); what is left on top of the
+"copy floor" column (building the final prompt string out of already
+rendered pieces, which the LLM call needs anyway) should stay flat.
+
+    python -m benchmarks.bench_scratchpad
+"""
+
+import time
+
+from langchain.agents import tool
+from langchain.agents.format_scratchpad import format_log_to_str
+from langchain.prompts import PromptTemplate
+from langchain.schema import AgentAction
+from langchain.tools.render import render_text_description
+
+from react_prompt import IncrementalScratchpad, ReActPrompt
+
+TEMPLATE = """
+Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of the following [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this sequence of Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Begin!
+
+Question: {input}
+Thought: {agent_scratchpad}
+"""
+
+STEP_COUNTS = (1, 10, 50, 100, 200)
+REPEATS = 200
+
+# A Tavily-sized observation, as in search-heavy runs.
+OBSERVATION = "[{'url': 'https://example.com', 'content': '" + "x" * 1500 + "'}]"
+
+
+@tool
+def echo(text: str) -> str:
+    """Returns the text unchanged."""
+    return text
+
+
+def _action(i: int) -> AgentAction:
+    return AgentAction(
+        tool="echo",
+        tool_input=f"query {i}",
+        log=f"I should search again\nAction: echo\nAction Input: query {i}",
+    )
+
+
+def _time_per_call(fn, repeats: int = REPEATS) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main() -> None:
+    tools = [echo]
+    template = PromptTemplate.from_template(TEMPLATE).partial(
+        tools=render_text_description(tools),
+        tool_names=", ".join([t.name for t in tools]),
+    )
+    prompt = ReActPrompt(TEMPLATE, tools)
+
+    print(
+        f"{'steps':>6} {'prompt KB':>10} {'full re-render (µs)':>20} "
+        f"{'incremental (µs)':>17} {'copy floor (µs)':>16}"
+    )
+    for n in STEP_COUNTS:
+        steps = [(_action(i), OBSERVATION) for i in range(n)]
+
+        def full_render():
+            template.format(input="q", agent_scratchpad=format_log_to_str(steps))
+
+        # Cost of the n-th iteration: one append + one render, scratchpad
+        # already holding the n - 1 previous steps.
+        pads = []
+        for _ in range(REPEATS):
+            pad = IncrementalScratchpad(steps[:-1])
+            pad.text
+            pads.append(pad)
+        pads_iter = iter(pads)
+
+        def incremental_render():
+            pad = next(pads_iter)
+            pad.append(steps[-1])
+            prompt.render({"input": "q", "agent_scratchpad": pad})
+
+        rendered = IncrementalScratchpad(steps).text
+
+        def copy_floor():
+            # Two string copies: extending the cached scratchpad text and
+            # joining it into the final prompt.
+            "".join([prompt.static_prefix, "q", rendered[:-1] + " "])
+
+        prompt_kb = len(prompt.render({"input": "q", "agent_scratchpad": steps})) / 1024
+        print(
+            f"{n:>6} {prompt_kb:>10.0f} {_time_per_call(full_render):>20.1f} "
+            f"{_time_per_call(incremental_render):>17.1f} "
+            f"{_time_per_call(copy_floor):>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
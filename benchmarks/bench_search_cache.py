@@ -0,0 +1,62 @@
+"""
+Latency and hit rate of CachedSearchTool on a skewed query workload.
+
+Queries follow a Zipf-like distribution (a few popular questions repeated
+all day, written with different case/punctuation) against a fake Tavily
+backend with fixed latency, and a fresh on-disk cache in a temp dir.
+
+    python -m benchmarks.bench_search_cache
+"""
+
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.fakes import FakeSearchTool
+from caching import LRUCache, SQLiteCache, TieredTTLCache
+from search_cache import cached_search_tool
+
+SEARCH_LATENCY = 0.02
+QUERIES = 2000
+DISTINCT_QUESTIONS = 200
+
+_VARIANTS = (str, str.upper, lambda q: f"  {q}?  ", lambda q: f'"{q}"')
+
+
+def _workload(rng: random.Random):
+    weights = [1 / (rank + 1) for rank in range(DISTINCT_QUESTIONS)]
+    for _ in range(QUERIES):
+        (question,) = rng.choices(range(DISTINCT_QUESTIONS), weights)
+        yield rng.choice(_VARIANTS)(f"capital del pais numero {question}")
+
+
+def _percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100)
+    return cuts[49] * 1000, cuts[98] * 1000
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = FakeSearchTool(latency=SEARCH_LATENCY)
+        cache = TieredTTLCache(
+            LRUCache(64), SQLiteCache(os.path.join(tmp, "search.sqlite"))
+        )
+        tool = cached_search_tool(backend, cache)
+
+        for label, search in (("uncached", backend), ("cached", tool)):
+            rng = random.Random(42)
+            samples = []
+            for query in _workload(rng):
+                start = time.perf_counter()
+                search.run(query)
+                samples.append(time.perf_counter() - start)
+            p50, p99 = _percentiles(samples)
+            print(f"{label:>9}: p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+        print(f"backend calls: {backend.calls}  cache stats: {cache.stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cost of keeping Streamlit sessions in session_store.py instead of st.session_state.
+
+  rerun, full reload     Every rerun reads the whole history of a session
+                         with MESSAGES messages (naive external store).
+  rerun, SessionHistory  A new replica opens the session (last page only),
+                         and later reruns call refresh() (nothing new).
+  turn, write-through    Two messages + the memory state per user turn,
+                         one SQLite transaction each.
+  turn, write-behind     The same through WriteBehindSessionStore: the
+                         caller only queues; one transaction per flush.
+
+It also prints the stored size of a message and of a TokenBudgetMemory
+state, as JSON and as pack() stores them.
+
+    python -m benchmarks.bench_session_store
+"""
+
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+from memory import TokenBudgetMemory
+from session_store import (
+    SessionHistory,
+    SQLiteSessionStore,
+    WriteBehindSessionStore,
+    pack,
+    persist_memory,
+)
+
+MESSAGES = 500
+TURNS = 200
+REPEAT = 200
+
+QUESTION = "¿Cuál es el precio del oro hoy y cuánto sería en euros una onza multiplicada por 3.14?"
+ANSWER = (
+    "Según los resultados de búsqueda, el precio del oro hoy es de 2.345,60 USD por onza. "
+    "Con un tipo de cambio de 0,92 EUR/USD, una onza cuesta unos 2.157,95 EUR, y "
+    "multiplicada por 3.14 resulta 6.775,96 EUR. Los precios pueden variar durante el día."
+)
+
+
+def _median_ms(call: Callable[[], object], repeat: int = REPEAT) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def _session(store, session_id: str) -> TokenBudgetMemory:
+    memory = TokenBudgetMemory(lambda summary, lines: (summary + " " + lines)[-1200:], max_turns=4)
+    history = SessionHistory(store, session_id)
+    for i in range(MESSAGES // 2):
+        history.append({"role": "user", "content": f"{i}: {QUESTION}"})
+        history.append({"role": "assistant", "content": ANSWER})
+        memory.save_context({"input": QUESTION}, {"output": ANSWER})
+    memory.wait()
+    persist_memory(store, session_id, memory)
+    return memory
+
+
+def main() -> None:
+    directory = tempfile.mkdtemp(prefix="bench-sessions-")
+    store = SQLiteSessionStore(os.path.join(directory, "sessions.sqlite"))
+    memory = _session(store, "s" * 32)
+
+    full = _median_ms(lambda: store.load_messages("s" * 32))
+    history = SessionHistory(store, "s" * 32)
+    first = _median_ms(lambda: SessionHistory(store, "s" * 32))
+    refresh = _median_ms(history.refresh)
+    print(f"{MESSAGES}-message session, SQLite")
+    print(f"  rerun, full reload      {full:8.3f} ms")
+    print(f"  rerun, SessionHistory   {first:8.3f} ms first load ({history.page_size} messages), "
+          f"{refresh:.3f} ms refresh()")
+
+    for label, wrap in (("write-through", lambda s: s), ("write-behind", WriteBehindSessionStore)):
+        backend = SQLiteSessionStore(os.path.join(directory, f"{label}.sqlite"))
+        target = wrap(backend)
+        turn_memory = TokenBudgetMemory(None, max_turns=4)
+        messages = SessionHistory(target, "t" * 32)
+
+        def turn() -> None:
+            messages.append({"role": "user", "content": QUESTION})
+            messages.append({"role": "assistant", "content": ANSWER})
+            turn_memory.save_context({"input": QUESTION}, {"output": ANSWER})
+            persist_memory(target, "t" * 32, turn_memory)
+
+        per_turn = _median_ms(turn, TURNS)
+        flushes = ""
+        if isinstance(target, WriteBehindSessionStore):
+            target.flush()
+            flushes = f", {target.stats.flushes} transaction(s) for {TURNS} turns"
+        print(f"  turn, {label:<17} {per_turn:8.3f} ms in the caller{flushes}")
+
+    message = {"role": "assistant", "content": ANSWER}
+    state = memory.to_state()
+    print("\nstored size (bytes)      JSON   pack()")
+    for name, value in (("answer message", message), ("memory state", state)):
+        print(f"  {name:<18} {len(json.dumps(value).encode()):>7} {len(pack(value)):>8}")
+
+
+if __name__ == "__main__":
+    main()
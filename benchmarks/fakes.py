@@ -0,0 +1,200 @@
+"""
+Offline stand-ins for ChatOpenAI and TavilySearchResults used by the benchmarks.
+
+FakeReActChatModel answers with canned ReAct steps. The step to return is
+derived from the prompt itself (number of observations already in the
+scratchpad), so one instance can serve any number of concurrent sessions.
+
+FakeSearchTool mimics TavilySearchResults (same name, list-of-dicts
+results) after a configurable latency and counts its calls.
+
+react_script() builds the completions of an N-step run, and
+approx_usage() fills AIMessage.usage_metadata the way OpenAI reports
+it, so token accounting can be exercised offline too. With a
+FakePromptCache the model also reports cached prompt tokens like
+OpenAI's prompt-prefix cache.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import BaseTool
+
+from react_prompt import common_prefix_length
+
+# Three-step script exercising the blocking tools.
+DEFAULT_SCRIPT: List[str] = [
+    "I need to multiply\nAction: multiplica2\nAction Input: (14, 3.14)",
+    "Now I divide it\nAction: math_operation\nAction Input: 43.96 / 2",
+    "I now know the final answer\nFinal Answer: 21.98",
+]
+
+
+def react_script(
+    steps: int,
+    tool: str = "math_operation",
+    tool_input: str = "{i} * 3.14",
+    final_answer: str = "21.98",
+) -> List[str]:
+    """
+    Completions of a run with `steps` tool calls and a final answer.
+
+    `tool_input` is formatted with the step number `i`, so each call is
+    distinct (no cache hits between steps).
+    """
+    script = [
+        f"Step {i}: I still need to compute\nAction: {tool}\nAction Input: {tool_input.format(i=i)}"
+        for i in range(1, steps + 1)
+    ]
+    return script + [f"I now know the final answer\nFinal Answer: {final_answer}"]
+
+
+def approx_usage(prompt: str, completion: str, cached_tokens: Optional[int] = None) -> UsageMetadata:
+    """Token usage as OpenAI reports it, estimated at ~4 characters per token."""
+    input_tokens = (len(prompt) + 3) // 4
+    output_tokens = (len(completion) + 3) // 4
+    usage = UsageMetadata(
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        total_tokens=input_tokens + output_tokens,
+    )
+    if cached_tokens is not None:
+        usage["input_token_details"] = {"cache_read": cached_tokens}
+    return usage
+
+
+class FakePromptCache:
+    """
+    OpenAI-style prompt-prefix cache: the longest prefix shared with a
+    recent prompt is cached, in BLOCK_TOKENS blocks, once the prompt has
+    at least MIN_TOKENS tokens (~4 characters per token).
+    """
+
+    MIN_TOKENS = 1024
+    BLOCK_TOKENS = 128
+
+    def __init__(self, max_prompts: int = 256):
+        self._prompts: Deque[str] = deque(maxlen=max_prompts)
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, prompt: str) -> int:
+        with self._lock:
+            shared = max((common_prefix_length(p, prompt) for p in self._prompts), default=0)
+            self._prompts.append(prompt)
+        if len(prompt) // 4 < self.MIN_TOKENS:
+            return 0
+        return (shared // 4) // self.BLOCK_TOKENS * self.BLOCK_TOKENS
+
+
+def scratchpad_steps(prompt: str, observation_prefix: str = "Observation: ") -> int:
+    """Number of (action, observation) pairs already rendered into `prompt`."""
+    scratchpad = prompt.rsplit("Question: ", 1)[-1]
+    return scratchpad.count(f"\n{observation_prefix}")
+
+
+class FakeReActChatModel(BaseChatModel):
+    """
+    Chat model returning scripted ReAct completions after a set latency.
+
+    Attributes:
+        script:  Completions returned for step 0, 1, 2, ... of a run. The
+                 last entry is repeated if the run goes on longer.
+        latency: Seconds to wait before answering (time.sleep in invoke,
+                 asyncio.sleep in ainvoke).
+        latency_fn: Called once per request for its latency instead of
+                 `latency` (e.g. occasional slow calls).
+        prompt_cache: Report cached prompt tokens from this FakePromptCache.
+    """
+
+    script: List[str] = DEFAULT_SCRIPT
+    latency: float = 0.0
+    latency_fn: Optional[Callable[[], float]] = None
+    prompt_cache: Optional[FakePromptCache] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-react-chat-model"
+
+    def _latency(self) -> float:
+        return self.latency_fn() if self.latency_fn is not None else self.latency
+
+    def _completion(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = str(messages[-1].content)
+        text = self.script[min(scratchpad_steps(prompt), len(self.script) - 1)]
+        cached = self.prompt_cache.cached_tokens(prompt) if self.prompt_cache is not None else None
+        message = AIMessage(content=text, usage_metadata=approx_usage(prompt, text, cached))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        latency = self._latency()
+        if latency:
+            time.sleep(latency)
+        return self._completion(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        latency = self._latency()
+        if latency:
+            await asyncio.sleep(latency)
+        return self._completion(messages)
+
+
+class FakeSearchTool(BaseTool):
+    """
+    TavilySearchResults stand-in returning canned results after `latency` seconds.
+
+    Attributes:
+        result_chars: Length of each result's "content" (Tavily snippets are
+                      a few hundred to a few thousand characters).
+    """
+
+    name: str = "tavily_search_results_json"
+    description: str = (
+        "A search engine optimized for comprehensive, accurate, and trusted results. "
+        "Input should be a search query."
+    )
+    latency: float = 0.0
+    result_chars: int = 0
+    calls: int = 0
+
+    def _results(self, query: str) -> List[dict]:
+        self.calls += 1
+        return [
+            {
+                "url": f"https://example.com/{i}",
+                "content": f"Result {i} for {query}".ljust(self.result_chars, "."),
+            }
+            for i in range(3)
+        ]
+
+    def _run(self, query: str, run_manager: Optional[Any] = None) -> List[dict]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._results(query)
+
+    async def _arun(self, query: str, run_manager: Optional[Any] = None) -> List[dict]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._results(query)
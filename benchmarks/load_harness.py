@@ -0,0 +1,315 @@
+"""
+Load test of the agent front-ends against a local mock of OpenAI and Tavily.
+
+Starts benchmarks.mock_api in its own process (scripted ReAct completions,
+configurable latency distribution), points the agent at it through
+OPENAI_BASE_URL and AGENT_TAVILY_API_BASE, and runs N concurrent
+sessions of Q questions each through one of the targets:
+
+  cli                    build_executor() of agente_react_05_CLI.py, one
+                         thread per session, all sharing the executor
+                         (as the batch mode does).
+  cli-async              The same executor, one arun() task per session.
+  streamlit              agente_react_06_streamlit.py through AppTest:
+  streamlit-guardrails   agente_react_06_guardrails.py   one process per
+  streamlit-memory       agente_react_07_memory.py       session.
+
+AppTest cannot run several sessions in one process, so every Streamlit
+session gets its own process (and its own st.cache_resource): its RSS
+is that of a whole server holding one session, an upper bound. For the
+CLI targets, RSS/session is the growth of the process while the
+sessions run, divided by their number.
+
+Per target and number of sessions it reports throughput, p50/p95/p99
+latency per question, errors, CPU time per question, CPU use (100% is
+one core busy) and RSS. Pass several session counts to find where
+throughput stops growing:
+
+    python -m benchmarks.load_harness --target cli --sessions 1,8,32,64
+    python -m benchmarks.load_harness --target streamlit --sessions 1,4 --latency lognormal:300,0.6
+    python -m benchmarks.load_harness --target cli-async --steps 5 --json .cache/load.jsonl
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+STREAMLIT_SCRIPTS: Dict[str, str] = {
+    "streamlit": "agente_react_06_streamlit.py",
+    "streamlit-guardrails": "agente_react_06_guardrails.py",
+    "streamlit-memory": "agente_react_07_memory.py",
+}
+TARGETS: List[str] = ["cli", "cli-async", *STREAMLIT_SCRIPTS]
+
+APPTEST_TIMEOUT = 300
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process (Linux)."""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _peak_rss_bytes() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KiB on Linux
+
+
+def _question(session: int, turn: int) -> str:
+    return f"Sesion {session}, pregunta {turn}: cuanto es 14 por 3.14 entre 2?"
+
+
+# ─────────────────────────────────────────────
+# Mock API in a separate process
+# ─────────────────────────────────────────────
+
+
+@contextlib.contextmanager
+def mock_api_process(latency: str, steps: int, seed: Optional[int] = None):
+    """Run `python -m benchmarks.mock_api` and yield its base URL."""
+    command = [sys.executable, "-m", "benchmarks.mock_api", "--latency", latency, "--steps", str(steps)]
+    if seed is not None:
+        command += ["--seed", str(seed)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        url = process.stdout.readline().strip()
+        if not url:
+            raise RuntimeError(f"mock_api exited with status {process.wait()}")
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def point_at_mock(url: str) -> None:
+    """Environment for the front-ends: mock endpoints, no caches, no tracing."""
+    os.environ.update(
+        OPENAI_BASE_URL=f"{url}/v1",
+        AGENT_TAVILY_API_BASE=url,
+        OPENAI_API_KEY="sk-mock",
+        TAVILY_API_KEY="tvly-mock",
+        AGENT_LLM_CACHE="0",
+        AGENT_SEARCH_CACHE_PATH=str(Path(tempfile.mkdtemp(prefix="load-harness-")) / "cache.sqlite"),
+    )
+    os.environ.pop("AGENT_TRACE_PATH", None)
+
+
+# ─────────────────────────────────────────────
+# Targets
+# ─────────────────────────────────────────────
+
+
+def _run_cli(sessions: int, questions: int, use_async: bool) -> Dict[str, Any]:
+    from agente_react_05_CLI import build_executor
+
+    executor = build_executor(verbose=False)
+    executor.run(_question(-1, 0))  # imports, connections, first-call costs
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def record(start: float, failed: bool) -> None:
+        nonlocal errors
+        with lock:
+            if failed:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    def session(i: int) -> None:
+        for turn in range(questions):
+            start = time.perf_counter()
+            try:
+                executor.run(_question(i, turn))
+            except Exception:
+                record(start, failed=True)
+            else:
+                record(start, failed=False)
+
+    async def asession(i: int) -> None:
+        for turn in range(questions):
+            start = time.perf_counter()
+            try:
+                await executor.arun(_question(i, turn))
+            except Exception:
+                record(start, failed=True)
+            else:
+                record(start, failed=False)
+
+    async def arun_all() -> None:
+        await asyncio.gather(*(asession(i) for i in range(sessions)))
+
+    rss_before = _rss_bytes()
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    if use_async:
+        asyncio.run(arun_all())
+    else:
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - wall_before
+    return {
+        "latencies": latencies,
+        "errors": errors,
+        "wall": wall,
+        "cpu": time.process_time() - cpu_before,
+        "rss_per_session": max(_rss_bytes() - rss_before, 0) / sessions,
+        "peak_rss": _peak_rss_bytes(),
+    }
+
+
+def _streamlit_session(script: str, questions: int, index: int, barrier, results) -> None:
+    """One Streamlit session in a child process; puts its measurements on `results`."""
+    sys.stdout = open(os.devnull, "w")  # AgentCallbackHandler prints every prompt
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per request
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    from streamlit.testing.v1 import AppTest
+
+    # "missing ScriptRunContext" for every thread outside the script run
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+    app = AppTest.from_file(script, default_timeout=APPTEST_TIMEOUT).run()
+    latencies: List[float] = []
+    errors = 0
+    barrier.wait()
+    started = time.time()
+    cpu_before = time.process_time()
+    for turn in range(questions):
+        start = time.perf_counter()
+        app.text_input(key="input").set_value(_question(index, turn)).run()
+        if app.exception:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - start)
+    results.put({
+        "latencies": latencies,
+        "errors": errors,
+        "started": started,
+        "finished": time.time(),
+        "cpu": time.process_time() - cpu_before,
+        "rss": _rss_bytes(),
+        "peak_rss": _peak_rss_bytes(),
+    })
+
+
+def _run_streamlit(script: str, sessions: int, questions: int) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(sessions)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_streamlit_session, args=(script, questions, i, barrier, results))
+        for i in range(sessions)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get(timeout=APPTEST_TIMEOUT * (questions + 1)) for _ in processes]
+    for process in processes:
+        process.join()
+    return {
+        "latencies": [latency for report in reports for latency in report["latencies"]],
+        "errors": sum(report["errors"] for report in reports),
+        "wall": max(r["finished"] for r in reports) - min(r["started"] for r in reports),
+        "cpu": sum(report["cpu"] for report in reports),
+        "rss_per_session": statistics.mean(report["rss"] for report in reports),
+        "peak_rss": max(report["peak_rss"] for report in reports),
+    }
+
+
+def run_target(target: str, sessions: int, questions: int) -> Dict[str, Any]:
+    """Run one load level and return its summary row."""
+    if target in STREAMLIT_SCRIPTS:
+        raw = _run_streamlit(STREAMLIT_SCRIPTS[target], sessions, questions)
+    else:
+        raw = _run_cli(sessions, questions, use_async=target == "cli-async")
+    latencies = sorted(raw["latencies"])
+    done = len(latencies)
+
+    def percentile(p: float) -> float:
+        return latencies[max(int(done * p) - 1, 0)] * 1000 if latencies else float("nan")
+
+    return {
+        "target": target,
+        "sessions": sessions,
+        "questions": sessions * questions,
+        "errors": raw["errors"],
+        "wall_s": round(raw["wall"], 3),
+        "throughput_qps": round(done / raw["wall"], 2) if raw["wall"] else 0.0,
+        "p50_ms": round(percentile(0.50), 1),
+        "p95_ms": round(percentile(0.95), 1),
+        "p99_ms": round(percentile(0.99), 1),
+        "cpu_ms_per_question": round(raw["cpu"] / max(done, 1) * 1000, 2),
+        "cpu_percent": round(raw["cpu"] / raw["wall"] * 100, 1) if raw["wall"] else 0.0,
+        "rss_mb_per_session": round(raw["rss_per_session"] / 2**20, 2),
+        "peak_rss_mb": round(raw["peak_rss"] / 2**20, 1),
+    }
+
+
+# ─────────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────────
+
+COLUMNS = [  # title, key, format
+    ("sessions", "sessions", "8"),
+    ("questions", "questions", "9"),
+    ("errors", "errors", "6"),
+    ("q/s", "throughput_qps", "7.2f"),
+    ("p50 ms", "p50_ms", "8.1f"),
+    ("p95 ms", "p95_ms", "8.1f"),
+    ("p99 ms", "p99_ms", "8.1f"),
+    ("CPU/q ms", "cpu_ms_per_question", "9.2f"),
+    ("CPU %", "cpu_percent", "6.1f"),
+    ("RSS/sess MB", "rss_mb_per_session", "11.2f"),
+    ("peak RSS MB", "peak_rss_mb", "11.1f"),
+]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--target", choices=TARGETS, default="cli")
+    parser.add_argument("--sessions", default="1,8,32", help="concurrent sessions, comma-separated")
+    parser.add_argument("--questions", type=int, default=5, help="questions per session")
+    parser.add_argument(
+        "--latency", default="lognormal:50,0.5",
+        help="LLM/search latency, see benchmarks.mock_api.latency_from_spec()",
+    )
+    parser.add_argument("--steps", type=int, default=0, help="tool calls per question (0: 2-step default)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="append one JSON line per load level")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    levels = [int(value) for value in args.sessions.split(",")]
+    with mock_api_process(args.latency, args.steps, args.seed) as url:
+        point_at_mock(url)
+        print(f"{args.target} against {url} (latency {args.latency}, {args.questions} questions/session)")
+        print(" ".join(f"{title:>{fmt.split('.')[0]}}" for title, _, fmt in COLUMNS))
+        for sessions in levels:
+            row = run_target(args.target, sessions, args.questions)
+            print(" ".join(f"{row[key]:>{fmt}}" for _, key, fmt in COLUMNS))
+            if args.json:
+                with open(args.json, "a", encoding="utf-8") as out:
+                    out.write(json.dumps({**row, "latency": args.latency, "steps": args.steps}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Local HTTP stand-ins for the OpenAI and Tavily APIs.
+
+MockAPIServer serves, on 127.0.0.1 and a free port, with HTTP/1.1
+keep-alive:
+
+  POST /v1/chat/completions  OpenAI chat completion (also `stream: true`
+                             as server-sent events, with usage). The text
+                             is picked from `script` like
+                             FakeReActChatModel does, by the number of
+                             observations already in the prompt.
+  GET  /v1/models            Empty model list (connection warm-up).
+  POST /search               Tavily search results.
+
+Each response waits `latency` seconds: a number, or a callable drawing
+one per request (latency_from_spec() builds them from strings such as
+"lognormal:50,0.5"). Point the real clients at it:
+
+    with MockAPIServer(latency=0.02) as server:
+        llm = ChatOpenAI(base_url=server.openai_base, api_key="sk-mock")
+        tool = get_search_tool(api_base=server.tavily_base)
+
+`server.connections` counts the TCP connections accepted, i.e. how many
+times a client had to connect (and, against the real API, do a TLS
+handshake).
+
+It also runs standalone (prints its base URL, then serves until killed),
+so a load test does not share a process with the server:
+
+    python -m benchmarks.mock_api --latency tail:20,500,0.02 --steps 5
+"""
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from benchmarks.fakes import DEFAULT_SCRIPT, react_script, scratchpad_steps
+
+Latency = Union[float, Callable[[], float]]
+
+
+def latency_from_spec(spec: str, seed: Optional[int] = None) -> Callable[[], float]:
+    """
+    Latency distribution (seconds per call) from a "<kind>:<ms>,..." spec.
+
+      const:50            Always 50 ms.
+      uniform:20,80       Uniform between 20 and 80 ms.
+      lognormal:50,0.5    Median 50 ms, sigma 0.5 (long right tail).
+      tail:20,500,0.02    20 ms, but 500 ms with probability 0.02.
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(value) for value in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec!r}") from None
+    rng = random.Random(seed)
+    if kind == "const" and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        return lambda: rng.lognormvariate(0.0, values[1]) * values[0] / 1000
+    if kind == "tail" and len(values) == 3:
+        return lambda: (values[1] if rng.random() < values[2] else values[0]) / 1000
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    server: "_Server"
+
+    def setup(self) -> None:
+        super().setup()
+        # Headers and body are separate writes: without this, Nagle + delayed
+        # ACK add ~40 ms to every request on a reused connection.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.endswith("/models"):
+            self._reply({"object": "list", "data": []})
+        else:
+            self._reply({"status": "ok"})
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        latency = self.server.latency
+        if callable(latency):
+            with self.server.lock:
+                latency = latency()
+        if latency:
+            time.sleep(latency)
+        with self.server.lock:
+            self.server.requests += 1
+        if self.path.endswith("/chat/completions"):
+            self._chat(body)
+        elif self.path.endswith("/search"):
+            self._reply(_search_results(body.get("query", ""), body.get("max_results") or 3))
+        else:
+            self._reply({"error": "not found"}, status=404)
+
+    def _chat(self, body: Dict[str, Any]) -> None:
+        prompt = str(body["messages"][-1]["content"])
+        script = self.server.script
+        text = script[min(scratchpad_steps(prompt), len(script) - 1)]
+        usage = {
+            "prompt_tokens": (len(prompt) + 3) // 4,
+            "completion_tokens": (len(text) + 3) // 4,
+            "total_tokens": (len(prompt) + len(text) + 6) // 4,
+        }
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": body.get("model", "mock")}
+        if not body.get("stream"):
+            self._reply({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+        chunks = [
+            {"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None},
+            *({"index": 0, "delta": {"content": word}, "finish_reason": None}
+              for word in _words(text)),
+            {"index": 0, "delta": {}, "finish_reason": "stop"},
+        ]
+        events = [
+            {**base, "object": "chat.completion.chunk", "choices": [choice]} for choice in chunks
+        ]
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        payload = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        self._send(payload.encode(), "text/event-stream")
+
+    def _reply(self, data: Any, status: int = 200) -> None:
+        self._send(json.dumps(data).encode(), "application/json", status)
+
+    def _send(self, payload: bytes, content_type: str, status: int = 200) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _words(text: str) -> List[str]:
+    """Split into stream chunks that keep their spaces ("a b" -> ["a", " b"])."""
+    words = text.split(" ")
+    return words[:1] + [" " + word for word in words[1:]]
+
+
+def _search_results(query: str, count: int) -> Dict[str, Any]:
+    return {
+        "query": query,
+        "results": [
+            {
+                "title": f"Result {i} for {query}",
+                "url": f"https://example.com/{i}",
+                "content": f"Snippet {i} about {query}.",
+                "score": 1.0 - i / 10,
+            }
+            for i in range(count)
+        ],
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    latency: Latency = 0.0
+    script: List[str] = DEFAULT_SCRIPT
+    connections: int = 0
+    requests: int = 0
+
+
+class MockAPIServer:
+    """
+    OpenAI + Tavily mock on a background thread; use as a context manager.
+
+    Attributes:
+        latency: Seconds each POST waits before answering, or a callable
+                 returning them per request.
+        script:  Completions, as in FakeReActChatModel.
+    """
+
+    def __init__(
+        self,
+        latency: Latency = 0.0,
+        script: Optional[List[str]] = None,
+        port: int = 0,
+    ):
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.latency = latency
+        self._server.script = script or DEFAULT_SCRIPT
+        self._server.lock = threading.Lock()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base(self) -> str:
+        return f"{self.url}/v1"
+
+    @property
+    def tavily_base(self) -> str:
+        return self.url
+
+    @property
+    def connections(self) -> int:
+        return self._server.connections
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    def start(self) -> "MockAPIServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Mock OpenAI + Tavily API server.")
+    parser.add_argument("--port", type=int, default=0, help="0: any free port")
+    parser.add_argument("--latency", default="const:0", help="see latency_from_spec()")
+    parser.add_argument("--steps", type=int, default=0, help="tool calls per run (0: DEFAULT_SCRIPT)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    script = react_script(args.steps) if args.steps else None
+    server = MockAPIServer(latency_from_spec(args.latency, args.seed), script, port=args.port)
+    with server:
+        print(server.url, flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
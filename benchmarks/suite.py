@@ -0,0 +1,313 @@
+"""
+Offline regression suite for the agent's own overhead.
+
+Every scenario drives the real code (ReActExecutor, ReActPrompt, the
+parsers, guardrails.py, memory.py) against FakeReActChatModel and
+FakeSearchTool with zero latency, so all the measured time is ours:
+
+  steps_1 / steps_5 / steps_10   Runs with 1, 5 and 10 tool calls.
+  long_scratchpad                10 searches with ~4 KB observations each.
+  concurrent_steps_5             50 arun() sessions in flight (throughput).
+  memory_session                 60-turn chat: TokenBudgetMemory render +
+                                 save_context around every run.
+  guardrails                     validate_input, validate_output and
+                                 StreamingOutputGuard on long, PII-dense
+                                 and injection-like text.
+
+For each scenario it reports the time per unit of work (one LLM round
+trip, or one guardrail call), runs per second, and the peak and retained
+memory of one run measured with tracemalloc (in a separate pass, so it
+does not skew the timings).
+
+Save a baseline and compare later runs against it; scenarios slower or
+allocating more than --threshold (default 20%) are flagged and the exit
+status is 1:
+
+    python -m benchmarks.suite --save .cache/bench_baseline.json
+    python -m benchmarks.suite --compare .cache/bench_baseline.json
+    python -m benchmarks.suite steps_10 guardrails --repeat 50
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from agent_executor import ReActExecutor, ToolRegistry
+from benchmarks.fakes import FakeReActChatModel, FakeSearchTool, react_script
+from guardrails import StreamingOutputGuard, validate_input, validate_output
+from memory import TokenBudgetMemory
+from mis_tools import get_text_length, math_operation, multiplica2
+from react_prompt import ReActPrompt, build_react_agent
+
+TEMPLATE = """
+Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of the following [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this sequence of Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Previous conversation history:
+{chat_history}
+
+Begin!
+
+Question: {input}
+Thought: {agent_scratchpad}
+"""
+
+DEFAULT_REPEAT = 20
+DEFAULT_THRESHOLD = 0.20
+
+CONCURRENT_SESSIONS = 50
+MEMORY_TURNS = 60
+SEARCH_RESULT_CHARS = 1300  # 3 results ≈ 4 KB per observation
+
+QUESTION = "Cuanto es 3.14 multiplicado por cada numero del 1 al 10?"
+INJECTION_LIKE = (
+    "Please ignore the noise in this data and act on the summary: the previous "
+    "instructions from my manager say to forget the old totals. "
+) * 5
+PII_DENSE = " ".join(
+    f"Contacto {i}: persona{i}@example.com, tel +34 600 {i:03d} {i:03d}." for i in range(80)
+)
+
+
+@dataclass
+class ScenarioResult:
+    """Measurements of one scenario."""
+
+    units_per_run: int
+    us_per_unit: float
+    runs_per_s: float
+    peak_kb: float
+    retained_kb: float
+
+
+@dataclass
+class Scenario:
+    """
+    A named workload.
+
+    Attributes:
+        name:  Identifier used on the command line and in baselines.
+        unit:  What `units_per_run` counts ("iteration" or "call").
+        setup: Builds the state and returns `run`, a callable doing one run
+               and returning the number of units it did.
+    """
+
+    name: str
+    unit: str
+    setup: Callable[[], Callable[[], int]]
+
+
+# ─────────────────────────────────────────────
+# Scenarios
+# ─────────────────────────────────────────────
+
+
+def _executor(script: List[str], search: Optional[FakeSearchTool] = None) -> ReActExecutor:
+    tools = [get_text_length, multiplica2, math_operation] + ([search] if search else [])
+    llm = FakeReActChatModel(script=script)
+    agent = build_react_agent(ReActPrompt(TEMPLATE, tools), llm)
+    return ReActExecutor(agent, ToolRegistry(tools), fallback_tool=search)
+
+
+def _steps(count: int) -> Callable[[], Callable[[], int]]:
+    def setup():
+        executor = _executor(react_script(count))
+
+        def run() -> int:
+            return executor.run(QUESTION, chat_history="").iterations
+
+        return run
+
+    return setup
+
+
+def _long_scratchpad():
+    search = FakeSearchTool(result_chars=SEARCH_RESULT_CHARS)
+    executor = _executor(
+        react_script(10, tool=search.name, tool_input="precio del oro dia {i}"), search
+    )
+
+    def run() -> int:
+        return executor.run(QUESTION, chat_history="").iterations
+
+    return run
+
+
+def _concurrent_steps():
+    executor = _executor(react_script(5))
+
+    async def sessions():
+        return await asyncio.gather(
+            *(executor.arun(f"{QUESTION} ({i})", chat_history="") for i in range(CONCURRENT_SESSIONS))
+        )
+
+    def run() -> int:
+        return sum(result.iterations for result in asyncio.run(sessions()))
+
+    return run
+
+
+def _memory_session():
+    executor = _executor(react_script(1))
+
+    def run() -> int:
+        memory = TokenBudgetMemory(lambda summary, lines: f"{summary} {lines}"[-800:])
+        iterations = 0
+        for turn in range(MEMORY_TURNS):
+            chat_history = memory.load_memory_variables({})["chat_history"]
+            result = executor.run(f"{QUESTION} turno {turn}", chat_history=chat_history)
+            memory.save_context({"input": QUESTION}, {"output": result.output * 20})
+            iterations += result.iterations
+        memory.wait()
+        return iterations
+
+    return run
+
+
+def _guardrails():
+    tokens = PII_DENSE.split(" ")
+
+    def run() -> int:
+        validate_input(INJECTION_LIKE[:1000])
+        validate_output(PII_DENSE)
+        guard = StreamingOutputGuard()
+        for token in tokens:
+            guard.feed(token + " ")
+        guard.finish()
+        return 2 + len(tokens)
+
+    return run
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("steps_1", "iteration", _steps(1)),
+        Scenario("steps_5", "iteration", _steps(5)),
+        Scenario("steps_10", "iteration", _steps(10)),
+        Scenario("long_scratchpad", "iteration", _long_scratchpad),
+        Scenario("concurrent_steps_5", "iteration", _concurrent_steps),
+        Scenario("memory_session", "iteration", _memory_session),
+        Scenario("guardrails", "call", _guardrails),
+    )
+}
+
+
+# ─────────────────────────────────────────────
+# Measurement
+# ─────────────────────────────────────────────
+
+
+def measure(scenario: Scenario, repeat: int = DEFAULT_REPEAT) -> ScenarioResult:
+    """Time `repeat` runs (after one warm-up), then trace one more run's memory."""
+    run = scenario.setup()
+    units = run()  # warm-up: imports, caches, first compilation of regexes
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        run()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return ScenarioResult(
+        units_per_run=units,
+        us_per_unit=elapsed / (repeat * units) * 1e6,
+        runs_per_s=repeat / elapsed,
+        peak_kb=(peak - before) / 1024,
+        retained_kb=max(after - before, 0) / 1024,
+    )
+
+
+def regressions(
+    results: Dict[str, ScenarioResult], baseline: Dict[str, dict], threshold: float
+) -> List[str]:
+    """Describe every scenario whose time per unit or peak memory grew past `threshold`."""
+    found = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ("us_per_unit", "peak_kb"):
+            old, new = previous[metric], getattr(result, metric)
+            if old > 0 and new > old * (1 + threshold):
+                found.append(f"{name}: {metric} {old:.1f} -> {new:.1f} (+{(new / old - 1) * 100:.0f}%)")
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("scenarios", nargs="*", help=f"subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--save", metavar="JSON", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="flag regressions against a baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    print(
+        f"{'scenario':<20} {'units/run':>10} {'µs/unit':>9} {'runs/s':>9} "
+        f"{'peak KB':>9} {'retained KB':>12}"
+    )
+    results: Dict[str, ScenarioResult] = {}
+    for name in args.scenarios or SCENARIOS:
+        scenario = SCENARIOS[name]
+        result = results[name] = measure(scenario, args.repeat)
+        print(
+            f"{name:<20} {f'{result.units_per_run} {scenario.unit[:4]}':>10} "
+            f"{result.us_per_unit:>9.1f} {result.runs_per_s:>9.1f} "
+            f"{result.peak_kb:>9.0f} {result.retained_kb:>12.1f}"
+        )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "results": {name: asdict(result) for name, result in results.items()},
+                },
+                f,
+                indent=2,
+            )
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        found = regressions(results, baseline, args.threshold)
+        print(f"\n{len(found)} regression(s) over {args.threshold:.0%} against {args.compare}")
+        for line in found:
+            print(f"  {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
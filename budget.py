@@ -0,0 +1,283 @@
+"""
+budget.py
+─────────
+Per-run budgets for ReActExecutor: prompt tokens, completion tokens, tool
+calls and wall-clock seconds.
+
+MAX_AGENT_ITERATIONS counts LLM round trips, which is not what costs
+money or latency: one round trip with a long scratchpad can cost more
+than five short ones. A RunBudget caps the things that do:
+
+  • BudgetTracker is added to the run's callbacks and adds up the token
+    usage of every LLM response as it arrives (estimated from characters
+    when the provider does not report it, e.g. streaming without
+    stream_usage).
+  • Before each LLM call and each batch of tool calls the executor asks
+    whether the next one would go over. If so, the run stops cleanly
+    with a best-effort answer built from what it already has, instead
+    of raising.
+  • The usage of every run is reported in AgentRunResult.usage.
+
+Usage:
+    from budget import RunBudget
+
+    executor = ReActExecutor(
+        agent, registry,
+        budget=RunBudget(max_prompt_tokens=20_000, max_tool_calls=8, max_seconds=30),
+    )
+    result = executor.run("...")
+    print(result.usage.prompt_tokens, result.usage.stopped_by)
+"""
+
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+from callbacks import llm_token_usage
+from memory import approx_token_count
+
+# Environment variables read by budget_from_env(), one per RunBudget field.
+BUDGET_ENV: Dict[str, str] = {
+    "max_prompt_tokens": "AGENT_MAX_PROMPT_TOKENS",
+    "max_completion_tokens": "AGENT_MAX_COMPLETION_TOKENS",
+    "max_tool_calls": "AGENT_MAX_TOOL_CALLS",
+    "max_seconds": "AGENT_MAX_SECONDS",
+}
+
+BUDGET_STOP_MESSAGE = (
+    "No he podido completar la respuesta dentro del límite de recursos de esta consulta."
+)
+
+# Observations starting with this are failures, not answers.
+_FAILED_OBSERVATION = "Tool execution failed"
+
+
+@dataclass(frozen=True)
+class RunBudget:
+    """
+    Limits of one run; None means unlimited.
+
+    Attributes:
+        max_prompt_tokens:     Sum of prompt tokens over all LLM calls (the
+                               scratchpad is re-sent on every call).
+        max_completion_tokens: Sum of completion tokens.
+        max_tool_calls:        Tool calls, including the web-search fallback.
+        max_seconds:           Wall-clock time of the run.
+    """
+
+    max_prompt_tokens: Optional[int] = None
+    max_completion_tokens: Optional[int] = None
+    max_tool_calls: Optional[int] = None
+    max_seconds: Optional[float] = None
+
+
+@dataclass
+class BudgetUsage:
+    """
+    What one run used.
+
+    Attributes:
+        estimated:  Some token counts were estimated from characters.
+        stopped_by: Name of the RunBudget field that stopped the run, or
+                    None if it finished on its own.
+    """
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_calls: int = 0
+    tool_calls: int = 0
+    seconds: float = 0.0
+    estimated: bool = False
+    stopped_by: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def budget_from_env(default: Optional[RunBudget] = None) -> Optional[RunBudget]:
+    """
+    RunBudget from the AGENT_MAX_* variables, on top of `default`.
+
+    Returns `default` when none of them is set.
+    """
+    overrides: Dict[str, Any] = {}
+    for field in fields(RunBudget):
+        value = os.getenv(BUDGET_ENV[field.name])
+        if value:
+            overrides[field.name] = float(value) if field.name == "max_seconds" else int(value)
+    if not overrides:
+        return default
+    base = asdict(default) if default is not None else {}
+    return RunBudget(**{**base, **overrides})
+
+
+class BudgetTracker(BaseCallbackHandler):
+    """
+    Callback handler that accounts one run's usage against a RunBudget.
+
+    ReActExecutor creates one per run, adds it to the run's callbacks
+    and calls check_llm_call() / check_tool_calls() before each step.
+    """
+
+    run_inline = True  # cheap bookkeeping; keep it on the calling thread in arun()
+
+    def __init__(self, budget: RunBudget):
+        self.budget = budget
+        self.usage = BudgetUsage()
+        self._started = time.perf_counter()
+        self._calls: Dict[UUID, Tuple[int, float]] = {}  # run_id -> (prompt chars, start)
+        self._llm_seconds = 0.0
+        self._last_prompt_tokens = 0
+        self._largest_completion = 0
+        self._context_chars = 0  # scratchpad size at the last LLM call
+        self._lock = threading.Lock()
+
+    # ── LangChain callbacks ───────────────────
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> Any:
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._calls[run_id] = (chars, time.perf_counter())
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any
+    ) -> Any:
+        self._calls[run_id] = (sum(len(p) for p in prompts), time.perf_counter())
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> Any:
+        prompt_chars, started = self._calls.pop(run_id, (0, time.perf_counter()))
+        usage = llm_token_usage(response)
+        prompt_tokens = usage["prompt_tokens"]
+        completion_tokens = usage["completion_tokens"]
+        with self._lock:
+            if prompt_tokens is None or completion_tokens is None:
+                self.usage.estimated = True
+            if prompt_tokens is None:
+                prompt_tokens = _approx_tokens(prompt_chars)
+            if completion_tokens is None:
+                completion_tokens = sum(
+                    approx_token_count(g.text) for gens in response.generations for g in gens
+                )
+            self.usage.prompt_tokens += prompt_tokens
+            self.usage.completion_tokens += completion_tokens
+            self.usage.llm_calls += 1
+            self._last_prompt_tokens = prompt_tokens
+            self._largest_completion = max(self._largest_completion, completion_tokens)
+            self._llm_seconds += time.perf_counter() - started
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
+        self._calls.pop(run_id, None)
+
+    # ── checks ────────────────────────────────
+
+    def check_llm_call(
+        self, context_chars: int, first_prompt_chars: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Would the next LLM call go over budget?
+
+        The next prompt is estimated as the last one plus what was added
+        to the scratchpad since (`context_chars` is its current size), the
+        next completion as the largest one so far, its duration as the
+        average LLM call. Before the first call only the prompt can be
+        estimated, from `first_prompt_chars` (its rendered size) if given.
+
+        Returns:
+            The exceeded RunBudget field, or None.
+        """
+        budget, usage = self.budget, self.usage
+        with self._lock:
+            grown = _approx_tokens(max(context_chars - self._context_chars, 0))
+            self._context_chars = context_chars
+            if usage.llm_calls == 0:
+                if first_prompt_chars is not None and _over(
+                    budget.max_prompt_tokens, _approx_tokens(first_prompt_chars)
+                ):
+                    return self._stop("max_prompt_tokens")
+                return self._check_seconds(0.0)
+            next_prompt = self._last_prompt_tokens + grown
+            average_call = self._llm_seconds / usage.llm_calls
+        if _over(budget.max_prompt_tokens, usage.prompt_tokens + next_prompt):
+            return self._stop("max_prompt_tokens")
+        if _over(budget.max_completion_tokens, usage.completion_tokens + self._largest_completion):
+            return self._stop("max_completion_tokens")
+        return self._check_seconds(average_call)
+
+    def check_tool_calls(self, count: int) -> Optional[str]:
+        """Would `count` more tool calls go over budget? Counts them if not."""
+        reason = self._check_seconds(0.0)
+        if reason is not None:
+            return reason
+        if _over(self.budget.max_tool_calls, self.usage.tool_calls + count):
+            return self._stop("max_tool_calls")
+        self.usage.tool_calls += count
+        return None
+
+    def would_exceed_tool_calls(self, count: int) -> bool:
+        """
+        check_tool_calls() without side effects, for optional work (such as
+        the fallback search) that is skipped, not a reason to stop the run.
+        """
+        elapsed = time.perf_counter() - self._started
+        return _over(self.budget.max_tool_calls, self.usage.tool_calls + count) or _over(
+            self.budget.max_seconds, elapsed
+        )
+
+    def finish(self) -> BudgetUsage:
+        """Close the run and return its usage."""
+        self.usage.seconds = time.perf_counter() - self._started
+        return self.usage
+
+    def _check_seconds(self, next_call_seconds: float) -> Optional[str]:
+        elapsed = time.perf_counter() - self._started
+        if _over(self.budget.max_seconds, elapsed + next_call_seconds):
+            return self._stop("max_seconds")
+        return None
+
+    def _stop(self, reason: str) -> str:
+        self.usage.stopped_by = reason
+        return reason
+
+
+def _approx_tokens(chars: int) -> int:
+    """memory.approx_token_count() for a length, without building the text."""
+    return (chars + 3) // 4
+
+
+def _over(limit: Optional[float], value: float) -> bool:
+    return limit is not None and value > limit
+
+
+def best_effort_finish(
+    steps: Sequence[Tuple[AgentAction, str]], reason: str
+) -> AgentFinish:
+    """
+    AgentFinish for a run stopped by its budget.
+
+    The answer is BUDGET_STOP_MESSAGE plus the last useful observation,
+    which is often most of the answer (e.g. the result of the last
+    math_operation).
+    """
+    output = BUDGET_STOP_MESSAGE
+    for _, observation in reversed(steps):
+        if observation and not str(observation).startswith(_FAILED_OBSERVATION):
+            output = f"{output} Último resultado obtenido: {observation}"
+            break
+    return AgentFinish(
+        return_values={"output": output},
+        log=f"Stopped by the run budget ({reason}).",
+    )
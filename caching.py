@@ -0,0 +1,325 @@
+"""
+caching.py
+──────────
+Small, thread-safe cache building blocks shared by the agent.
+
+  • LRUCache        – bounded in-memory tier (OrderedDict) with per-entry
+                      expiry.
+  • SQLiteCache     – on-disk tier that survives restarts and can be
+                      shared by several processes on the same host.
+  • TieredTTLCache  – LRU in front of an optional SQLite tier, with
+                      per-entry TTLs and hit/miss counters.
+
+Values stored on disk must be JSON-serializable.
+
+Usage:
+    from caching import LRUCache, SQLiteCache, TieredTTLCache
+
+    cache = TieredTTLCache(LRUCache(256), SQLiteCache(".cache/search.sqlite"))
+    cache.set("key", {"answer": 42}, ttl=600)
+    cache.get("key")        # → {"answer": 42}
+    cache.stats.hit_rate    # → 1.0
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Returned by the tiers on a miss, so that None can be a cached value.
+MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters of a cache."""
+
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+class LRUCache:
+    """
+    Bounded in-memory cache with least-recently-used eviction.
+
+    Args:
+        maxsize: Maximum number of entries.
+        clock:   Time source for expiry (time.time by default).
+    """
+
+    def __init__(self, maxsize: int = 256, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Return the value for `key`, or MISSING if absent or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    On-disk cache tier backed by a single SQLite table.
+
+    Args:
+        path:        Database file; parent directories are created.
+        table:       Table name, so several caches can share one file.
+        max_entries: Optional size bound. When it is exceeded, expired rows
+                     go first, then the least recently used ones (by
+                     `accessed_at`, updated on every hit of this tier).
+                     Expired rows are also purged when the cache is opened.
+        clock:       Time source for expiry (time.time by default).
+    """
+
+    # The row count is kept in memory; it is re-read from the table every
+    # this many writes, to pick up rows written by other processes.
+    RECOUNT_EVERY: int = 1000
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "cache",
+        max_entries: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.clock = clock
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL)"
+            )
+            columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if "accessed_at" not in columns:  # file written by an older version
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN accessed_at REAL")
+            # purge_expired() and eviction go by expiry, then by last access.
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)"
+            )
+        self._writes = 0
+        with self._lock:
+            self._rows = self._count_locked()
+        self.purge_expired()
+
+    def get(self, key: str) -> Any:
+        """Return the value for `key`, or MISSING if absent or expired."""
+        return self.get_with_expiry(key)[0]
+
+    def get_with_expiry(self, key: str) -> Tuple[Any, Optional[float]]:
+        """
+        Like get(), also returning the entry's expiry timestamp.
+
+        Expired rows are left in place until purge_expired() is called.
+        """
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            hit = row is not None and (row[1] is None or row[1] > now)
+            if hit and self.max_entries is not None:
+                with self._conn:
+                    self._conn.execute(
+                        f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+                    )
+        if not hit:
+            return MISSING, None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock, self._conn:
+            exists = self._conn.execute(
+                f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, self.clock()),
+            )
+            if exists is None:
+                self._rows += 1
+            if self.max_entries is not None:
+                self._writes += 1
+                if self._writes % self.RECOUNT_EVERY == 0:
+                    self._rows = self._count_locked()
+                if self._rows > self.max_entries:
+                    self._evict_locked()
+
+    def _count_locked(self) -> int:
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return count
+
+    def _evict_locked(self) -> None:
+        excess = self._rows - self.max_entries
+        removed = self._conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (self.clock(),),
+        ).rowcount
+        if removed < excess:
+            removed += self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)",
+                (excess - removed,),
+            ).rowcount
+        self._rows -= removed
+        self.evictions += removed
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._rows -= self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key = ?", (key,)
+            ).rowcount
+
+    def purge_expired(self) -> int:
+        """Delete expired rows and return how many were removed."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (self.clock(),),
+            )
+            self._rows -= cursor.rowcount
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._rows = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredTTLCache:
+    """
+    In-memory LRU tier in front of an optional SQLite tier.
+
+    Disk hits are promoted to memory with their remaining TTL.
+
+    Args:
+        memory:      LRUCache tier.
+        disk:        Optional SQLiteCache tier.
+        default_ttl: TTL in seconds when set() is called without one.
+                     None means entries never expire.
+    """
+
+    def __init__(
+        self,
+        memory: Optional[LRUCache] = None,
+        disk: Optional[SQLiteCache] = None,
+        default_ttl: Optional[float] = None,
+    ):
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key)
+        if value is not MISSING:
+            self._count(memory_hit=True)
+            return value
+        if self.disk is not None:
+            value, expires_at = self.disk.get_with_expiry(key)
+            if value is not MISSING:
+                self.memory.set(key, value, expires_at)
+                self._count(disk_hit=True)
+                return value
+        self._count()
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = None if ttl is None else self.memory.clock() + ttl
+        self.memory.set(key, value, expires_at)
+        if self.disk is not None:
+            self.disk.set(key, value, expires_at)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def _count(self, memory_hit: bool = False, disk_hit: bool = False) -> None:
+        with self._stats_lock:
+            if memory_hit:
+                self.stats.hits += 1
+                self.stats.memory_hits += 1
+            elif disk_hit:
+                self.stats.hits += 1
+                self.stats.disk_hits += 1
+            else:
+                self.stats.misses += 1
+            self.stats.evictions = self.memory.evictions + (
+                self.disk.evictions if self.disk is not None else 0
+            )
@@ -1,18 +1,694 @@
-from typing import Dict, Any, List
+import atexit
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Any, Deque, IO, Iterator, List, Optional, Set, Tuple, Union
+from uuid import UUID
 
-from langchain.callbacks.base import BaseCallbackHandler
-from langchain.schema import LLMResult
+# langchain_core instead of langchain: the executor imports this module.
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+from guardrails import BLOCKED_OUTPUT_MESSAGE, OutputBlockedError, StreamingOutputGuard
+from react_prompt import common_prefix_length, is_strict_append
+
+
+# Background logging (AgentCallbackHandler(background=True)).
+PROMPT_LOG_MAX_CHARS: int = 2000   # longer prompts/responses are cut in the middle
+PROMPT_LOG_QUEUE_SIZE: int = 1000  # pending records; more are dropped, not waited for
+PROMPT_LOG_RING_SIZE: int = 20     # last full prompts/responses kept for dump()
+
+
+def truncate_middle(text: str, max_chars: Optional[int]) -> str:
+    """Keep the head and the tail of `text` (the tail holds the newest scratchpad step)."""
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    head = max_chars // 4
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n... [{omitted} chars omitted] ...\n{text[-tail:]}"
+
+
+class BackgroundLogWriter:
+    """
+    Writes log records from a daemon thread, fed through a bounded queue.
+
+    submit() never blocks: when the queue is full the record is dropped
+    and counted in `dropped`. Records are formatted (and truncated) in the
+    writer thread, so the caller only pays for a queue put.
+
+    Args:
+        stream:  Destination; sys.stdout (looked up at write time) if None.
+        maxsize: Queue capacity.
+    """
+
+    def __init__(self, stream: Optional[IO[str]] = None, maxsize: int = PROMPT_LOG_QUEUE_SIZE):
+        self.stream = stream
+        self.dropped = 0
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, title: str, text: str, max_chars: Optional[int]) -> bool:
+        """Queue one record; False if it was dropped because the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((title, text, max_chars))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the queued records are written; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._loop, name="agent-log-writer", daemon=True
+                    )
+                    self._thread.start()
+                    atexit.register(self.flush, 1.0)
+
+    def _loop(self) -> None:
+        while True:
+            title, text, max_chars = self._queue.get()
+            try:
+                stream = self.stream or sys.stdout
+                stream.write(f"{title}\n{truncate_middle(text, max_chars)}\n*********\n")
+                if self._queue.empty():
+                    stream.flush()
+            except Exception:
+                pass  # logging must never take the agent down
+            finally:
+                self._queue.task_done()
+
+
+_default_writer: Optional[BackgroundLogWriter] = None
+_default_writer_lock = threading.Lock()
+
+
+def default_log_writer() -> BackgroundLogWriter:
+    """Process-wide BackgroundLogWriter on stdout."""
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = BackgroundLogWriter()
+        return _default_writer
+
+
+PROMPT_TITLE = "---------------------------El prompt al LLM ha sido:--------------------------"
+RESPONSE_TITLE = "----------------------------Respuesta del LLM ------------------------------"
 
 
 class AgentCallbackHandler(BaseCallbackHandler):
+    """
+    Print every prompt sent to the LLM and every response.
+
+    By default each record is printed synchronously and in full. With
+    `background=True` (the Streamlit front-ends) the LLM call never waits
+    on stdout:
+
+      • Records go to a BackgroundLogWriter through a bounded queue and
+        are dropped, not waited for, when it is full.
+      • Prompts and responses are cut in the middle to `max_chars`.
+      • Only one in `sample_every` LLM calls is logged.
+      • The last `ring_size` full prompts and responses are always kept,
+        logged or not; dump() writes them out on demand.
+
+    Args:
+        background:   Use the background writer instead of print().
+        max_chars:    Truncation length; PROMPT_LOG_MAX_CHARS in
+                      background mode, no truncation otherwise.
+        sample_every: Log one in every N LLM calls (1 = all).
+        ring_size:    Full records kept for dump().
+        writer:       Background writer; the process-wide one by default.
+    """
+
+    _UNSET: Any = object()
+
+    def __init__(
+        self,
+        background: bool = False,
+        max_chars: Optional[int] = _UNSET,
+        sample_every: int = 1,
+        ring_size: int = PROMPT_LOG_RING_SIZE,
+        writer: Optional[BackgroundLogWriter] = None,
+    ):
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        self.background = background
+        if max_chars is self._UNSET:
+            max_chars = PROMPT_LOG_MAX_CHARS if background else None
+        self.max_chars = max_chars
+        self.sample_every = sample_every
+        self.writer = writer
+        self.recent: Deque[Tuple[float, str, str]] = deque(maxlen=ring_size)
+        self._calls = itertools.count()
+        self._sampled: Set[UUID] = set()
+        self._lock = threading.Lock()
+
     def on_llm_start(
         self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any
     ) -> Any:
         """Run when LLM starts running."""
-        print(f"---------------------------El prompt al LLM ha sido:--------------------------\n{prompts[0]}")
-        print("*********")
+        self.recent.append((time.time(), "prompt", prompts[0]))
+        run_id = kwargs.get("run_id")
+        if next(self._calls) % self.sample_every:
+            return
+        if run_id is not None:
+            with self._lock:
+                self._sampled.add(run_id)
+        self._emit(PROMPT_TITLE, prompts[0])
 
     def on_llm_end(self, response: LLMResult, **kwargs: Any) -> Any:
         """Run when LLM ends running."""
-        print(f"----------------------------Respuesta del LLM ------------------------------\n{response.generations[0][0].text}")
+        text = response.generations[0][0].text
+        self.recent.append((time.time(), "response", text))
+        run_id = kwargs.get("run_id")
+        if run_id is None:
+            # No way to match it to its prompt: only log it when all are.
+            if self.sample_every > 1:
+                return
+        else:
+            with self._lock:
+                if run_id not in self._sampled:
+                    return
+                self._sampled.discard(run_id)
+        self._emit(RESPONSE_TITLE, text)
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> Any:
+        with self._lock:
+            self._sampled.discard(kwargs.get("run_id"))
+
+    def dump(self, stream: Optional[IO[str]] = None) -> int:
+        """
+        Write the ring buffer (full, untruncated) to `stream` (stderr by default).
+
+        Returns:
+            Number of records written.
+        """
+        stream = stream or sys.stderr
+        records = list(self.recent)
+        for timestamp, kind, text in records:
+            stamp = time.strftime("%H:%M:%S", time.localtime(timestamp))
+            stream.write(f"----- {stamp} {kind} ({len(text)} chars) -----\n{text}\n")
+        stream.flush()
+        return len(records)
+
+    def _emit(self, title: str, text: str) -> None:
+        if self.background:
+            (self.writer or default_log_writer()).submit(title, text, self.max_chars)
+            return
+        print(f"{title}\n{truncate_middle(text, self.max_chars)}")
         print("*********")
+
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+def _strip_partial_marker(text: str) -> str:
+    # Hide a "Final Ans" that is still arriving so it does not flash in the
+    # steps panel before moving to the answer.
+    for size in range(len(FINAL_ANSWER_MARKER) - 1, 0, -1):
+        if text.endswith(FINAL_ANSWER_MARKER[:size]):
+            return text[:-size]
+    return text
+
+
+class ReActStreamHandler(BaseCallbackHandler):
+    """
+    Stream each ReAct step to the UI while the LLM is still generating.
+
+    Requires an LLM created with `streaming=True`. Thought/Action text is
+    shown live in `steps_container` (e.g. an `st.status` panel) and, once
+    the "Final Answer:" marker arrives, the answer is written token by
+    token to `answer_placeholder` (e.g. `st.empty()`).
+
+    Both arguments only need a `.markdown(text)` method, plus `.empty()`
+    on `steps_container`, so this module does not depend on Streamlit.
+    With `steps_container=None` only the answer is shown.
+
+    With an `output_guard`, the answer goes through it before being shown
+    (PII redaction, length cap). On blocked content the placeholder shows
+    BLOCKED_OUTPUT_MESSAGE and OutputBlockedError is raised, which aborts
+    the LLM stream and propagates out of ReActExecutor.run().
+    """
+
+    def __init__(
+        self,
+        answer_placeholder: Any,
+        steps_container: Any = None,
+        output_guard: Optional[StreamingOutputGuard] = None,
+    ):
+        self.answer_placeholder = answer_placeholder
+        self.steps_container = steps_container
+        self.output_guard = output_guard
+        # Let OutputBlockedError stop the run instead of being logged.
+        self.raise_error = output_guard is not None
+        self._buffer = ""
+        self._answer_fed = 0
+        self._step_placeholder = None
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any
+    ) -> Any:
+        """Start a new step in the steps panel."""
+        self._buffer = ""
+        self._answer_fed = 0
+        if self.output_guard is not None:
+            self.output_guard.reset()
+        if self.steps_container is not None:
+            self._step_placeholder = self.steps_container.empty()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> Any:
+        """Show the partial step, or the partial answer once it has started."""
+        self._buffer += token
+        thought, marker, answer = self._buffer.partition(FINAL_ANSWER_MARKER)
+        if marker:
+            self._show_answer(answer, final=False)
+        elif self._step_placeholder is not None:
+            self._step_placeholder.markdown(_strip_partial_marker(thought) + "▌")
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> Any:
+        """Leave the finished Thought/Action text in the steps panel."""
+        if not self._buffer and response.generations and response.generations[0]:
+            # Cached responses (see llm_cache.py) arrive without tokens.
+            self._buffer = response.generations[0][0].text
+        thought, marker, answer = self._buffer.partition(FINAL_ANSWER_MARKER)
+        if self._step_placeholder is not None:
+            self._step_placeholder.markdown(thought)
+        if marker:
+            self._show_answer(answer, final=True)
+
+    def _show_answer(self, answer: str, final: bool) -> None:
+        cursor = "" if final else "▌"
+        if self.output_guard is None:
+            text = answer.strip() if final else answer.lstrip()
+            self.answer_placeholder.markdown(text + cursor)
+            return
+        answer = answer.lstrip()
+        try:
+            self.output_guard.feed(answer[self._answer_fed:])
+            self._answer_fed = len(answer)
+            if final:
+                self.output_guard.finish()
+        except OutputBlockedError:
+            self.answer_placeholder.markdown(BLOCKED_OUTPUT_MESSAGE)
+            raise
+        self.answer_placeholder.markdown(self.output_guard.text + cursor)
+
+
+# ─────────────────────────────────────────────
+# Instrumentation
+# ─────────────────────────────────────────────
+
+# Set to a file path to append the spans of every run as JSON lines.
+TRACE_PATH_ENV: str = "AGENT_TRACE_PATH"
+
+# Batch workers and Streamlit sessions export to the same file.
+_TRACE_EXPORT_LOCK = threading.Lock()
+
+
+@dataclass
+class Span:
+    """
+    One timed piece of an agent run.
+
+    Attributes:
+        kind:         "llm", "prompt", "parse", "agent" (one prompt | llm |
+                      parser round trip), "tool", "guardrail" or "memory".
+        name:         Model, tool or function name.
+        session_id:   Conversation / batch item the run belongs to.
+        run_id:       LangChain run id (llm, prompt, parse, agent) or a new
+                      id for spans opened with span().
+        parent_run_id: Enclosing LangChain run, if any.
+        start, end:   Wall-clock timestamps (seconds since the epoch).
+        duration_ms:  Measured with perf_counter.
+        prompt_chars, prompt_tokens, completion_tokens: LLM spans only;
+                      tokens are None when the provider does not report
+                      usage (e.g. OpenAI streaming without stream_usage).
+        cached_tokens: Prompt tokens served from the provider's prefix
+                      cache, when reported.
+        error:        "Type: message" if the span failed.
+        attrs:        Extra details (tool input size, fallback, ...).
+    """
+
+    kind: str
+    name: str
+    session_id: Optional[str]
+    run_id: str
+    parent_run_id: Optional[str] = None
+    start: float = 0.0
+    end: Optional[float] = None
+    duration_ms: Optional[float] = None
+    prompt_chars: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    error: Optional[str] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+def _chain_kind(name: str, parent_run_id: Optional[UUID]) -> Optional[str]:
+    if name == "ReActPrompt":
+        return "prompt"
+    if name.endswith("OutputParser"):
+        return "parse"
+    if parent_run_id is None:
+        return "agent"
+    return None
+
+
+def llm_token_usage(response: LLMResult) -> Dict[str, Optional[int]]:
+    """
+    Prompt, completion and prefix-cached prompt tokens from usage_metadata
+    or OpenAI's llm_output; None for what the provider did not report.
+    """
+    try:
+        usage = response.generations[0][0].message.usage_metadata
+    except (AttributeError, IndexError):
+        usage = None
+    if usage:
+        return {
+            "prompt_tokens": usage.get("input_tokens"),
+            "completion_tokens": usage.get("output_tokens"),
+            "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read"),
+        }
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return {
+        "prompt_tokens": token_usage.get("prompt_tokens"),
+        "completion_tokens": token_usage.get("completion_tokens"),
+        "cached_tokens": (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+    }
+
+
+class InstrumentationHandler(BaseCallbackHandler):
+    """
+    Record where an agent run spends its time, as structured spans.
+
+    LLM calls, prompt rendering, output parsing and the whole agent step
+    are captured from LangChain callbacks. ReActExecutor adds tool spans
+    when this handler is among the run's callbacks, and the front-ends
+    wrap guardrail checks and memory loads with span(). Thread-safe:
+    parallel tool calls and speculative searches record from pool threads.
+
+    Create one per session (or per batch item) and pass it in
+    `executor.run(..., callbacks=[handler])`.
+
+    Args:
+        session_id: Stored on every span; a random id by default.
+    """
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._open: Dict[UUID, tuple] = {}  # run_id -> (span, perf_counter start)
+        self._lock = threading.Lock()
+
+    # ── manual spans ──────────────────────────
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs: Any) -> Iterator[Span]:
+        """Time the body of a `with` block as one span; exceptions are recorded and re-raised."""
+        span = Span(kind, name, self.session_id, uuid.uuid4().hex, start=time.time(), attrs=attrs)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._close(span, started)
+
+    # ── LangChain callbacks ───────────────────
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> Any:
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._start_llm(serialized, chars, run_id, parent_run_id, kwargs)
+
+    def on_llm_start(
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> Any:
+        self._start_llm(serialized, sum(len(p) for p in prompts), run_id, parent_run_id, kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> Any:
+        completion_chars = sum(
+            len(g.text) for generations in response.generations for g in generations
+        )
+        self._finish(run_id, completion_chars=completion_chars, **llm_token_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
+        self._finish(run_id, error)
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> Any:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        kind = _chain_kind(name, parent_run_id)
+        if kind is not None:
+            self._begin(Span(kind, name, self.session_id, str(run_id), _str(parent_run_id)), run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> Any:
+        self._finish(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
+        self._finish(run_id, error)
+
+    # ── export ────────────────────────────────
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [asdict(span) for span in self.spans]
+
+    def export_jsonl(self, destination: Union[str, IO[str]]) -> int:
+        """
+        Append the finished spans as JSON lines and return how many.
+
+        Args:
+            destination: File path (appended to) or an open text stream.
+        """
+        records = self.to_dicts()
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        if isinstance(destination, str):
+            with open(destination, "a", encoding="utf-8") as f:
+                f.write(lines)
+        else:
+            destination.write(lines)
+        return len(records)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count and total milliseconds per span kind."""
+        totals: Dict[str, Dict[str, float]] = {}
+        for record in self.to_dicts():
+            entry = totals.setdefault(record["kind"], {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += record["duration_ms"] or 0.0
+        return totals
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+            self._open.clear()
+
+    # ── internals ─────────────────────────────
+
+    def _start_llm(self, serialized, prompt_chars, run_id, parent_run_id, kwargs) -> None:
+        params = kwargs.get("invocation_params") or {}
+        name = (
+            params.get("model_name") or params.get("model") or kwargs.get("name")
+            or (serialized or {}).get("name") or "llm"
+        )
+        span = Span("llm", name, self.session_id, str(run_id), _str(parent_run_id))
+        span.prompt_chars = prompt_chars
+        self._begin(span, run_id)
+
+    def _begin(self, span: Span, run_id: UUID) -> None:
+        span.start = time.time()
+        with self._lock:
+            self._open[run_id] = (span, time.perf_counter())
+
+    def _finish(self, run_id: UUID, error: Optional[BaseException] = None, **values: Any) -> None:
+        """Close an open span; `values` set Span fields, anything else goes to attrs."""
+        with self._lock:
+            entry = self._open.pop(run_id, None)
+        if entry is None:
+            return
+        span, started = entry
+        for key, value in values.items():
+            if key in Span.__dataclass_fields__:
+                setattr(span, key, value)
+            else:
+                span.attrs[key] = value
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        self._close(span, started)
+
+    def _close(self, span: Span, started: float) -> None:
+        span.duration_ms = (time.perf_counter() - started) * 1000
+        span.end = span.start + span.duration_ms / 1000
+        with self._lock:
+            self.spans.append(span)
+
+
+def _str(value: Optional[UUID]) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def find_instrumentation(callbacks: Optional[List[BaseCallbackHandler]]) -> Optional[InstrumentationHandler]:
+    """The InstrumentationHandler among a run's callbacks, if any."""
+    for handler in callbacks or ():
+        if isinstance(handler, InstrumentationHandler):
+            return handler
+    return None
+
+
+def trace_span(tracer: Optional[InstrumentationHandler], kind: str, name: str, **attrs: Any):
+    """tracer.span(...) or a no-op context manager when tracer is None."""
+    return tracer.span(kind, name, **attrs) if tracer is not None else nullcontext()
+
+
+def instrumentation_from_env(session_id: Optional[str] = None) -> Optional[InstrumentationHandler]:
+    """An InstrumentationHandler if AGENT_TRACE_PATH is set, else None."""
+    return InstrumentationHandler(session_id) if os.getenv(TRACE_PATH_ENV) else None
+
+
+def export_trace(tracer: Optional[InstrumentationHandler]) -> None:
+    """Append the spans of `tracer` to AGENT_TRACE_PATH and start afresh."""
+    path = os.getenv(TRACE_PATH_ENV)
+    if tracer is None or not path:
+        return
+    with _TRACE_EXPORT_LOCK:
+        tracer.export_jsonl(path)
+    tracer.clear()
+
+
+# ─────────────────────────────────────────────
+# Prompt-prefix cache
+# ─────────────────────────────────────────────
+
+
+class PrefixCacheMeter(BaseCallbackHandler):
+    """
+    Measure how much of each prompt the provider's prefix cache can serve.
+
+    For every LLM call it compares the prompt with the previous one
+    (strict append? how long is the shared prefix?) and adds up the
+    cached prompt tokens the provider reports (OpenAI:
+    usage.prompt_tokens_details.cached_tokens, needs stream_usage=True
+    when streaming). Create one per session: prompts of concurrent
+    sessions would be compared with each other.
+
+    Attributes:
+        llm_calls:      Calls measured.
+        prompt_tokens:  Prompt tokens of the calls that reported usage.
+        cached_tokens:  Of those, tokens served from the prefix cache.
+        strict_appends: Calls whose prompt extends the previous one.
+        shared_chars:   Characters each prompt shares with the previous one.
+        prompt_chars:   Characters of every prompt but the first.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.strict_appends = 0
+        self.shared_chars = 0
+        self.prompt_chars = 0
+        self._previous: Optional[str] = None
+        self._prompts: Dict[UUID, str] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> Any:
+        self._prompts[run_id] = "".join(str(m.content) for batch in messages for m in batch)
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any
+    ) -> Any:
+        self._prompts[run_id] = "".join(prompts)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> Any:
+        prompt = self._prompts.pop(run_id, None)
+        if prompt is None:
+            return
+        usage = llm_token_usage(response)
+        with self._lock:
+            self.llm_calls += 1
+            if usage["prompt_tokens"] is not None and usage["cached_tokens"] is not None:
+                self.prompt_tokens += usage["prompt_tokens"]
+                self.cached_tokens += usage["cached_tokens"]
+            if self._previous is not None:
+                self.strict_appends += is_strict_append(self._previous, prompt)
+                self.shared_chars += common_prefix_length(self._previous, prompt)
+                self.prompt_chars += len(prompt)
+            self._previous = prompt
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
+        self._prompts.pop(run_id, None)
+
+    @property
+    def cached_ratio(self) -> Optional[float]:
+        """Share of prompt tokens served from cache; None if never reported."""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else None
+
+    @property
+    def shared_prefix_ratio(self) -> Optional[float]:
+        """Share of prompt characters identical to the start of the previous prompt."""
+        return self.shared_chars / self.prompt_chars if self.prompt_chars else None
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "llm_calls": self.llm_calls,
+                "strict_appends": self.strict_appends,
+                "shared_prefix_ratio": self.shared_prefix_ratio,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": self.cached_ratio,
+            }
@@ -0,0 +1,297 @@
+"""
+clients.py
+──────────
+Process-wide pooled HTTP clients for OpenAI and Tavily.
+
+Each script built its own ChatOpenAI (one openai client, and one
+connection pool, per instance) and TavilySearchResults, whose wrapper
+calls `requests.post()` without a session: every web search opened a new
+TCP connection and TLS session. This module shares the connections:
+
+  • get_http_client() / get_async_http_client() – one httpx client of
+    each kind per process, with keep-alive connections, bounded pool
+    size and timeouts (AGENT_HTTP_* variables, see HttpPoolConfig).
+  • get_chat_model(**kwargs) – ChatOpenAI on the shared clients; every
+    session, Streamlit rerun and the memory summarizer reuse the same
+    connections.
+  • get_search_tool(k) – TavilySearchResults whose API wrapper posts
+    through the shared clients instead of `requests` / a new aiohttp
+    session per call.
+  • warm_up() – opens the connections (TCP + TLS) before the first user
+    question; warm_up_from_env() runs it in the background when
+    AGENT_HTTP_WARMUP=1.
+
+The async client is created on first use; like any httpx.AsyncClient
+its connections belong to the event loop that opened them, so use it
+from one loop per process (as the batch mode's asyncio.run() does).
+
+Usage:
+    from clients import get_chat_model, get_search_tool, warm_up_from_env
+
+    warm_up_from_env()
+    llm = get_chat_model(model="gpt-4o-mini", temperature=0)
+    web_search_tool = cached_search_tool(get_search_tool(k=3))
+"""
+
+import atexit
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OPENAI_API_BASE: str = "https://api.openai.com/v1"
+TAVILY_API_BASE: str = "https://api.tavily.com"
+
+# Environment variables read by http_pool_config_from_env().
+HTTP_POOL_ENV: Dict[str, str] = {
+    "max_connections": "AGENT_HTTP_MAX_CONNECTIONS",
+    "max_keepalive_connections": "AGENT_HTTP_MAX_KEEPALIVE",
+    "keepalive_expiry": "AGENT_HTTP_KEEPALIVE_EXPIRY",
+    "timeout": "AGENT_HTTP_TIMEOUT",
+    "connect_timeout": "AGENT_HTTP_CONNECT_TIMEOUT",
+}
+
+
+@dataclass(frozen=True)
+class HttpPoolConfig:
+    """
+    Pool size and timeouts of the shared clients.
+
+    Attributes:
+        max_connections:           Open connections, all hosts together.
+        max_keepalive_connections: Idle connections kept for reuse.
+        keepalive_expiry:          Seconds an idle connection is kept.
+        timeout:                   Read/write/pool timeout in seconds
+                                   (LLM calls can take a while).
+        connect_timeout:           TCP + TLS connect timeout in seconds.
+    """
+
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60.0
+    timeout: float = 60.0
+    connect_timeout: float = 5.0
+
+
+def http_pool_config_from_env() -> HttpPoolConfig:
+    """HttpPoolConfig with the AGENT_HTTP_* variables that are set."""
+    defaults = HttpPoolConfig()
+    values: Dict[str, Any] = {}
+    for name, variable in HTTP_POOL_ENV.items():
+        value = os.getenv(variable)
+        if value:
+            values[name] = type(getattr(defaults, name))(value)
+    return HttpPoolConfig(**values)
+
+
+def _client_options(config: HttpPoolConfig) -> Dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(config.timeout, connect=config.connect_timeout),
+    }
+
+
+# ─────────────────────────────────────────────
+# Shared clients
+# ─────────────────────────────────────────────
+
+_HTTP_CLIENT: Optional[httpx.Client] = None
+_ASYNC_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """The process-wide pooled httpx.Client, created on first use."""
+    global _HTTP_CLIENT
+    with _CLIENTS_LOCK:
+        if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+            _HTTP_CLIENT = httpx.Client(**_client_options(http_pool_config_from_env()))
+        return _HTTP_CLIENT
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """The process-wide pooled httpx.AsyncClient, created on first use."""
+    global _ASYNC_HTTP_CLIENT
+    with _CLIENTS_LOCK:
+        if _ASYNC_HTTP_CLIENT is None or _ASYNC_HTTP_CLIENT.is_closed:
+            _ASYNC_HTTP_CLIENT = httpx.AsyncClient(**_client_options(http_pool_config_from_env()))
+        return _ASYNC_HTTP_CLIENT
+
+
+def close_clients() -> None:
+    """Close the sync client and drop both; the next get_*() creates new ones."""
+    global _HTTP_CLIENT, _ASYNC_HTTP_CLIENT
+    with _CLIENTS_LOCK:
+        if _HTTP_CLIENT is not None:
+            _HTTP_CLIENT.close()
+        # An AsyncClient can only be closed on its event loop; its sockets
+        # are released with the process.
+        _HTTP_CLIENT = _ASYNC_HTTP_CLIENT = None
+
+
+atexit.register(close_clients)
+
+
+# ─────────────────────────────────────────────
+# OpenAI and Tavily on the shared clients
+# ─────────────────────────────────────────────
+
+
+def get_chat_model(**kwargs: Any):
+    """
+    ChatOpenAI(**kwargs) using the shared sync and async HTTP clients.
+
+    ChatOpenAI passes its own `timeout` (None by default) on every request,
+    overriding the one of the httpx client, so the AGENT_HTTP_* timeouts
+    are set here as well.
+    """
+    from langchain_openai import ChatOpenAI
+
+    if "timeout" not in kwargs and "request_timeout" not in kwargs:
+        config = http_pool_config_from_env()
+        kwargs["timeout"] = httpx.Timeout(config.timeout, connect=config.connect_timeout)
+    kwargs.setdefault("http_client", get_http_client())
+    kwargs.setdefault("http_async_client", get_async_http_client())
+    return ChatOpenAI(**kwargs)
+
+
+def _pooled_tavily_wrapper_class():
+    from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+
+    class PooledTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+        """TavilySearchAPIWrapper posting through the shared httpx clients."""
+
+        api_base: str = TAVILY_API_BASE
+
+        def _params(
+            self,
+            query: str,
+            max_results: Optional[int] = 5,
+            search_depth: Optional[str] = "advanced",
+            include_domains: Optional[List[str]] = None,
+            exclude_domains: Optional[List[str]] = None,
+            include_answer: Optional[bool] = False,
+            include_raw_content: Optional[bool] = False,
+            include_images: Optional[bool] = False,
+        ) -> Dict[str, Any]:
+            # Same parameters (and positional order) as the base class methods.
+            return {
+                "api_key": self.tavily_api_key.get_secret_value(),
+                "query": query,
+                "max_results": max_results,
+                "search_depth": search_depth,
+                "include_domains": include_domains or [],
+                "exclude_domains": exclude_domains or [],
+                "include_answer": include_answer,
+                "include_raw_content": include_raw_content,
+                "include_images": include_images,
+            }
+
+        def raw_results(self, *args: Any, **kwargs: Any) -> Dict:
+            response = get_http_client().post(
+                f"{self.api_base}/search", json=self._params(*args, **kwargs)
+            )
+            response.raise_for_status()
+            return response.json()
+
+        async def raw_results_async(self, *args: Any, **kwargs: Any) -> Dict:
+            response = await get_async_http_client().post(
+                f"{self.api_base}/search", json=self._params(*args, **kwargs)
+            )
+            response.raise_for_status()
+            return response.json()
+
+    return PooledTavilySearchAPIWrapper
+
+
+_TAVILY_WRAPPER_CLASS = None
+
+
+def get_search_tool(k: int = 3, api_base: Optional[str] = None):
+    """
+    TavilySearchResults(k=k) whose requests go through the shared clients.
+
+    Args:
+        k:        Results per search.
+        api_base: Tavily endpoint (AGENT_TAVILY_API_BASE, or the real API).
+    """
+    global _TAVILY_WRAPPER_CLASS
+    from langchain_community.tools.tavily_search import TavilySearchResults
+
+    if _TAVILY_WRAPPER_CLASS is None:
+        _TAVILY_WRAPPER_CLASS = _pooled_tavily_wrapper_class()
+    wrapper = _TAVILY_WRAPPER_CLASS(
+        api_base=api_base or os.getenv("AGENT_TAVILY_API_BASE", TAVILY_API_BASE)
+    )
+    return TavilySearchResults(k=k, api_wrapper=wrapper)
+
+
+# ─────────────────────────────────────────────
+# Warm-up
+# ─────────────────────────────────────────────
+
+
+def warm_up(urls: Optional[List[str]] = None, connections: int = 1) -> int:
+    """
+    Open `connections` keep-alive connections to each URL's host.
+
+    The response (often 401 or 404: no credentials are sent) does not
+    matter; the connection, with its TLS session, stays in the pool for
+    the first real request. Failures are logged, never raised.
+
+    Args:
+        urls:        Defaults to the OpenAI and Tavily endpoints in use
+                     (OPENAI_BASE_URL / AGENT_TAVILY_API_BASE).
+        connections: Parallel requests per URL, for as many pooled
+                     connections.
+
+    Returns:
+        Number of requests that got a response.
+    """
+    if urls is None:
+        urls = [
+            f"{os.getenv('OPENAI_BASE_URL', OPENAI_API_BASE).rstrip('/')}/models",
+            os.getenv("AGENT_TAVILY_API_BASE", TAVILY_API_BASE),
+        ]
+    client = get_http_client()
+    ok = 0
+    ok_lock = threading.Lock()
+
+    def request(url: str) -> None:
+        nonlocal ok
+        try:
+            client.get(url)
+        except httpx.HTTPError as e:
+            logger.debug("HTTP warm-up of %s failed: %s", url, e)
+            return
+        with ok_lock:
+            ok += 1
+
+    threads = [
+        threading.Thread(target=request, args=(url,), daemon=True)
+        for url in urls
+        for _ in range(connections)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return ok
+
+
+def warm_up_from_env() -> Optional[threading.Thread]:
+    """Run warm_up() in a background thread if AGENT_HTTP_WARMUP=1 is set."""
+    if os.getenv("AGENT_HTTP_WARMUP", "0").lower() not in ("1", "true", "yes"):
+        return None
+    thread = threading.Thread(target=warm_up, name="http-warm-up", daemon=True)
+    thread.start()
+    return thread
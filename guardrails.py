@@ -11,6 +11,10 @@ Provides three guard layers:
   3. Output Guardrails  – filter and redact the agent's final response
                           before it is shown to the user.
 
+Prompt-injection patterns are checked in a single pass over the input by
+MultiPatternScanner (literal prefilter + regex confirmation), so adding
+rules does not add full scans.
+
 Usage:
     from guardrails import (
         validate_input,
@@ -23,6 +27,8 @@ Usage:
 import ast
 import re
 import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +40,12 @@ logger = logging.getLogger(__name__)
 # Prevents infinite loops caused by confused or adversarially prompted LLMs.
 MAX_AGENT_ITERATIONS: int = 10
 
+# Per-run resource limits (see budget.RunBudget). Iterations alone do not
+# bound cost: a few iterations with long observations can be expensive.
+MAX_RUN_PROMPT_TOKENS: int = 30_000
+MAX_RUN_TOOL_CALLS: int = 8
+MAX_RUN_SECONDS: float = 60.0
+
 # Maximum length (chars) of a user input string.
 MAX_INPUT_LENGTH: int = 1000
 
@@ -66,9 +78,224 @@ _INJECTION_PATTERNS: list[str] = [
     r"no\s+restrictions",
 ]
 
-_COMPILED_INJECTION_RE = [
-    re.compile(p, re.IGNORECASE) for p in _INJECTION_PATTERNS
-]
+# ─────────────────────────────────────────────
+# Multi-pattern scanner
+# ─────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class PatternMatch:
+    """First (leftmost) match found by MultiPatternScanner."""
+
+    pattern: str
+    start: int
+    end: int
+    text: str
+
+
+class _Alternation:
+    """Several patterns compiled into one `(?P<_pN>...)|...` regex."""
+
+    def __init__(self, indexed: Sequence[Tuple[int, str]], flags: int):
+        self.singles: Optional[List[Tuple[int, "re.Pattern"]]] = None
+        try:
+            self.regex = re.compile(
+                "|".join(f"(?P<_p{i}>{p})" for i, p in indexed), flags
+            )
+        except re.error:
+            # e.g. a pattern with its own numbered back-references
+            self.regex = None
+            self.singles = [(i, re.compile(p, flags)) for i, p in indexed]
+
+    def _found(self, m: "re.Match") -> Tuple[int, "re.Match"]:
+        name = m.lastgroup
+        if name is None or not name.startswith("_p"):
+            name = next(k for k, v in m.groupdict().items() if k.startswith("_p") and v is not None)
+        return int(name[2:]), m
+
+    def match(self, text: str, pos: int) -> Optional[Tuple[int, "re.Match"]]:
+        if self.regex is not None:
+            m = self.regex.match(text, pos)
+            return self._found(m) if m else None
+        for i, regex in self.singles:
+            m = regex.match(text, pos)
+            if m:
+                return i, m
+        return None
+
+    def search(self, text: str) -> Optional[Tuple[int, "re.Match"]]:
+        if self.regex is not None:
+            m = self.regex.search(text)
+            return self._found(m) if m else None
+        found = [(m.start(), i, m) for i, r in self.singles for m in [r.search(text)] if m]
+        return min(found, key=lambda f: (f[0], f[1]))[1:] if found else None
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    depth, i, in_class = 0, 0, False
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Literal text every match of `pattern` starts with ("" if none)."""
+    if _has_top_level_alternation(pattern):
+        return ""
+    i = 0
+    while pattern.startswith(r"\b", i):  # zero-width, checked on confirmation
+        i += 2
+    literal = []
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            escaped = pattern[i + 1: i + 2]
+            if not escaped or escaped.isalnum():  # \s, \d, \b, \1 ...
+                break
+            char, step = escaped, 2
+        elif c in ".^$*+?{}[]|()":
+            break
+        else:
+            char, step = c, 1
+        quantifier = pattern[i + step: i + step + 1]
+        if quantifier and quantifier in "*?{":
+            break
+        literal.append(char)
+        if quantifier == "+":
+            break
+        i += step
+    return "".join(literal)
+
+
+def _trie_regex(words: Sequence[str]) -> str:
+    """Regex alternation of `words` factored as a trie (shared prefixes once)."""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        ends_here = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends_here:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class MultiPatternScanner:
+    """
+    Find the first match of any of many regexes in a single pass.
+
+    Most rules start with a literal word ("ignore", "forget", "jailbreak"…).
+    Those literals are merged into one trie-shaped regex that finds every
+    position where a rule could start; only the rules sharing that
+    literal are then confirmed there with `match(text, pos)`. Rules
+    without a literal prefix go into one combined alternation. Adding
+    rules therefore adds branches to a single scan instead of another
+    full scan of the input.
+
+    If lowercasing the input changes its length (rare Unicode cases), the
+    literal positions would not line up, so the input is scanned with
+    the combined alternation of all rules instead.
+
+    Args:
+        patterns: Regex strings.
+        flags:    re flags for every pattern (IGNORECASE by default).
+    """
+
+    def __init__(self, patterns: Sequence[str], flags: int = re.IGNORECASE):
+        self.patterns: Tuple[str, ...] = tuple(patterns)
+        self._fold = bool(flags & re.IGNORECASE)
+
+        by_literal: Dict[str, List[Tuple[int, str]]] = {}
+        unanchored: List[Tuple[int, str]] = []
+        for i, pattern in enumerate(self.patterns):
+            literal = _literal_prefix(pattern)
+            if self._fold:
+                literal = literal.lower()
+            if literal:
+                by_literal.setdefault(literal, []).append((i, pattern))
+            else:
+                unanchored.append((i, pattern))
+
+        self._confirm = {lit: _Alternation(rules, flags) for lit, rules in by_literal.items()}
+        self._prefilter = (
+            re.compile(f"(?=({_trie_regex(list(by_literal))}))") if by_literal else None
+        )
+        self._max_literal = max(map(len, by_literal), default=0)
+        self._unanchored = _Alternation(unanchored, flags) if unanchored else None
+        self._all = _Alternation(list(enumerate(self.patterns)), flags) if self.patterns else None
+
+    def search(self, text: str) -> Optional[PatternMatch]:
+        """Leftmost match of any pattern in `text`, or None."""
+        if self._all is None:
+            return None
+        haystack = text.lower() if self._fold else text
+        if len(haystack) != len(text):
+            return self._result(self._all.search(text))
+
+        best = self._unanchored.search(text) if self._unanchored else None
+        limit = best[1].start() if best else len(text)
+        if self._prefilter is not None:
+            for candidate in self._prefilter.finditer(haystack):
+                if candidate.start() >= limit:
+                    break
+                found = self._confirm_at(text, haystack, candidate.start())
+                if found:
+                    best = found
+                    break
+        return self._result(best)
+
+    def _confirm_at(self, text: str, haystack: str, pos: int) -> Optional[Tuple[int, "re.Match"]]:
+        found = []
+        window = haystack[pos: pos + self._max_literal]
+        for end in range(len(window), 0, -1):
+            rules = self._confirm.get(window[:end])
+            if rules is not None:
+                match = rules.match(text, pos)
+                if match:
+                    found.append(match)
+        return min(found, key=lambda f: f[0]) if found else None
+
+    def _result(self, found: Optional[Tuple[int, "re.Match"]]) -> Optional[PatternMatch]:
+        if found is None:
+            return None
+        index, m = found
+        return PatternMatch(self.patterns[index], m.start(), m.end(), m.group(0))
+
+
+_INJECTION_SCANNER = MultiPatternScanner(_INJECTION_PATTERNS)
+
+
+class InjectionDetectedError(ValueError):
+    """Raised by validate_input(); `match` tells which pattern fired."""
+
+    def __init__(self, match: PatternMatch):
+        super().__init__(
+            "⚠️ Tu consulta contiene instrucciones que no están permitidas. "
+            "Por favor, reformula tu pregunta."
+        )
+        self.match = match
 
 
 def validate_input(text: str) -> str:
@@ -83,7 +310,8 @@ def validate_input(text: str) -> str:
     Returns the original text (unchanged) if all checks pass.
 
     Raises:
-        ValueError: with a user-friendly message if any check fails.
+        ValueError: with a user-friendly message if any check fails
+            (InjectionDetectedError for prompt injections).
     """
     # 1. Empty input check
     stripped = text.strip()
@@ -97,18 +325,15 @@ def validate_input(text: str) -> str:
             f"El máximo permitido es {MAX_INPUT_LENGTH} caracteres."
         )
 
-    # 3. Prompt-injection detection
-    for pattern in _COMPILED_INJECTION_RE:
-        if pattern.search(stripped):
-            logger.warning(
-                "Prompt injection attempt detected. Pattern: %s | Input: %.100s",
-                pattern.pattern,
-                stripped,
-            )
-            raise ValueError(
-                "⚠️ Tu consulta contiene instrucciones que no están permitidas. "
-                "Por favor, reformula tu pregunta."
-            )
+    # 3. Prompt-injection detection (all patterns in one pass)
+    match = _INJECTION_SCANNER.search(stripped)
+    if match:
+        logger.warning(
+            "Prompt injection attempt detected. Pattern: %s | Input: %.100s",
+            match.pattern,
+            stripped,
+        )
+        raise InjectionDetectedError(match)
 
     return stripped
 
@@ -178,9 +403,42 @@ _OUTPUT_BLOCKED_PATTERNS: list[str] = [
     r"\bsuicid",
 ]
 
-_COMPILED_OUTPUT_BLOCKED = [
-    re.compile(p, re.IGNORECASE) for p in _OUTPUT_BLOCKED_PATTERNS
-]
+_OUTPUT_BLOCKED_SCANNER = MultiPatternScanner(_OUTPUT_BLOCKED_PATTERNS)
+
+BLOCKED_OUTPUT_MESSAGE: str = (
+    "⚠️ La respuesta del agente contenía contenido que no está permitido "
+    "mostrar. Por favor, reformula tu pregunta."
+)
+TRUNCATION_SUFFIX: str = "\n\n… *(respuesta truncada)*"
+
+# Characters of a streamed answer held back so that PII split across
+# chunks is still redacted (longer than any email or phone number).
+OUTPUT_LOOKBACK_CHARS: int = 64
+
+# Points no email or phone match can span, where streamed text can be
+# released: whitespace after a character that is neither, or before a "+"
+# (phone numbers only have it in front).
+_SAFE_CUT_RE = re.compile(r"[^\s\d\-+().@]\s+|\s(?=\+)")
+
+# A word still being streamed: a match that touches it may not hold once
+# the word is complete (trailing \b), so it is not scanned yet.
+_TRAILING_WORD_RE = re.compile(r"\w+\Z")
+_LEADING_WORD_RE = re.compile(r"\A\w+")
+_WORD_CHAR_RE = re.compile(r"\w")
+
+
+class OutputBlockedError(ValueError):
+    """Raised while streaming when the answer hits a blocked pattern."""
+
+    def __init__(self, match: PatternMatch):
+        super().__init__(BLOCKED_OUTPUT_MESSAGE)
+        self.match = match
+
+
+def _redact_pii(text: str) -> str:
+    for pattern, replacement in _COMPILED_PII:
+        text = pattern.sub(replacement, text)
+    return text
 
 
 def validate_output(text: str) -> str:
@@ -195,23 +453,145 @@ def validate_output(text: str) -> str:
     Returns the sanitised response string.
     """
     # 1. Blocked content check
-    for pattern in _COMPILED_OUTPUT_BLOCKED:
-        if pattern.search(text):
-            logger.warning(
-                "Blocked content detected in agent output. Pattern: %s",
-                pattern.pattern,
-            )
-            return (
-                "⚠️ La respuesta del agente contenía contenido que no está permitido "
-                "mostrar. Por favor, reformula tu pregunta."
-            )
+    match = _OUTPUT_BLOCKED_SCANNER.search(text)
+    if match:
+        logger.warning(
+            "Blocked content detected in agent output. Pattern: %s",
+            match.pattern,
+        )
+        return BLOCKED_OUTPUT_MESSAGE
 
     # 2. PII redaction
-    for pattern, replacement in _COMPILED_PII:
-        text = pattern.sub(replacement, text)
+    text = _redact_pii(text)
 
     # 3. Length cap
     if len(text) > MAX_OUTPUT_LENGTH:
-        text = text[:MAX_OUTPUT_LENGTH] + "\n\n… *(respuesta truncada)*"
+        text = text[:MAX_OUTPUT_LENGTH] + TRUNCATION_SUFFIX
 
     return text
+
+
+class StreamingOutputGuard:
+    """
+    Incremental version of validate_output() for streamed answers.
+
+    feed() takes the next chunk and returns the text that is safe to show
+    now; finish() returns the rest. Only a small window is held back:
+
+      - Text is released at whitespace that no email or phone number can
+        span, keeping at least `lookback` characters, so PII split
+        across chunks is redacted exactly as in validate_output(). Only
+        a run of more than 4 × lookback characters without such a point
+        (e.g. a long list of bare numbers) is cut at the window edge.
+      - Blocked patterns are checked on the held-back window plus the
+        tail of the released text (cut at a word boundary), leaving out
+        a trailing partial word until it is complete; on a hit, `blocked`
+        is set and OutputBlockedError is raised so the caller can stop
+        the stream and replace what was shown with BLOCKED_OUTPUT_MESSAGE.
+      - Once MAX_OUTPUT_LENGTH characters are released, the rest of the
+        stream is only checked for blocked content (not stored) and
+        finish() adds TRUNCATION_SUFFIX.
+
+    `text` holds everything released so far.
+
+    Args:
+        lookback:   Characters held back (OUTPUT_LOOKBACK_CHARS).
+        max_length: Length cap of the released text (MAX_OUTPUT_LENGTH).
+    """
+
+    def __init__(
+        self,
+        lookback: int = OUTPUT_LOOKBACK_CHARS,
+        max_length: int = MAX_OUTPUT_LENGTH,
+    ):
+        self.lookback = lookback
+        self.max_length = max_length
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new answer."""
+        self.text = ""
+        self.blocked = False
+        self.truncated = False
+        self._pending = ""
+        self._released_tail = ""  # raw text, for blocked patterns across the cut
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk; return the redacted text that can be shown now.
+
+        Raises:
+            OutputBlockedError: if the answer contains blocked content.
+        """
+        if self.blocked:
+            return ""
+        if self.truncated:
+            # Nothing more is shown, but blocked content still replaces it.
+            self._released_tail += chunk
+            self._check_blocked()
+            self._released_tail = self._tail(self._released_tail)
+            return ""
+        self._pending += chunk
+        self._check_blocked()
+
+        limit = len(self._pending) - self.lookback
+        cut = 0
+        for boundary in _SAFE_CUT_RE.finditer(self._pending, 0, max(limit, 0)):
+            cut = boundary.end()
+        if cut == 0 and limit > 3 * self.lookback:
+            cut = limit  # no safe boundary at all: bound the window anyway
+        return self._release(cut)
+
+    def finish(self) -> str:
+        """
+        Return the held-back text (and the truncation notice).
+
+        Raises:
+            OutputBlockedError: if the last word completes blocked content.
+        """
+        if self.blocked:
+            return ""
+        self._check_blocked(final=True)
+        released = self._release(len(self._pending))
+        if self.truncated:
+            released += TRUNCATION_SUFFIX
+            self.text += TRUNCATION_SUFFIX
+        return released
+
+    def _tail(self, text: str) -> str:
+        """The last `lookback` characters of `text`, not starting mid-word."""
+        if len(text) <= self.lookback:
+            return text
+        tail = text[-self.lookback:]
+        if _WORD_CHAR_RE.match(text, len(text) - self.lookback - 1):
+            tail = _LEADING_WORD_RE.sub("", tail)  # a \b would match there
+        return tail
+
+    def _check_blocked(self, final: bool = False) -> None:
+        window = self._released_tail + self._pending
+        if not final:
+            partial = _TRAILING_WORD_RE.search(window)
+            if partial:
+                window = window[: partial.start()]
+        match = _OUTPUT_BLOCKED_SCANNER.search(window)
+        if match:
+            logger.warning(
+                "Blocked content detected in streamed agent output. Pattern: %s",
+                match.pattern,
+            )
+            self.blocked = True
+            raise OutputBlockedError(match)
+
+    def _release(self, cut: int) -> str:
+        if cut <= 0 or self.truncated:
+            return ""
+        raw, self._pending = self._pending[:cut], self._pending[cut:]
+        released = _redact_pii(raw)
+        room = self.max_length - len(self.text)
+        if len(released) > room:
+            released = released[:room]
+            self.truncated = True
+            raw, self._pending = raw + self._pending, ""
+        self._released_tail = self._tail(self._released_tail + raw)
+        self.text += released
+        return released
@@ -0,0 +1,324 @@
+"""
+hedging.py
+──────────
+Hedged LLM requests: cut the tail latency of multi-step ReAct runs.
+
+A run of 5–10 steps waits on 5–10 sequential LLM calls, so one slow
+request (a cold replica, a queue on the provider side) sets the latency
+of the whole run. HedgedRunnable wraps the chat model in the agent chain:
+
+  • It keeps a window of recent call latencies (LatencyWindow).
+  • When a call has not returned after the `percentile` of that window,
+    it sends the same request again and keeps whichever answers first.
+    In arun() the other request is cancelled; in run() a blocking
+    request cannot be interrupted, so it finishes in the background and
+    its answer is dropped. Calls that cannot be hedged (window still
+    filling, cap reached) run directly on the caller's thread.
+  • Hedges are capped at `max_hedge_ratio` of all calls, so a provider
+    that is slow for everybody does not get twice the traffic.
+  • HedgeStats counts calls, hedges, hedges that won and hedges skipped
+    because of the cap.
+
+Both requests run with the chain's callbacks, so the duplicate's tokens
+show up in BudgetTracker and InstrumentationHandler (they are paid for).
+For the same reason, do not hedge a model whose tokens are streamed to
+the user (ReActStreamHandler would receive both streams).
+
+Usage:
+    from hedging import HedgedRunnable
+
+    hedged_llm = HedgedRunnable(llm, percentile=95, max_hedge_ratio=0.1)
+    agent = build_react_agent(prompt, hedged_llm)
+    ...
+    print(hedged_llm.stats)
+"""
+
+import asyncio
+import bisect
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+# Defaults of HedgedRunnable (and of hedged_from_env()).
+HEDGE_PERCENTILE: float = 95.0
+HEDGE_MAX_RATIO: float = 0.1
+HEDGE_MIN_SAMPLES: int = 20
+HEDGE_WINDOW_SIZE: int = 200
+
+# Default of AGENT_HEDGE_POOL_MAX_WORKERS: threads of the pool shared by
+# HedgedRunnable.invoke(). A hedged call holds two; hedged_from_env() sizes
+# a dedicated pool when the caller says it runs more calls at once.
+HEDGE_POOL_MAX_WORKERS: int = 64
+
+_HEDGE_POOL: Optional[ThreadPoolExecutor] = None
+_HEDGE_POOL_LOCK = threading.Lock()
+
+
+def _shared_hedge_pool() -> ThreadPoolExecutor:
+    global _HEDGE_POOL
+    with _HEDGE_POOL_LOCK:
+        if _HEDGE_POOL is None:
+            _HEDGE_POOL = ThreadPoolExecutor(
+                max_workers=int(os.getenv("AGENT_HEDGE_POOL_MAX_WORKERS", HEDGE_POOL_MAX_WORKERS)),
+                thread_name_prefix="llm-hedge",
+            )
+        return _HEDGE_POOL
+
+
+class LatencyWindow:
+    """Sliding window of the last `size` latencies with percentile queries."""
+
+    def __init__(self, size: int = HEDGE_WINDOW_SIZE):
+        self._order: Deque[float] = deque(maxlen=size)
+        self._sorted: List[float] = []
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            if len(self._order) == self._order.maxlen:
+                oldest = self._order[0]
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+            self._order.append(seconds)
+            bisect.insort(self._sorted, seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile (0 < p <= 100); None while empty."""
+        with self._lock:
+            if not self._sorted:
+                return None
+            rank = max(int(round(p / 100 * len(self._sorted) + 0.5)) - 1, 0)
+            return self._sorted[min(rank, len(self._sorted) - 1)]
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+
+@dataclass
+class HedgeStats:
+    """
+    Counters of one HedgedRunnable.
+
+    Attributes:
+        calls:      invoke() / ainvoke() calls.
+        hedged:     Calls that sent a duplicate request.
+        hedge_wins: Hedged calls answered by the duplicate.
+        capped:     Calls past the delay that could not hedge (cap reached).
+                    Calls that start with the cap reached run without the
+                    thread pool and are counted here when they end up slow.
+    """
+
+    calls: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    capped: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class HedgedRunnable(Runnable):
+    """
+    Runnable wrapper that duplicates slow calls of `runnable` (a chat model).
+
+    Args:
+        runnable:        The wrapped model (any Runnable).
+        percentile:      Hedge a call still running after this percentile
+                         of the recent latencies.
+        max_hedge_ratio: At most this share of calls are hedged.
+        min_samples:     No hedging until this many latencies are known.
+        min_delay:       Never hedge before this many seconds.
+        window_size:     Latencies kept for the percentile.
+        executor:        Thread pool for the invoke() calls that may be
+                         hedged; a shared one by default.
+    """
+
+    def __init__(
+        self,
+        runnable: Runnable,
+        *,
+        percentile: float = HEDGE_PERCENTILE,
+        max_hedge_ratio: float = HEDGE_MAX_RATIO,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        min_delay: float = 0.0,
+        window_size: int = HEDGE_WINDOW_SIZE,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        if not 0 < percentile <= 100:
+            raise ValueError(f"percentile must be in (0, 100], got {percentile}")
+        self.runnable = runnable
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latencies = LatencyWindow(window_size)
+        self.stats = HedgeStats()
+        self.executor = executor
+        self._lock = threading.Lock()
+
+    @property
+    def InputType(self) -> Any:
+        return self.runnable.InputType
+
+    @property
+    def OutputType(self) -> Any:
+        return self.runnable.OutputType
+
+    # ── policy ────────────────────────────────
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there are too few samples."""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.latencies.percentile(self.percentile), self.min_delay)
+
+    def _start_call(self) -> Optional[float]:
+        with self._lock:
+            self.stats.calls += 1
+        return self.hedge_delay()
+
+    def _hedge_possible(self) -> bool:
+        """Would the cap allow one more hedge now? (no side effects)"""
+        with self._lock:
+            return self.stats.hedged + 1 <= self.max_hedge_ratio * self.stats.calls
+
+    def _count_capped(self, seconds: float, delay: Optional[float]) -> None:
+        # A call run without a hedge slot that was slower than the delay.
+        if delay is not None and seconds > delay:
+            with self._lock:
+                self.stats.capped += 1
+
+    def _try_hedge(self) -> bool:
+        """Take a hedge from the budget, if the cap allows it."""
+        with self._lock:
+            if self.stats.hedged + 1 > self.max_hedge_ratio * self.stats.calls:
+                self.stats.capped += 1
+                return False
+            self.stats.hedged += 1
+            return True
+
+    def _record_win(self) -> None:
+        with self._lock:
+            self.stats.hedge_wins += 1
+
+    # ── sync ──────────────────────────────────
+
+    def _submit(
+        self, pool: ThreadPoolExecutor, input: Any, config: Optional[RunnableConfig], kwargs: Dict[str, Any]
+    ) -> Future:
+        def timed() -> Any:
+            # Timed in the worker: waiting for a free thread is not LLM latency.
+            # A call that loses to its hedge still finishes here and is recorded.
+            started = time.perf_counter()
+            output = self.runnable.invoke(input, config, **kwargs)
+            self.latencies.add(time.perf_counter() - started)
+            return output
+
+        context = contextvars.copy_context()  # e.g. llm_cache.bypass() of the caller
+        return pool.submit(context.run, timed)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        delay = self._start_call()
+        if delay is None or not self._hedge_possible():
+            # Nothing can hedge this call: run it on the caller's thread.
+            started = time.perf_counter()
+            output = self.runnable.invoke(input, config, **kwargs)
+            seconds = time.perf_counter() - started
+            self.latencies.add(seconds)
+            self._count_capped(seconds, delay)
+            return output
+
+        # A blocking call cannot be abandoned by its own thread, so a call
+        # that may be hedged runs in the pool while this thread waits.
+        pool = self.executor or _shared_hedge_pool()
+        primary = self._submit(pool, input, config, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._try_hedge():
+            return primary.result()
+
+        hedge = self._submit(pool, input, config, kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None or not pending:
+                    for other in pending:
+                        other.cancel()  # only stops it if it has not started yet
+                    if future is hedge:
+                        self._record_win()
+                    return future.result()
+        raise AssertionError("unreachable")
+
+    # ── async ─────────────────────────────────
+
+    async def _timed(self, input: Any, config: Optional[RunnableConfig], kwargs: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            output = await self.runnable.ainvoke(input, config, **kwargs)
+        except asyncio.CancelledError:
+            # The loser of a hedge: it took at least this long. Leaving it
+            # out would pull the percentile down and hedge more and more.
+            self.latencies.add(time.perf_counter() - started)
+            raise
+        self.latencies.add(time.perf_counter() - started)
+        return output
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        delay = self._start_call()
+        if delay is None or not self._hedge_possible():
+            started = time.perf_counter()
+            output = await self._timed(input, config, kwargs)
+            self._count_capped(time.perf_counter() - started, delay)
+            return output
+
+        primary = asyncio.ensure_future(self._timed(input, config, kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self._try_hedge():
+            return await primary
+
+        hedge = asyncio.ensure_future(self._timed(input, config, kwargs))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        if task is hedge:
+                            self._record_win()
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise AssertionError("unreachable")
+
+
+def hedged_from_env(llm: Runnable, concurrency: Optional[int] = None) -> Runnable:
+    """
+    HedgedRunnable(llm) if AGENT_HEDGE=1 is set, else `llm` unchanged.
+
+    AGENT_HEDGE_PERCENTILE and AGENT_HEDGE_MAX_RATIO override the defaults.
+
+    Args:
+        llm:         The chat model.
+        concurrency: Calls the caller runs at once (e.g. batch workers).
+                     When two threads per call do not fit in the shared
+                     pool, the model gets its own pool of that size.
+    """
+    if os.getenv("AGENT_HEDGE", "0").lower() not in ("1", "true", "yes"):
+        return llm
+    executor = None
+    shared_size = int(os.getenv("AGENT_HEDGE_POOL_MAX_WORKERS", HEDGE_POOL_MAX_WORKERS))
+    if concurrency is not None and 2 * concurrency > shared_size:
+        executor = ThreadPoolExecutor(max_workers=2 * concurrency, thread_name_prefix="llm-hedge")
+    return HedgedRunnable(
+        llm,
+        percentile=float(os.getenv("AGENT_HEDGE_PERCENTILE", HEDGE_PERCENTILE)),
+        max_hedge_ratio=float(os.getenv("AGENT_HEDGE_MAX_RATIO", HEDGE_MAX_RATIO)),
+        executor=executor,
+    )
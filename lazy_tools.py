@@ -0,0 +1,63 @@
+"""
+lazy_tools.py
+─────────────
+Tools that are only built the first time the agent runs them.
+
+Building TavilySearchResults means importing langchain_community, which
+dominates the import time of mis_tools.py, and a question that never
+searches does not need it at all. LazyTool keeps what the prompt needs
+(name and description) and defers everything else:
+
+  • The prompt and the ToolRegistry see a regular BaseTool.
+  • The factory runs once, on the first call, under a lock.
+  • Calls are forwarded to the real tool with `.run()` / `.arun()`.
+
+Usage:
+    from lazy_tools import LazyTool
+
+    web_search_tool = LazyTool(
+        name="tavily_search_results_json",
+        description="A search engine ...",
+        factory=build_web_search_tool,   # heavy imports live in here
+    )
+"""
+
+import threading
+from typing import Any, Callable, Optional
+
+from langchain_core.tools import BaseTool
+from pydantic import PrivateAttr
+
+
+class LazyTool(BaseTool):
+    """
+    Single-input tool proxy that builds the real tool on first use.
+
+    Attributes:
+        factory: Zero-argument callable returning the real tool. It should
+                 import its heavy dependencies itself.
+    """
+
+    factory: Callable[[], BaseTool]
+    _tool: Optional[BaseTool] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def is_built(self) -> bool:
+        return self._tool is not None
+
+    def resolve(self) -> BaseTool:
+        """Return the real tool, building it on the first call."""
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    self._tool = self.factory()
+        return self._tool
+
+    def _run(self, tool_input: str, run_manager: Optional[Any] = None) -> Any:
+        callbacks = run_manager.get_child() if run_manager else None
+        return self.resolve().run(tool_input, callbacks=callbacks)
+
+    async def _arun(self, tool_input: str, run_manager: Optional[Any] = None) -> Any:
+        callbacks = run_manager.get_child() if run_manager else None
+        return await self.resolve().arun(tool_input, callbacks=callbacks)
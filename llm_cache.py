@@ -0,0 +1,150 @@
+"""
+llm_cache.py
+────────────
+Opt-in response cache for the agents' chat model.
+
+Every agente_react_* script calls ChatOpenAI with `temperature=0` and fixed
+stop words, so the same rendered prompt always gets the same completion.
+ResponseCache plugs into LangChain's `cache=` hook of the chat model and
+serves repeated prompts (regression runs, popular questions) without an
+API call:
+
+  • Key       – hash of LangChain's llm string (model name, stop list and
+                sampling parameters) + hash of the exact rendered prompt.
+  • Storage   – TieredTTLCache: in-memory LRU in front of SQLite on disk,
+                both bounded by size (see caching.py).
+  • Metrics   – `cache.stats` (hits, misses, evictions, hit_rate).
+  • Bypass    – `cache.enabled = False`, or `with cache.bypass():` for the
+                current thread / task only.
+
+The cache is off unless AGENT_LLM_CACHE=1 is set.
+
+Usage:
+    from llm_cache import llm_cache_from_env
+
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, cache=llm_cache_from_env())
+"""
+
+import contextlib
+import contextvars
+import functools
+import hashlib
+import os
+import warnings
+from typing import Any, Iterator, Optional
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumpd, load
+
+from caching import CacheStats, LRUCache, SQLiteCache, TieredTTLCache
+
+# Defaults of AGENT_LLM_CACHE_PATH / AGENT_LLM_CACHE_MAX_ENTRIES. The
+# environment is read when the cache is built, i.e. after load_dotenv().
+LLM_CACHE_PATH: str = ".cache/agent_cache.sqlite"
+LLM_CACHE_MAX_ENTRIES: int = 10000
+
+# Size of the in-memory tier (number of responses).
+LLM_CACHE_MEMORY_SIZE: int = 256
+
+# load() is how LangChain's own caches revive generations.
+warnings.filterwarnings("ignore", message="The function `load` is in beta", category=LangChainBetaWarning)
+
+_bypassed: contextvars.ContextVar = contextvars.ContextVar("llm_cache_bypassed", default=False)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def response_cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Cache key of one LLM call.
+
+    Args:
+        prompt:     Serialized messages, as passed by LangChain to lookup().
+        llm_string: LangChain's description of the model call; it contains
+                    the model name, the stop list and every sampling
+                    parameter, so changing any of them changes the key.
+    """
+    return f"{_sha256(llm_string)[:16]}:{_sha256(prompt)}"
+
+
+class ResponseCache(BaseCache):
+    """
+    LangChain cache for deterministic chat completions.
+
+    Args:
+        cache:   Storage; defaults to an in-memory LRU only.
+        enabled: Global bypass switch; when False lookups always miss and
+                 nothing is stored.
+    """
+
+    def __init__(self, cache: Optional[TieredTTLCache] = None, enabled: bool = True):
+        self.cache = cache if cache is not None else TieredTTLCache(LRUCache(LLM_CACHE_MEMORY_SIZE))
+        self.enabled = enabled
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats
+
+    @property
+    def active(self) -> bool:
+        """False while disabled or inside bypass()."""
+        return self.enabled and not _bypassed.get()
+
+    @contextlib.contextmanager
+    def bypass(self) -> Iterator[None]:
+        """Skip the cache for calls made in this thread / asyncio task."""
+        token = _bypassed.set(True)
+        try:
+            yield
+        finally:
+            _bypassed.reset(token)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if not self.active:
+            return None
+        stored = self.cache.get(response_cache_key(prompt, llm_string))
+        if stored is None:
+            return None
+        return [load(generation) for generation in stored]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if not self.active:
+            return
+        stored = [dumpd(generation) for generation in return_val]
+        self.cache.set(response_cache_key(prompt, llm_string), stored)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.cache.clear()
+
+    # Both tiers are local and fast: no need for the default executor hop.
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE
+    ) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        self.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def default_llm_cache() -> ResponseCache:
+    """Process-wide response cache: LRU in memory, SQLite on disk."""
+    disk = SQLiteCache(
+        os.getenv("AGENT_LLM_CACHE_PATH", LLM_CACHE_PATH),
+        table="llm_responses",
+        max_entries=int(os.getenv("AGENT_LLM_CACHE_MAX_ENTRIES", LLM_CACHE_MAX_ENTRIES)),
+    )
+    return ResponseCache(TieredTTLCache(LRUCache(LLM_CACHE_MEMORY_SIZE), disk))
+
+
+def llm_cache_from_env() -> Optional[ResponseCache]:
+    """default_llm_cache() if AGENT_LLM_CACHE=1 is set, else None (no caching)."""
+    if os.getenv("AGENT_LLM_CACHE", "0").lower() in ("1", "true", "yes"):
+        return default_llm_cache()
+    return None
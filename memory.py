@@ -0,0 +1,311 @@
+"""
+memory.py
+─────────
+Bounded conversation memory for agente_react_07_memory.py.
+
+ConversationBufferMemory keeps every turn, so `{chat_history}` — and with
+it the size and latency of every LLM call in the ReAct loop — grows for
+the whole session. TokenBudgetMemory keeps the prompt size flat:
+
+  • The last `max_turns` turns are kept verbatim.
+  • Older turns are folded into a running summary by a background worker,
+    so save_context() never waits for the summarizer LLM. Until the
+    worker catches up they are still shown verbatim.
+  • The rendered history stays within `max_tokens`: the oldest blocks are
+    dropped first. The latest turn is always kept; if it alone is longer,
+    its middle is cut.
+
+It implements the part of LangChain's memory interface the front-end uses
+(load_memory_variables / save_context / clear). Load it once per user
+turn and pass the result as `chat_history=`; the ReAct loop reuses it in
+every iteration. to_state() / restore() turn it into plain JSON and back,
+so session_store.py can keep it outside the Streamlit process.
+
+Usage:
+    from memory import TokenBudgetMemory, llm_summarizer
+
+    memory = TokenBudgetMemory(llm_summarizer(summary_llm), max_turns=4, max_tokens=1500)
+    chat_history = memory.load_memory_variables({})["chat_history"]
+    ...
+    memory.save_context({"input": question}, {"output": answer})
+"""
+
+import logging
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Defaults used by the front-end.
+MEMORY_MAX_TURNS: int = 4
+MEMORY_MAX_TOKENS: int = 1500
+
+# Workers shared by every memory instance (one per session in Streamlit).
+SUMMARY_POOL_MAX_WORKERS: int = 2
+
+# (previous summary, new conversation lines) → new summary
+Summarizer = Callable[[str, str], str]
+
+SUMMARY_PROMPT = """Progressively summarize the lines of conversation provided, adding onto the previous summary and returning a new summary. Keep names, numbers and facts the user may refer to later. Answer with the summary only.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+
+_summary_pool: Optional[ThreadPoolExecutor] = None
+_summary_pool_lock = threading.Lock()
+
+
+def _shared_summary_pool() -> ThreadPoolExecutor:
+    global _summary_pool
+    with _summary_pool_lock:
+        if _summary_pool is None:
+            _summary_pool = ThreadPoolExecutor(
+                max_workers=SUMMARY_POOL_MAX_WORKERS, thread_name_prefix="memory-summary"
+            )
+        return _summary_pool
+
+
+def approx_token_count(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/Spanish)."""
+    return (len(text) + 3) // 4
+
+
+def llm_summarizer(llm: Any) -> Summarizer:
+    """Summarizer that asks `llm` (any chat model or runnable) with SUMMARY_PROMPT."""
+
+    def summarize(summary: str, new_lines: str) -> str:
+        response = llm.invoke(SUMMARY_PROMPT.format(summary=summary, new_lines=new_lines))
+        return str(getattr(response, "content", response)).strip()
+
+    return summarize
+
+
+@dataclass
+class _Block:
+    text: str
+    tokens: int
+
+
+class TokenBudgetMemory:
+    """
+    Last N turns verbatim + rolling summary, within a token budget.
+
+    Args:
+        summarizer:    Folds old turns into the summary (see llm_summarizer).
+                       None keeps only the last `max_turns` turns.
+        max_turns:     Turns kept verbatim.
+        max_tokens:    Upper bound of the rendered history.
+        token_counter: Tokens of a text; approx_token_count by default, or
+                       e.g. `llm.get_num_tokens` for exact counts.
+        memory_key:    Name of the prompt variable.
+        executor:      Runs the summarizer; a small shared pool by default.
+        on_summary:    Called with the memory (from the summarizer thread)
+                       each time a new summary lands, e.g. to persist it.
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        *,
+        max_turns: int = MEMORY_MAX_TURNS,
+        max_tokens: int = MEMORY_MAX_TOKENS,
+        token_counter: Callable[[str], int] = approx_token_count,
+        memory_key: str = "chat_history",
+        human_prefix: str = "Human",
+        ai_prefix: str = "AI",
+        executor: Optional[Executor] = None,
+        on_summary: Optional[Callable[["TokenBudgetMemory"], None]] = None,
+    ):
+        if max_turns < 1:
+            raise ValueError("max_turns must be at least 1")
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter
+        self.memory_key = memory_key
+        self.human_prefix = human_prefix
+        self.ai_prefix = ai_prefix
+        self.executor = executor
+        self.on_summary = on_summary
+        self._summary = _Block("", 0)
+        self._recent: List[_Block] = []
+        self._pending: List[_Block] = []  # evicted, not yet in the summary
+        self._summarizing = False
+        self._generation = 0  # bumped by clear(), discards in-flight summaries
+        self.version = 0  # bumped by save_context(), clear() and each new summary
+        self._idle = threading.Event()
+        self._idle.set()
+        self._lock = threading.Lock()
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    @property
+    def summary(self) -> str:
+        return self._summary.text
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, Any]) -> None:
+        """Store one turn; evicted turns are summarized in the background."""
+        text = (
+            f"{self.human_prefix}: {_single_value(inputs, 'input')}\n"
+            f"{self.ai_prefix}: {_single_value(outputs, 'output')}"
+        )
+        turn = _Block(text, self.token_counter(text))
+        with self._lock:
+            self.version += 1
+            self._recent.append(turn)
+            while len(self._recent) > self.max_turns:
+                evicted = self._recent.pop(0)
+                if self.summarizer is not None:
+                    self._pending.append(evicted)
+            start = self._claim_summarizer_locked()
+        if start:
+            (self.executor or _shared_summary_pool()).submit(self._summarize_pending)
+
+    def _claim_summarizer_locked(self) -> bool:
+        start = bool(self._pending) and not self._summarizing
+        if start:
+            self._summarizing = True
+            self._idle.clear()
+        return start
+
+    def load_memory_variables(self, inputs: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        return {self.memory_key: self.render()}
+
+    def render(self) -> str:
+        """History text within max_tokens, oldest blocks dropped first."""
+        with self._lock:
+            summary = self._summary
+            unsummarized = len(self._pending)
+            blocks = self._pending + self._recent
+        total = summary.tokens + sum(block.tokens for block in blocks)
+        # Drop order: not-yet-summarized turns, the summary, then old turns.
+        while total > self.max_tokens and len(blocks) > 1:
+            if unsummarized or not summary.text:
+                total -= blocks.pop(0).tokens
+                unsummarized = max(unsummarized - 1, 0)
+            else:
+                total -= summary.tokens
+                summary = _Block("", 0)
+        if total > self.max_tokens and blocks and summary.text:
+            total -= summary.tokens
+            summary = _Block("", 0)
+        if total > self.max_tokens:
+            # A single block (the latest turn, or the summary alone) too long.
+            if blocks:
+                blocks[-1] = self._fit(blocks[-1])
+            else:
+                summary = self._fit(summary)
+        parts = [block.text for block in blocks]
+        if summary.text:
+            parts.insert(0, f"Summary of the earlier conversation: {summary.text}")
+        return "\n".join(parts)
+
+    def _fit(self, block: _Block) -> _Block:
+        """`block` with its middle cut out until it fits in max_tokens."""
+        text, tokens = block.text, block.tokens
+        chars = len(text)
+        while tokens > self.max_tokens and chars > 0:
+            # Proportional first guess; token_counter may not be linear.
+            chars = min(chars - 1, chars * max(self.max_tokens, 0) // tokens)
+            text = _cut_middle(block.text, chars)
+            tokens = self.token_counter(text)
+        return _Block(text, tokens)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the background summarizer is idle (tests, benchmarks)."""
+        return self._idle.wait(timeout)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._summary = _Block("", 0)
+            self._recent.clear()
+            self._pending.clear()
+            self._generation += 1
+            self.version += 1
+
+    def to_state(self) -> Dict[str, Any]:
+        """Summary and turns as JSON-serializable data (see restore())."""
+        with self._lock:
+            return {
+                "version": self.version,
+                "summary": self._summary.text,
+                "recent": [block.text for block in self._recent],
+                "pending": [block.text for block in self._pending],
+            }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """
+        Replace the contents with a to_state() snapshot.
+
+        Turns that were waiting for the summarizer are summarized here.
+        """
+        blocks = {
+            key: [_Block(text, self.token_counter(text)) for text in state.get(key, [])]
+            for key in ("recent", "pending")
+        }
+        summary = state.get("summary", "")
+        with self._lock:
+            self._summary = _Block(summary, self.token_counter(summary))
+            self._recent = blocks["recent"]
+            self._pending = blocks["pending"] if self.summarizer is not None else []
+            self._generation += 1
+            self.version = state.get("version", 0)
+            start = self._claim_summarizer_locked()
+        if start:
+            (self.executor or _shared_summary_pool()).submit(self._summarize_pending)
+
+    def _summarize_pending(self) -> None:
+        while True:
+            with self._lock:
+                batch = list(self._pending)
+                summary = self._summary.text
+                generation = self._generation
+                if not batch:
+                    self._summarizing = False
+                    self._idle.set()
+                    return
+            try:
+                new_summary = self.summarizer(summary, "\n".join(b.text for b in batch))
+            except Exception as e:
+                # The turns are outside the window anyway: drop them.
+                logger.error("Memory summarization failed: %s", e)
+                new_summary = summary
+            tokens = self.token_counter(new_summary)
+            with self._lock:
+                landed = generation == self._generation
+                if landed:
+                    self._summary = _Block(new_summary, tokens)
+                    del self._pending[: len(batch)]
+                    self.version += 1
+            if landed and self.on_summary is not None:
+                try:
+                    self.on_summary(self)
+                except Exception as e:
+                    logger.error("Memory on_summary callback failed: %s", e)
+
+
+def _cut_middle(text: str, chars: int, marker: str = " … ") -> str:
+    """At most `chars` characters of `text`: its start and end around `marker`."""
+    if len(text) <= chars:
+        return text
+    if chars <= len(marker):
+        return text[:chars]
+    keep = chars - len(marker)
+    return text[: keep - keep // 2] + marker + text[len(text) - keep // 2 :]
+
+
+def _single_value(values: Dict[str, Any], preferred_key: str) -> str:
+    if preferred_key in values:
+        return str(values[preferred_key])
+    if len(values) != 1:
+        raise ValueError(f"Expected one key or '{preferred_key}', got {list(values)}")
+    return str(next(iter(values.values())))
@@ -1,8 +1,9 @@
 from typing import Union, List
-import re
-from langchain.agents import tool
-from langchain.tools import Tool
-from langchain_community.tools.tavily_search import TavilySearchResults 
+# langchain_core instead of langchain.agents: importing langchain.agents
+# pulls in every chain and langchain_community (~1 s of startup).
+from langchain_core.tools import BaseTool, tool
+from lazy_tools import LazyTool
+from safe_math import safe_eval
 
 
 @tool
@@ -35,15 +36,6 @@ def multiplica2(a:Union[float, int], b:Union[float, int]) -> float:
     return a*b
 
 
-def math_operation_old(expression: str) -> float:
-    """
-    Evaluates a mathematical expression given as a string.
-    Supports operations like addition, subtraction, multiplication, and division.
-    Example: "3.14 * 4", "10 / 2", "2 ** 3"
-    """
-    return eval(expression)  # Use eval to evaluate math expressions
-
-
 @tool
 def math_operation(expression: str) -> float:
     """
@@ -58,18 +50,34 @@ def math_operation(expression: str) -> float:
     # Remove unwanted characters like extra quotes or newlines
     expression = expression.strip().strip('"').strip("'").strip("\n")
 
-    # Validate input: only allow numbers, operators, and spaces
-    if not re.match(r'^[\d\s+\-*/().]+$', expression):
-        raise ValueError(f"Invalid characters in expression: {expression}")
+    # Parsed and evaluated with operator whitelist and size limits (no eval)
+    return safe_eval(expression)
+
+
+def _build_web_search_tool() -> BaseTool:
+    # Initialize Tavily search tool with k=3 (fetch top 3 results)
+    # Since TavilySearchResults is already a LangChain tool, we don't need to wrap it in a @tool decorator.
+    # Repeated queries are served from a TTL cache (memory + SQLite) instead of the network.
+    # The HTTP connections are shared with every other search of the process.
+    from clients import get_search_tool
+    from search_cache import cached_search_tool
 
-    return eval(expression)  # Safe evaluation of the cleaned expression
+    return cached_search_tool(get_search_tool(k=3))
 
 
-# Initialize Tavily search tool with k=3 (fetch top 3 results)
-# Since TavilySearchResults is already a LangChain tool, we don't need to wrap it in a @tool decorator.
-web_search_tool = TavilySearchResults(k=3)
+# Built on the first search, so importing mis_tools does not import
+# langchain_community. Name and description match TavilySearchResults.
+web_search_tool = LazyTool(
+    name="tavily_search_results_json",
+    description=(
+        "A search engine optimized for comprehensive, accurate, and trusted results. "
+        "Useful for when you need to answer questions about current events. "
+        "Input should be a search query."
+    ),
+    factory=_build_web_search_tool,
+)
 
-def find_tool_by_name(tools: List[Tool], tool_name: str) -> Tool:
+def find_tool_by_name(tools: List[BaseTool], tool_name: str) -> BaseTool:
     for tool in tools:
         if tool.name == tool_name:
             return tool
@@ -0,0 +1,80 @@
+"""
+react_parser.py
+───────────────
+Output parser for ReAct steps that request several tools at once.
+
+ReActSingleInputOutputParser forces exactly one Action per LLM round
+trip, so a multi-fact question (e.g. two separate web searches) costs one
+LLM call per fact. ReActMultiActionOutputParser accepts several
+independent Action / Action Input blocks in one completion and returns
+them as a list; ReActExecutor runs them in parallel and appends all the
+observations before the next LLM call.
+
+Usage:
+    from react_parser import MULTI_ACTION_INSTRUCTIONS, ReActMultiActionOutputParser
+
+    agent = build_react_agent(prompt, llm, ReActMultiActionOutputParser())
+"""
+
+import re
+from typing import List, Union
+
+from langchain.agents.output_parsers import ReActSingleInputOutputParser
+from langchain.agents.output_parsers.react_single_input import (
+    FINAL_ANSWER_ACTION,
+    FINAL_ANSWER_AND_PARSABLE_ACTION_ERROR_MESSAGE,
+)
+from langchain.schema import AgentAction, AgentFinish
+from langchain_core.exceptions import OutputParserException
+
+# Sentence to add to the "Use the following format" section of a template.
+MULTI_ACTION_INSTRUCTIONS = (
+    "If you need several independent pieces of information, you can write "
+    "several Action/Action Input pairs one after another before the "
+    "Observation. They are run in parallel and you get one Observation per "
+    "action, in the same order."
+)
+
+# One Action / Action Input block, up to the next "Action:" or the end.
+_ACTION_BLOCK_RE = re.compile(
+    r"Action\s*\d*\s*:[\s]*(.*?)[\s]*Action\s*\d*\s*Input\s*\d*\s*:[\s]*(.*?)"
+    r"(?=\n\s*Action\s*\d*\s*:|\Z)",
+    re.DOTALL,
+)
+
+
+class ReActMultiActionOutputParser(ReActSingleInputOutputParser):
+    """
+    Parse a ReAct completion with one or more Action / Action Input blocks.
+
+    Returns a single AgentAction (or AgentFinish) exactly like
+    ReActSingleInputOutputParser when the completion has at most one
+    block, and a list of AgentAction otherwise.
+
+    The log of the first action holds the Thought and its own block; the
+    following actions only log their block. Rendering the steps with
+    format_log_to_str() therefore reads as if each action had been taken
+    on its own, with its Observation right after it.
+    """
+
+    def parse(self, text: str) -> Union[AgentAction, List[AgentAction], AgentFinish]:
+        matches = list(_ACTION_BLOCK_RE.finditer(text))
+        if len(matches) < 2:
+            return super().parse(text)
+
+        if FINAL_ANSWER_ACTION in text:
+            raise OutputParserException(
+                f"{FINAL_ANSWER_AND_PARSABLE_ACTION_ERROR_MESSAGE}: {text}"
+            )
+
+        actions = []
+        for i, match in enumerate(matches):
+            tool = match.group(1).strip()
+            tool_input = match.group(2).strip().strip('"')
+            log = text[: match.end()] if i == 0 else text[match.start(): match.end()]
+            actions.append(AgentAction(tool, tool_input, log))
+        return actions
+
+    @property
+    def _type(self) -> str:
+        return "react-multi-action"
@@ -0,0 +1,246 @@
+"""
+react_prompt.py
+───────────────
+Prompt construction for the ReAct agent chain.
+
+The original chains rebuilt the whole prompt on every loop iteration:
+`format_log_to_str()` re-serialized every (AgentAction, observation) pair
+and `PromptTemplate` re-formatted the whole template, which makes prompt
+construction O(n²) in the number of steps. This module provides:
+
+  • IncrementalScratchpad – append-only list of intermediate steps that
+                            keeps its rendered text and only renders the
+                            newest steps.
+  • ReActPrompt           – template pre-split once into a static prefix
+                            (instructions + rendered tool descriptions)
+                            and the per-call segments. With
+                            prefix_cache=True the layout is checked so the
+                            provider's prompt-prefix cache can reuse it
+                            (see below).
+  • build_react_agent()   – the `prompt | llm | parser` LCEL chain used by
+                            every agente_react_* front-end.
+  • find_react_prompt()   – the ReActPrompt inside such a chain, e.g. to
+                            size the first prompt before sending it.
+
+Prompt-prefix caching: OpenAI (and other providers) bill and serve the
+longest previously seen prompt prefix from cache, in 128-token blocks
+once the prompt passes 1024 tokens. It only helps if the prompt starts
+with the same bytes every time and each ReAct iteration only appends to
+the previous prompt. ReActPrompt(..., prefix_cache=True) enforces that
+layout: static text first, then the per-call variables in template
+order (put the ones that change least first, e.g. {chat_history} before
+{input}), and {agent_scratchpad} at the very end with no trailing text.
+is_strict_append() and callbacks.PrefixCacheMeter measure the result.
+
+Usage:
+    from react_prompt import ReActPrompt, build_react_agent
+
+    prompt = ReActPrompt(template, tools, prefix_cache=True)
+    agent = build_react_agent(prompt, llm)
+"""
+
+from string import Formatter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.agents import AgentAction
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.tools import BaseTool
+from langchain_core.tools.render import render_text_description
+
+SCRATCHPAD_VARIABLE = "agent_scratchpad"
+
+
+class IncrementalScratchpad(list):
+    """
+    Append-only list of (AgentAction, observation) pairs.
+
+    Behaves like the `intermediate_steps` list the loop used to build, but
+    caches the `format_log_to_str()` rendering: reading `.text` only
+    renders the steps appended since the previous read.
+
+    Steps must only be added with append()/extend(); replacing or removing
+    existing items leaves `.text` stale.
+    """
+
+    def __init__(
+        self,
+        steps: Sequence[Tuple[AgentAction, str]] = (),
+        observation_prefix: str = "Observation: ",
+        llm_prefix: str = "Thought: ",
+    ):
+        super().__init__(steps)
+        self.observation_prefix = observation_prefix
+        self.llm_prefix = llm_prefix
+        self._text = ""
+        self._rendered = 0
+
+    @property
+    def text(self) -> str:
+        """Scratchpad rendered exactly like format_log_to_str()."""
+        if self._rendered < len(self):
+            new_parts = []
+            for action, observation in self[self._rendered:]:
+                new_parts.append(action.log)
+                new_parts.append(
+                    f"\n{self.observation_prefix}{observation}\n{self.llm_prefix}"
+                )
+            self._text += "".join(new_parts)
+            self._rendered = len(self)
+        return self._text
+
+
+def is_strict_append(previous: str, current: str) -> bool:
+    """True if `current` is `previous` plus (possibly empty) appended text."""
+    return current.startswith(previous)
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """Length of the longest common prefix of `a` and `b`."""
+    low, high = 0, min(len(a), len(b))
+    if a[:high] == b[:high]:
+        return high
+    while low < high:  # binary search: slice comparisons run in C
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def render_scratchpad(steps: Sequence[Tuple[AgentAction, str]]) -> str:
+    """Render intermediate steps, reusing the cache of an IncrementalScratchpad."""
+    if isinstance(steps, IncrementalScratchpad):
+        return steps.text
+    return IncrementalScratchpad(steps).text
+
+
+class ReActPrompt:
+    """
+    ReAct prompt template split once into static and per-call parts.
+
+    `{tools}`, `{tool_names}` and any `partial_variables` are bound when
+    the prompt is built, and everything up to the first per-call variable
+    is kept as one static prefix string. render() then only formats the
+    per-call segments.
+
+    Args:
+        template:           f-string template, as used with PromptTemplate.
+        tools:              Tools rendered into `{tools}` / `{tool_names}`.
+        prefix_cache:       Enforce a prompt-prefix-cache friendly layout
+                            (see the module docstring): ValueError if a
+                            static variable follows a per-call one or
+                            {agent_scratchpad} is not the last field;
+                            trailing whitespace after it is dropped so
+                            each iteration strictly appends to the last.
+        **partial_variables: Other values fixed for the life of the prompt,
+                            like PromptTemplate.partial().
+    """
+
+    def __init__(
+        self,
+        template: str,
+        tools: Sequence[BaseTool],
+        *,
+        prefix_cache: bool = False,
+        **partial_variables: str,
+    ):
+        self.template = template
+        self.prefix_cache = prefix_cache
+        static_values = {
+            "tools": render_text_description(list(tools)),
+            "tool_names": ", ".join([t.name for t in tools]),
+            **partial_variables,
+        }
+
+        prefix_parts: List[str] = []
+        segments: List[Tuple[str, Optional[str]]] = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(template):
+            if format_spec or conversion:
+                raise ValueError(
+                    f"Unsupported format spec in template field '{field_name}'."
+                )
+            if segments or (field_name is not None and field_name not in static_values):
+                segments.append((literal, field_name))
+                continue
+            prefix_parts.append(literal)
+            if field_name is not None:
+                prefix_parts.append(static_values[field_name])
+
+        if prefix_cache:
+            segments = _prefix_cache_segments(segments, static_values)
+
+        self.static_prefix: str = "".join(prefix_parts)
+        self._segments: Tuple[Tuple[str, Optional[str]], ...] = tuple(segments)
+        self._static_values = static_values
+        self.input_variables: List[str] = [
+            name for _, name in self._segments
+            if name is not None and name not in static_values
+        ]
+
+    def render(self, inputs: Dict[str, Any]) -> str:
+        """Format the prompt for one LLM call."""
+        parts = [self.static_prefix]
+        for literal, name in self._segments:
+            parts.append(literal)
+            if name is None:
+                continue
+            if name == SCRATCHPAD_VARIABLE:
+                parts.append(render_scratchpad(inputs[name]))
+            elif name in self._static_values:
+                parts.append(self._static_values[name])
+            else:
+                parts.append(str(inputs[name]))
+        return "".join(parts)
+
+
+def _prefix_cache_segments(
+    segments: List[Tuple[str, Optional[str]]], static_values: Dict[str, str]
+) -> List[Tuple[str, Optional[str]]]:
+    """Check the per-call segments of a prefix_cache prompt and drop trailing whitespace."""
+    names = [name for _, name in segments if name is not None]
+    late_static = [name for name in names if name in static_values]
+    if late_static:
+        raise ValueError(
+            f"prefix_cache: static field(s) {late_static} follow a per-call field; "
+            "move them before the first per-call field."
+        )
+    if SCRATCHPAD_VARIABLE not in names or names[-1] != SCRATCHPAD_VARIABLE:
+        raise ValueError(f"prefix_cache: '{SCRATCHPAD_VARIABLE}' must be the last field.")
+    if segments[-1][1] is None:
+        trailing = segments[-1][0]
+        if trailing.strip():
+            raise ValueError(
+                f"prefix_cache: text after '{SCRATCHPAD_VARIABLE}' breaks the append-only "
+                f"prompt: {trailing.strip()[:40]!r}"
+            )
+        segments = segments[:-1]
+    return segments
+
+
+def build_react_agent(prompt: ReActPrompt, llm, output_parser=None) -> Runnable:
+    """
+    Build the `prompt | llm | parser` agent chain used by ReActExecutor.
+
+    Args:
+        prompt:        Pre-split ReActPrompt.
+        llm:           Chat model (e.g. ChatOpenAI) with the ReAct stop words.
+        output_parser: Defaults to ReActSingleInputOutputParser().
+
+    Returns:
+        Runnable mapping {"input", "agent_scratchpad", ...} to an
+        AgentAction or AgentFinish.
+    """
+    if output_parser is None:
+        # Imported here: langchain.agents is the slowest import of the agent.
+        from langchain.agents.output_parsers import ReActSingleInputOutputParser
+
+        output_parser = ReActSingleInputOutputParser()
+    return RunnableLambda(prompt.render, name="ReActPrompt") | llm | output_parser
+
+
+def find_react_prompt(agent: Runnable) -> Optional[ReActPrompt]:
+    """The ReActPrompt an agent built by build_react_agent() starts with, if any."""
+    render = getattr(getattr(agent, "first", None), "func", None)
+    prompt = getattr(render, "__self__", None)
+    return prompt if isinstance(prompt, ReActPrompt) else None
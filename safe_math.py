@@ -0,0 +1,253 @@
+"""
+safe_math.py
+────────────
+Arithmetic evaluator for the math_operation tool, without eval().
+
+math_operation used to check the expression with a character regex and
+then eval() it. The regex lets `**` through, so a model-generated
+`9**9**9**9` keeps the worker thread busy computing a number with
+billions of digits. Here the expression is parsed with `ast` and run by
+a tiny stack machine:
+
+  • Whitelist: int/float literals, + - * / // % ** and parentheses.
+    Names, calls, attributes, bools, strings, complex numbers… are rejected.
+  • Limits: expression length, |exponent| <= MAX_EXPONENT, integers of at
+    most MAX_RESULT_BITS bits and finite floats. Integer powers are checked
+    before they are computed, so no call can stall the worker.
+  • Compiled programs are kept in a bounded LRU cache, so the agent
+    repeating an expression skips the parse.
+  • safe_eval_many() evaluates a batch, compiling each distinct
+    expression once.
+
+Every error is a MathExpressionError (a ValueError), which the ReAct
+loop turns into an observation the model can react to.
+
+Usage:
+    from safe_math import safe_eval, safe_eval_many
+
+    safe_eval("3.14 * 4")                      # 12.56
+    safe_eval("9**9**9**9")                    # MathExpressionError
+    safe_eval_many(["2 ** 10", "1 / 0"], return_exceptions=True)
+"""
+
+import ast
+import math
+import operator
+from functools import lru_cache
+from typing import Any, Iterable, List, Tuple, Union
+
+Number = Union[int, float]
+
+# ─────────────────────────────────────────────
+# Limits
+# ─────────────────────────────────────────────
+
+MAX_EXPRESSION_LENGTH: int = 1000
+MAX_EXPONENT: int = 10_000
+MAX_RESULT_BITS: int = 4096  # ~1 233 decimal digits
+EXPRESSION_CACHE_SIZE: int = 512
+
+
+class MathExpressionError(ValueError):
+    """The expression is not allowed or cannot be evaluated within the limits."""
+
+
+# ─────────────────────────────────────────────
+# Checked operators
+# ─────────────────────────────────────────────
+
+
+def _pow(base: Number, exponent: Number) -> Number:
+    if abs(exponent) > MAX_EXPONENT:
+        raise MathExpressionError(f"Exponent {exponent} exceeds the limit of {MAX_EXPONENT}")
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        # Bits of the result are ~bit_length(base) * exponent: check before computing.
+        if (abs(base).bit_length() - 1) * exponent > MAX_RESULT_BITS:
+            raise MathExpressionError(f"Result of {base} ** {exponent} is too large")
+    return base ** exponent
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _pow,
+}
+
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+def _check_result(value: Any) -> Number:
+    if isinstance(value, int):
+        if value.bit_length() > MAX_RESULT_BITS:
+            raise MathExpressionError(f"Intermediate result exceeds {MAX_RESULT_BITS} bits")
+        return value
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise MathExpressionError("Result is out of the floating point range")
+        return value
+    # e.g. (-8) ** (1 / 3) is complex
+    raise MathExpressionError(f"Result of type {type(value).__name__} is not supported")
+
+
+# ─────────────────────────────────────────────
+# Compilation
+# ─────────────────────────────────────────────
+
+_PUSH, _UNARY, _BINARY = range(3)
+
+Instruction = Tuple[int, Any]
+
+
+class CompiledExpression:
+    """
+    A validated expression as a postfix program.
+
+    Evaluation is a loop over the instructions (no recursion, so nesting
+    depth does not matter) and every intermediate value is checked
+    against the limits.
+    """
+
+    __slots__ = ("expression", "_program")
+
+    def __init__(self, expression: str, program: Tuple[Instruction, ...]):
+        self.expression = expression
+        self._program = program
+
+    def evaluate(self) -> Number:
+        stack: List[Number] = []
+        try:
+            for opcode, argument in self._program:
+                if opcode == _PUSH:
+                    stack.append(argument)
+                elif opcode == _UNARY:
+                    stack.append(_check_result(argument(stack.pop())))
+                else:
+                    right = stack.pop()
+                    stack.append(_check_result(argument(stack.pop(), right)))
+        except (ZeroDivisionError, OverflowError) as e:
+            raise MathExpressionError(f"Cannot evaluate '{self.expression}': {e}") from e
+        return stack[0]
+
+    @property
+    def canonical(self) -> str:
+        """
+        The postfix program as text: equal for expressions that only differ
+        in spacing or redundant parentheses ("3+4", "(3 + 4)"), different
+        for 3 and 3.0. Used as a cache key.
+        """
+        return " ".join(
+            repr(argument) if opcode == _PUSH else argument.__name__
+            for opcode, argument in self._program
+        )
+
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.expression!r})"
+
+
+def _to_program(tree: ast.Expression) -> Tuple[Instruction, ...]:
+    program: List[Instruction] = []
+    # Iterative post-order walk: operands before their operator.
+    pending: List[Tuple[ast.AST, bool]] = [(tree.body, False)]
+    while pending:
+        node, operands_done = pending.pop()
+        if isinstance(node, ast.Constant):
+            # type() and not isinstance(): bool is an int subclass.
+            if type(node.value) not in (int, float):
+                raise MathExpressionError(f"Unsupported literal: {node.value!r}")
+            program.append((_PUSH, _check_result(node.value)))
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+            if operands_done:
+                program.append((_UNARY, _UNARY_OPERATORS[type(node.op)]))
+            else:
+                pending += [(node, True), (node.operand, False)]
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            if operands_done:
+                program.append((_BINARY, _BINARY_OPERATORS[type(node.op)]))
+            else:
+                pending += [(node, True), (node.right, False), (node.left, False)]
+        else:
+            element = type(getattr(node, "op", node)).__name__
+            raise MathExpressionError(f"Unsupported element in expression: {element}")
+    return tuple(program)
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(expression: str) -> CompiledExpression:
+    """
+    Parse and validate an arithmetic expression (cached).
+
+    Args:
+        expression: e.g. "3.14 * (2 + 1) ** 2".
+
+    Returns:
+        CompiledExpression ready to evaluate().
+
+    Raises:
+        MathExpressionError: Empty, too long, not valid syntax or using
+                             anything outside the whitelist.
+    """
+    expression = expression.strip()
+    if not expression:
+        raise MathExpressionError("Empty expression")
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise MathExpressionError(
+            f"Expression is too long ({len(expression)} chars, max {MAX_EXPRESSION_LENGTH})"
+        )
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except (SyntaxError, ValueError, RecursionError, MemoryError) as e:
+        raise MathExpressionError(f"Invalid expression '{expression}': {e}") from e
+    return CompiledExpression(expression, _to_program(tree))
+
+
+# ─────────────────────────────────────────────
+# Public API
+# ─────────────────────────────────────────────
+
+
+def safe_eval(expression: str) -> Number:
+    """
+    Evaluate an arithmetic expression within the limits.
+
+    Raises:
+        MathExpressionError: See compile_expression() and the module limits
+                             (also raised for division by zero).
+    """
+    return compile_expression(expression).evaluate()
+
+
+def safe_eval_many(
+    expressions: Iterable[str], return_exceptions: bool = False
+) -> List[Union[Number, MathExpressionError]]:
+    """
+    Evaluate a batch of expressions, compiling each distinct one once.
+
+    Args:
+        expressions:       Expressions to evaluate.
+        return_exceptions: Put the MathExpressionError of a failing
+                           expression in its slot instead of raising it
+                           (like asyncio.gather).
+
+    Returns:
+        One result per expression, in order.
+    """
+    outcomes = {}  # expression -> result or error, for repeated expressions
+    results: List[Union[Number, MathExpressionError]] = []
+    for expression in expressions:
+        if expression not in outcomes:
+            try:
+                outcomes[expression] = safe_eval(expression)
+            except MathExpressionError as e:
+                outcomes[expression] = e
+        outcome = outcomes[expression]
+        if isinstance(outcome, MathExpressionError) and not return_exceptions:
+            raise outcome
+        results.append(outcome)
+    return results
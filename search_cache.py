@@ -0,0 +1,185 @@
+"""
+search_cache.py
+───────────────
+TTL cache in front of the Tavily web-search tool.
+
+`TavilySearchResults(k=3)` hits the network on every call, and the same
+popular questions repeat all day. CachedSearchTool wraps any search tool
+with a TieredTTLCache (in-memory LRU + on-disk SQLite):
+
+  • Keys are normalized queries (case, accents form, whitespace, quotes
+    and trailing punctuation do not matter).
+  • Time-sensitive queries ("hoy", "último resultado", "latest", a year…)
+    get a shorter TTL than evergreen ones.
+  • Tool errors (Tavily returns them as a string) are never cached.
+  • Hit/miss counters are available in `tool.cache.stats`.
+
+Usage:
+    from search_cache import cached_search_tool
+
+    web_search_tool = cached_search_tool(TavilySearchResults(k=3))
+    web_search_tool.run("Ultimo resultado Atletico - Barcelona")
+    web_search_tool.cache.stats.hit_rate
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from typing import Any, Callable, Optional
+
+from langchain_core.tools import BaseTool
+
+from caching import LRUCache, SQLiteCache, TieredTTLCache
+
+# TTLs (seconds) for evergreen and time-sensitive queries.
+DEFAULT_SEARCH_TTL: float = 6 * 60 * 60
+TIME_SENSITIVE_SEARCH_TTL: float = 15 * 60
+
+# In-memory tier size and on-disk location of the process-wide cache.
+SEARCH_CACHE_MEMORY_SIZE: int = 512
+SEARCH_CACHE_PATH: str = os.getenv("AGENT_SEARCH_CACHE_PATH", ".cache/agent_cache.sqlite")
+
+# Default of AGENT_SEARCH_CACHE_MAX_ENTRIES: rows kept on disk.
+SEARCH_CACHE_MAX_ENTRIES: int = 10000
+
+# Words that make a query's answer change over the day (Spanish + English).
+_TIME_SENSITIVE_RE = re.compile(
+    r"\b(hoy|ayer|ahora|actual|actualmente|ultimo|ultima|ultimos|ultimas|reciente|"
+    r"recientes|directo|noticias|resultado|resultados|marcador|precio|cotizacion|"
+    r"clima|today|yesterday|now|current|latest|recent|live|news|score|scores|"
+    r"price|weather|20\d\d)\b"
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Settings of the wrapped tool that change its results (TavilySearchResults
+# names); tools with different values do not share cache entries.
+SEARCH_CONFIG_FIELDS = (
+    "max_results",
+    "search_depth",
+    "include_domains",
+    "exclude_domains",
+    "include_answer",
+    "include_raw_content",
+    "include_images",
+)
+
+
+def normalize_query(query: Any) -> str:
+    """
+    Build the cache key of a search query.
+
+    Accepts the raw tool input: a string or a {"query": ...} dict.
+    """
+    if isinstance(query, dict):
+        query = query.get("query", "")
+    text = unicodedata.normalize("NFKC", str(query)).casefold()
+    text = _WHITESPACE_RE.sub(" ", text).strip().strip("\"'").strip()
+    return text.rstrip("?!.¿¡ ").lstrip("¿¡ ")
+
+
+def search_config_key(search_tool: BaseTool) -> str:
+    """Prefix of the cache keys of `search_tool`: its name and settings."""
+    config = {
+        field: getattr(search_tool, field)
+        for field in SEARCH_CONFIG_FIELDS
+        if hasattr(search_tool, field)
+    }
+    digest = hashlib.sha256(
+        json.dumps(config, sort_keys=True, default=repr).encode()
+    ).hexdigest()[:16]
+    return f"{search_tool.name}|{digest}"
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def ttl_for_query(normalized_query: str) -> float:
+    """Shorter TTL for queries whose answer depends on the current date."""
+    if _TIME_SENSITIVE_RE.search(_strip_accents(normalized_query)):
+        return TIME_SENSITIVE_SEARCH_TTL
+    return DEFAULT_SEARCH_TTL
+
+
+class CachedSearchTool(BaseTool):
+    """
+    Search tool wrapper that serves repeated queries from a TTL cache.
+
+    Keeps the wrapped tool's name, description and args schema, so the
+    prompt and the ToolRegistry dispatch (`.run()`) do not change. Keys
+    start with `key_prefix` (search_config_key()), so tools with another
+    `max_results` or search depth sharing the cache get their own entries.
+    """
+
+    name: str = "tavily_search_results_json"
+    description: str = "A search engine."
+    search_tool: BaseTool
+    cache: Any
+    ttl_policy: Callable[[str], float] = ttl_for_query
+    key_prefix: str = ""
+
+    def _lookup(self, query: Any):
+        normalized = normalize_query(query)
+        return normalized, self.cache.get(f"{self.key_prefix}|{normalized}")
+
+    def _store(self, normalized: str, result: Any) -> None:
+        # Tavily reports failures as a string (repr of the exception).
+        if not isinstance(result, str):
+            self.cache.set(
+                f"{self.key_prefix}|{normalized}", result, ttl=self.ttl_policy(normalized)
+            )
+
+    def _run(self, query: Any, run_manager: Optional[Any] = None) -> Any:
+        key, cached = self._lookup(query)
+        if cached is not None:
+            return cached
+        result = self.search_tool.run(query)
+        self._store(key, result)
+        return result
+
+    async def _arun(self, query: Any, run_manager: Optional[Any] = None) -> Any:
+        key, cached = self._lookup(query)
+        if cached is not None:
+            return cached
+        result = await self.search_tool.arun(query)
+        self._store(key, result)
+        return result
+
+
+@functools.lru_cache(maxsize=None)
+def default_search_cache() -> TieredTTLCache:
+    """Process-wide search cache: LRU in memory, SQLite on disk."""
+    return TieredTTLCache(
+        LRUCache(SEARCH_CACHE_MEMORY_SIZE),
+        SQLiteCache(
+            SEARCH_CACHE_PATH,
+            table="web_search",
+            max_entries=int(os.getenv("AGENT_SEARCH_CACHE_MAX_ENTRIES", SEARCH_CACHE_MAX_ENTRIES)),
+        ),
+    )
+
+
+def cached_search_tool(
+    search_tool: BaseTool,
+    cache: Optional[TieredTTLCache] = None,
+) -> CachedSearchTool:
+    """
+    Wrap `search_tool` with a TTL cache.
+
+    Args:
+        search_tool: e.g. TavilySearchResults(k=3), or a fake for tests.
+        cache:       Cache to use; defaults to default_search_cache().
+    """
+    return CachedSearchTool(
+        name=search_tool.name,
+        description=search_tool.description,
+        args_schema=search_tool.args_schema,
+        search_tool=search_tool,
+        cache=cache if cache is not None else default_search_cache(),
+        key_prefix=search_config_key(search_tool),
+    )
@@ -0,0 +1,512 @@
+"""
+session_store.py
+────────────────
+Chat history and conversation memory outside the Streamlit process.
+
+st.session_state lives in one process: behind a load balancer every
+replica needs sticky sessions, and a restart loses every conversation.
+This module keeps each session's messages and TokenBudgetMemory state in
+a shared store instead:
+
+  • MemorySessionStore – in-process backend (one replica, tests).
+  • SQLiteSessionStore – file backend; survives restarts and is shared
+    by every process (replica) that opens the same file.
+  • WriteBehindSessionStore – wraps either one: writes are queued and
+    flushed in one transaction every `flush_interval` seconds, and the
+    replica reads its own queued writes back.
+  • SessionHistory – the messages of one session as a list-like object
+    for st.session_state["messages"]: only the last `page_size` messages
+    are loaded, load_more() pages back, and refresh() fetches just the
+    messages other replicas appended since the last rerun.
+  • restore_memory() / persist_memory() – sync a TokenBudgetMemory with
+    the store, loading it only when another replica saved a newer one;
+    persist_summaries() also stores it when a background summary lands.
+
+Messages and memory states are stored as compact JSON, zlib-compressed
+when larger than COMPRESS_MIN_BYTES (see pack() / unpack()).
+
+The session id travels in the URL (`?sid=...`, session_id_from_query_params),
+so any replica can serve the next rerun. It is a random 128-bit token:
+whoever has the URL can read the conversation.
+
+Two tabs writing the same session at the same moment can overwrite each
+other's last message; sessions are single-user, so that is accepted.
+
+Usage:
+    from session_store import (
+        SessionHistory, persist_memory, restore_memory,
+        session_id_from_query_params, session_store_from_env,
+    )
+
+    store = session_store_from_env()            # AGENT_SESSION_STORE=sqlite
+    sid = session_id_from_query_params(st.query_params)
+    messages = SessionHistory(store, sid)        # last 50 messages
+    messages.append({"role": "user", "content": question})
+    restore_memory(store, sid, memory)
+    ...
+    persist_memory(store, sid, memory)
+"""
+
+import atexit
+import functools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Iterator, List, MutableMapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_STORE_PATH: str = ".cache/sessions.sqlite"
+HISTORY_PAGE_SIZE: int = 50
+FLUSH_INTERVAL: float = 0.2
+
+# Payloads below this size are stored as plain JSON: zlib would not save much.
+COMPRESS_MIN_BYTES: int = 256
+
+SESSION_ID_PARAM: str = "sid"
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+# (session_id, seq, message) and (session_id, version, state) rows for write().
+MessageRow = Tuple[str, int, Dict[str, Any]]
+MemoryRow = Tuple[str, int, Dict[str, Any]]
+
+
+def pack(value: Any) -> bytes:
+    """Compact JSON, zlib-compressed when that pays off; see unpack()."""
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(raw, 6)
+        if len(compressed) < len(raw):
+            return b"z" + compressed
+    return b"j" + raw
+
+
+def unpack(payload: bytes) -> Any:
+    kind, body = payload[:1], payload[1:]
+    if kind == b"z":
+        body = zlib.decompress(body)
+    elif kind != b"j":
+        raise ValueError(f"Unknown session payload format: {kind!r}")
+    return json.loads(body.decode("utf-8"))
+
+
+def session_id_from_query_params(
+    query_params: MutableMapping[str, str], key: str = SESSION_ID_PARAM
+) -> str:
+    """
+    Session id from the URL (st.query_params); a new one is set if missing.
+
+    Ids that do not look like ours are replaced, so the parameter cannot
+    be used to inject arbitrary keys.
+    """
+    session_id = query_params.get(key)
+    if not session_id or not _SESSION_ID_RE.match(session_id):
+        session_id = uuid.uuid4().hex
+        query_params[key] = session_id
+    return session_id
+
+
+# ─────────────────────────────────────────────
+# Backends
+# ─────────────────────────────────────────────
+
+
+class SessionStore(ABC):
+    """
+    Interface of the session backends.
+
+    Messages have a position (`seq`, from 0) in their session; memory
+    states have a version, and only a newer version replaces a stored one.
+    """
+
+    @abstractmethod
+    def write(self, messages: Iterable[MessageRow] = (), memories: Iterable[MemoryRow] = ()) -> None:
+        """Store messages and memory states (atomically, where supported)."""
+
+    @abstractmethod
+    def message_count(self, session_id: str) -> int:
+        """Number of messages stored for the session."""
+
+    @abstractmethod
+    def load_messages(self, session_id: str, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Messages with start <= seq < stop, in order."""
+
+    @abstractmethod
+    def load_memory(self, session_id: str, newer_than: int = -1) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """(version, state) if the stored memory is newer than `newer_than`."""
+
+    @abstractmethod
+    def delete_session(self, session_id: str) -> None:
+        """Remove the session's messages and memory."""
+
+    def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in a dict of this process, stored packed like on disk."""
+
+    def __init__(self) -> None:
+        self._messages: Dict[str, Dict[int, bytes]] = {}
+        self._memory: Dict[str, Tuple[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def write(self, messages: Iterable[MessageRow] = (), memories: Iterable[MemoryRow] = ()) -> None:
+        packed_messages = [(sid, seq, pack(message)) for sid, seq, message in messages]
+        packed_memories = [(sid, version, pack(state)) for sid, version, state in memories]
+        with self._lock:
+            for sid, seq, payload in packed_messages:
+                self._messages.setdefault(sid, {})[seq] = payload
+            for sid, version, payload in packed_memories:
+                if version > self._memory.get(sid, (-1, b""))[0]:
+                    self._memory[sid] = (version, payload)
+
+    def message_count(self, session_id: str) -> int:
+        with self._lock:
+            return max(self._messages.get(session_id, ()), default=-1) + 1
+
+    def load_messages(self, session_id: str, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._messages.get(session_id, {})
+            payloads = [rows[seq] for seq in sorted(rows) if seq >= start and (stop is None or seq < stop)]
+        return [unpack(payload) for payload in payloads]
+
+    def load_memory(self, session_id: str, newer_than: int = -1) -> Optional[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            found = self._memory.get(session_id)
+        if found is None or found[0] <= newer_than:
+            return None
+        return found[0], unpack(found[1])
+
+    def delete_session(self, session_id: str) -> None:
+        with self._lock:
+            self._messages.pop(session_id, None)
+            self._memory.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file shared by every process that opens it.
+
+    Args:
+        path:    Database file; parent directories are created.
+        timeout: Seconds to wait for another process's write lock.
+    """
+
+    def __init__(self, path: str = SESSION_STORE_PATH, timeout: float = 10.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_messages ("
+                "session_id TEXT NOT NULL, seq INTEGER NOT NULL, payload BLOB NOT NULL, "
+                "PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_memory ("
+                "session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                "payload BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def write(self, messages: Iterable[MessageRow] = (), memories: Iterable[MemoryRow] = ()) -> None:
+        message_rows = [(sid, seq, pack(message)) for sid, seq, message in messages]
+        memory_rows = [(sid, version, pack(state), time.time()) for sid, version, state in memories]
+        if not message_rows and not memory_rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO session_messages (session_id, seq, payload) VALUES (?, ?, ?)",
+                message_rows,
+            )
+            self._conn.executemany(
+                "INSERT INTO session_memory (session_id, version, payload, updated_at) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET "
+                "version = excluded.version, payload = excluded.payload, "
+                "updated_at = excluded.updated_at WHERE excluded.version > session_memory.version",
+                memory_rows,
+            )
+
+    def message_count(self, session_id: str) -> int:
+        with self._lock:
+            (last,) = self._conn.execute(
+                "SELECT MAX(seq) FROM session_messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return 0 if last is None else last + 1
+
+    def load_messages(self, session_id: str, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM session_messages WHERE session_id = ? AND seq >= ? AND seq < ? "
+                "ORDER BY seq",
+                (session_id, start, stop if stop is not None else 2**62),
+            ).fetchall()
+        return [unpack(payload) for (payload,) in rows]
+
+    def load_memory(self, session_id: str, newer_than: int = -1) -> Optional[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, payload FROM session_memory WHERE session_id = ? AND version > ?",
+                (session_id, newer_than),
+            ).fetchone()
+        return None if row is None else (row[0], unpack(row[1]))
+
+    def delete_session(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM session_memory WHERE session_id = ?", (session_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ─────────────────────────────────────────────
+# Write-behind
+# ─────────────────────────────────────────────
+
+
+@dataclass
+class WriteBehindStats:
+    """Queued writes and the flushes (transactions) that stored them."""
+
+    messages: int = 0
+    memories: int = 0
+    flushes: int = 0
+    errors: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class WriteBehindSessionStore(SessionStore):
+    """
+    Queue writes and store them in batches from a background thread.
+
+    Reads go to the wrapped store, with this process's queued writes laid
+    over them. Other replicas see a write after at most `flush_interval`
+    seconds. Queued memory states of a session are coalesced (only the
+    newest is written). flush() runs at exit.
+
+    Args:
+        store:          The backend.
+        flush_interval: Seconds between flushes.
+        max_pending:    Flush at once when this many messages are queued.
+    """
+
+    def __init__(self, store: SessionStore, flush_interval: float = FLUSH_INTERVAL, max_pending: int = 500):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.stats = WriteBehindStats()
+        self._messages: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._memories: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time, in order
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="session-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, messages: Iterable[MessageRow] = (), memories: Iterable[MemoryRow] = ()) -> None:
+        with self._lock:
+            for sid, seq, message in messages:
+                self._messages[(sid, seq)] = message
+                self.stats.messages += 1
+            for sid, version, state in memories:
+                if version > self._memories.get(sid, (-1, None))[0]:
+                    self._memories[sid] = (version, state)
+                self.stats.memories += 1
+            full = len(self._messages) >= self.max_pending
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Store every queued write now."""
+        with self._flush_lock:
+            with self._lock:
+                messages, self._messages = self._messages, {}
+                memories, self._memories = self._memories, {}
+            if not messages and not memories:
+                return
+            try:
+                self.store.write(
+                    [(sid, seq, message) for (sid, seq), message in messages.items()],
+                    [(sid, version, state) for sid, (version, state) in memories.items()],
+                )
+            except Exception as e:
+                logger.error("Session store flush failed, retrying later: %s", e)
+                with self._lock:
+                    self.stats.errors += 1
+                    for key, message in messages.items():
+                        self._messages.setdefault(key, message)
+                    for sid, (version, state) in memories.items():
+                        if version > self._memories.get(sid, (-1, None))[0]:
+                            self._memories[sid] = (version, state)
+                return
+            with self._lock:
+                self.stats.flushes += 1
+
+    def _loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self.flush()
+
+    def message_count(self, session_id: str) -> int:
+        with self._lock:
+            queued = [seq for sid, seq in self._messages if sid == session_id]
+        return max([self.store.message_count(session_id) - 1, *queued]) + 1
+
+    def load_messages(self, session_id: str, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        stored = self.store.load_messages(session_id, start, stop)
+        with self._lock:
+            queued = {
+                seq: message
+                for (sid, seq), message in self._messages.items()
+                if sid == session_id and seq >= start and (stop is None or seq < stop)
+            }
+        if not queued:
+            return stored
+        # Queued messages come after (or replace) the stored ones of this
+        # session; rebuild the range by position.
+        merged = dict(enumerate(stored, start))
+        merged.update(queued)
+        return [merged[seq] for seq in sorted(merged)]
+
+    def load_memory(self, session_id: str, newer_than: int = -1) -> Optional[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            queued = self._memories.get(session_id)
+        if queued is not None and queued[0] > newer_than:
+            return queued
+        return self.store.load_memory(session_id, newer_than)
+
+    def delete_session(self, session_id: str) -> None:
+        with self._lock:
+            self._messages = {key: m for key, m in self._messages.items() if key[0] != session_id}
+            self._memories.pop(session_id, None)
+        self.store.delete_session(session_id)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self.store.close()
+
+
+def session_store_from_env() -> SessionStore:
+    """
+    Store selected by AGENT_SESSION_STORE ("memory", the default, or "sqlite").
+
+    AGENT_SESSION_STORE_PATH sets the SQLite file and
+    AGENT_SESSION_FLUSH_SECONDS the write-behind interval (0: write through).
+    """
+    kind = os.getenv("AGENT_SESSION_STORE", "memory").lower()
+    if kind == "memory":
+        store: SessionStore = MemorySessionStore()
+    elif kind == "sqlite":
+        store = SQLiteSessionStore(os.getenv("AGENT_SESSION_STORE_PATH", SESSION_STORE_PATH))
+    else:
+        raise ValueError(f"AGENT_SESSION_STORE must be 'memory' or 'sqlite', got {kind!r}")
+    flush_interval = float(os.getenv("AGENT_SESSION_FLUSH_SECONDS", FLUSH_INTERVAL))
+    return WriteBehindSessionStore(store, flush_interval) if flush_interval > 0 else store
+
+
+# ─────────────────────────────────────────────
+# Per-session views
+# ─────────────────────────────────────────────
+
+
+class SessionHistory:
+    """
+    Messages of one session, loaded lazily; use it like a list.
+
+    Iteration and len() cover the loaded messages: the last `page_size`
+    at first, more after load_more().
+
+    Args:
+        store:      The session store.
+        session_id: The session.
+        page_size:  Messages loaded at first and by each load_more().
+    """
+
+    def __init__(self, store: SessionStore, session_id: str, page_size: int = HISTORY_PAGE_SIZE):
+        self.store = store
+        self.session_id = session_id
+        self.page_size = page_size
+        self._next = store.message_count(session_id)
+        self._first = max(self._next - page_size, 0)
+        self._messages = store.load_messages(session_id, self._first, self._next)
+
+    @property
+    def has_more(self) -> bool:
+        """Whether older messages are still in the store only."""
+        return self._first > 0
+
+    def refresh(self) -> int:
+        """Load the messages appended elsewhere (other replicas); returns how many."""
+        new = self.store.load_messages(self.session_id, self._next)
+        self._messages.extend(new)
+        self._next += len(new)
+        return len(new)
+
+    def load_more(self, count: Optional[int] = None) -> int:
+        """Load up to `count` (page_size) older messages; returns how many."""
+        start = max(self._first - (count or self.page_size), 0)
+        older = self.store.load_messages(self.session_id, start, self._first)
+        self._messages[:0] = older
+        self._first = start
+        return len(older)
+
+    def append(self, message: Dict[str, Any]) -> None:
+        self.store.write(messages=[(self.session_id, self._next, message)])
+        self._messages.append(message)
+        self._next += 1
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(list(self._messages))
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self._messages[index]
+
+
+def restore_memory(store: SessionStore, session_id: str, memory: Any) -> bool:
+    """Load the stored state into `memory` if it is newer; True if it was."""
+    found = store.load_memory(session_id, newer_than=memory.version)
+    if found is None:
+        return False
+    memory.restore(found[1])
+    return True
+
+
+def persist_memory(store: SessionStore, session_id: str, memory: Any) -> None:
+    """Store `memory`'s state (a TokenBudgetMemory) under its version."""
+    state = memory.to_state()
+    store.write(memories=[(session_id, state["version"], state)])
+
+
+def persist_summaries(store: SessionStore, session_id: str, memory: Any) -> None:
+    """
+    Also store `memory` each time its background summary lands, so other
+    replicas (and the next load) get the summarized state, not the turns
+    still waiting for it.
+    """
+    memory.on_summary = functools.partial(persist_memory, store, session_id)
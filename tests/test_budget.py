@@ -0,0 +1,40 @@
+"""BudgetTracker stops before the work it cannot pay for, and does not count it."""
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.tools import tool
+
+from agent_executor import ReActExecutor, ToolRegistry
+from budget import BudgetTracker, RunBudget
+from react_prompt import ReActPrompt, build_react_agent
+
+
+@tool
+def echo(text: str) -> str:
+    """Return the text unchanged."""
+    return text
+
+
+def _executor(budget: RunBudget) -> ReActExecutor:
+    template = "Tools:\n{tools}\n" + "x" * 4000 + "\nQuestion: {input}\n{agent_scratchpad}"
+    agent = build_react_agent(
+        ReActPrompt(template, [echo]), FakeListChatModel(responses=["Final Answer: done"])
+    )
+    return ReActExecutor(agent, ToolRegistry([echo]), budget=budget)
+
+
+def test_oversized_first_prompt_is_never_sent():
+    result = _executor(RunBudget(max_prompt_tokens=100)).run("question")
+    assert result.usage.stopped_by == "max_prompt_tokens"
+    assert result.usage.llm_calls == 0
+
+
+def test_first_prompt_within_budget_is_sent():
+    result = _executor(RunBudget(max_prompt_tokens=10_000)).run("question")
+    assert result.output == "done"
+    assert result.usage.llm_calls == 1
+
+
+def test_tool_calls_stopped_on_time_are_not_counted():
+    tracker = BudgetTracker(RunBudget(max_seconds=0.0, max_tool_calls=5))
+    assert tracker.check_tool_calls(2) == "max_seconds"
+    assert tracker.usage.tool_calls == 0
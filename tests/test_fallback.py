@@ -0,0 +1,76 @@
+"""The speculative fallback search is handed over once and never outlives its run."""
+
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+from langchain_core.agents import AgentAction
+from langchain_core.tools import tool
+
+from agent_executor import FallbackStage, ReActExecutor, ToolRegistry
+
+searches = []
+
+
+@tool
+def web_search(query: str) -> str:
+    """Search the web."""
+    searches.append(query)
+    time.sleep(0.1)  # long enough for both duplicates to wait on it
+    return f"results for {query}"
+
+
+def _stage(pool: ThreadPoolExecutor) -> FallbackStage:
+    stage = FallbackStage(web_search, "capital of France", speculative=True)
+    stage.start(pool)
+    return stage
+
+
+def _duplicate_actions():
+    action = AgentAction(tool="web_search", tool_input="Capital of France", log="")
+    return [action, action]
+
+
+def test_duplicate_actions_share_one_search():
+    searches.clear()
+    executor = ReActExecutor(None, ToolRegistry([web_search]))
+    with ThreadPoolExecutor(4) as pool:
+        observations = executor.run_tools(_duplicate_actions(), _stage(pool))
+    assert observations == ["results for capital of France"] * 2
+    assert searches == ["capital of France"]
+
+
+def test_duplicate_actions_share_one_search_async():
+    searches.clear()
+    executor = ReActExecutor(None, ToolRegistry([web_search]))
+
+    async def main():
+        stage = FallbackStage(web_search, "capital of France", speculative=True)
+        await stage.astart()
+        return await executor.arun_tools(_duplicate_actions(), stage)
+
+    assert asyncio.run(main()) == ["results for capital of France"] * 2
+    assert searches == ["capital of France"]
+
+
+def test_pending_search_is_cancelled_when_the_run_fails(monkeypatch):
+    pending = Future()
+    original = ReActExecutor._fallback_stage
+
+    def fallback_stage(self, user_input, tracer):
+        stage = original(self, user_input, tracer)
+        stage._pending = pending  # a search left over from an earlier step
+        return stage
+
+    class FailingAgent:
+        def invoke(self, *args, **kwargs):
+            raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(ReActExecutor, "_fallback_stage", fallback_stage)
+    executor = ReActExecutor(
+        FailingAgent(), ToolRegistry([web_search]), fallback_tool=web_search, speculative_fallback=True
+    )
+    with pytest.raises(RuntimeError):
+        executor.run("question")
+    assert pending.cancelled()
@@ -0,0 +1,52 @@
+"""StreamingOutputGuard must block exactly what validate_output() blocks."""
+
+import random
+
+import pytest
+
+from guardrails import (
+    BLOCKED_OUTPUT_MESSAGE,
+    OutputBlockedError,
+    StreamingOutputGuard,
+    validate_output,
+)
+
+TEXTS = [
+    "Talk about hate speeches in the news.",
+    "Talk about hate speech in the news.",
+    "Avoid self-harming behaviours.",
+    "Avoid self-harm at all costs.",
+    "The word whate speech is not a match.",
+    "Nothing to see here, only suicidal ideation research.",
+    "Nonsuicidal text and selfharm written together.",
+    "Hate\n\nspeech split over lines, then a long tail " + "x" * 200 + " hate speech",
+    "Call +34 600 123 456 or mail ana@example.com about " + "y" * 90 + "hate speechy",
+]
+
+
+def _streamed_is_blocked(chunks) -> bool:
+    guard = StreamingOutputGuard()
+    try:
+        for chunk in chunks:
+            guard.feed(chunk)
+        guard.finish()
+    except OutputBlockedError:
+        return True
+    return False
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_two_chunks_at_every_offset(text):
+    expected = validate_output(text) == BLOCKED_OUTPUT_MESSAGE
+    for offset in range(len(text) + 1):
+        assert _streamed_is_blocked([text[:offset], text[offset:]]) == expected, offset
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_random_chunking(text):
+    expected = validate_output(text) == BLOCKED_OUTPUT_MESSAGE
+    rng = random.Random(text)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(text)), k=min(len(text) - 1, rng.randint(1, 12))))
+        chunks = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        assert _streamed_is_blocked(chunks) == expected, chunks
@@ -0,0 +1,47 @@
+"""TokenBudgetMemory.render() never goes over max_tokens."""
+
+from memory import TokenBudgetMemory, approx_token_count
+
+
+def _memory(summary: str, max_tokens: int = 100) -> TokenBudgetMemory:
+    memory = TokenBudgetMemory(lambda previous, lines: summary, max_turns=1, max_tokens=max_tokens)
+    memory.save_context({"input": "first question"}, {"output": "first answer"})
+    memory.save_context({"input": "second question"}, {"output": "second answer"})
+    assert memory.wait(5)
+    return memory
+
+
+def _tokens(memory: TokenBudgetMemory) -> int:
+    rendered = memory.render().removeprefix("Summary of the earlier conversation: ")
+    return approx_token_count(rendered)
+
+
+def test_summary_larger_than_budget_is_dropped():
+    memory = _memory("s" * 4000)
+    rendered = memory.render()
+    assert "Summary" not in rendered
+    assert "second answer" in rendered
+    assert _tokens(memory) <= memory.max_tokens
+
+
+def test_latest_turn_larger_than_budget_is_cut():
+    memory = TokenBudgetMemory(max_turns=2, max_tokens=50)
+    memory.save_context({"input": "question"}, {"output": "a" * 1000 + " end"})
+    rendered = memory.render()
+    assert rendered.startswith("Human: question")
+    assert rendered.endswith(" end")
+    assert approx_token_count(rendered) <= memory.max_tokens
+
+
+def test_summary_alone_larger_than_budget_is_cut():
+    memory = _memory("s" * 4000, max_tokens=100)
+    memory.restore({"summary": "s" * 4000, "recent": [], "pending": []})
+    assert 0 < _tokens(memory) <= memory.max_tokens
+
+
+def test_within_budget_is_unchanged():
+    memory = _memory("short summary", max_tokens=1000)
+    assert memory.render() == (
+        "Summary of the earlier conversation: short summary\n"
+        "Human: second question\nAI: second answer"
+    )